@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分类性能对比: 逐张 analyze_image vs 批量 classify_batch（lab / luma）
+用法: python bench/bench_classify.py [图片数量] [批大小]
+"""
+
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from image_ops import analyze_image, classify_batch  # noqa: E402
+
+
+def make_images(count: int, seed: int = 0) -> list:
+    """生成尺寸、亮度各异的合成图片"""
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        w, h = rng.integers(200, 1600, size=2)
+        base = rng.integers(0, 256)
+        noise = rng.integers(-60, 60, size=(h // 8 + 1, w // 8 + 1, 3))
+        small = np.clip(base + noise, 0, 255).astype(np.uint8)
+        images.append(np.repeat(np.repeat(small, 8, axis=0), 8, axis=1)[:h, :w])
+    return images
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    batch = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+
+    print(f"🧪 生成 {count} 张合成图片...")
+    images = make_images(count)
+
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        serial = [analyze_image(img) for img in images]
+    serial_time = time.perf_counter() - start
+    print(f"逐张 analyze_image : {serial_time:7.2f}s  {count / serial_time:8.1f} 张/s")
+
+    for method in ("lab", "luma"):
+        start = time.perf_counter()
+        results = []
+        for i in range(0, count, batch):
+            results.extend(classify_batch(images[i:i + batch], method))
+        elapsed = time.perf_counter() - start
+        same = sum(1 for a, b in zip(serial, results) if a and b and a["folder"] == b["folder"])
+        print(f"批量 {method:<4} (批 {batch:3d}) : {elapsed:7.2f}s  {count / elapsed:8.1f} 张/s  "
+              f"加速 {serial_time / elapsed:4.2f}x  分类一致 {same}/{count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+链接提取对比: BeautifulSoup(lxml) + find_all vs 流式 lxml target（link_extract）
+先逐页核对两者结果完全一致，再比较吞吐
+用法: python bench/bench_extract.py [保存的归档页面目录 | 合成页面数]
+目录中的 *.html 为从站点保存的归档页面；不给目录时使用合成的 Typecho 风格页面
+"""
+
+import glob
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from link_extract import iter_fancybox_links  # noqa: E402
+
+
+def extract_bs4(html: bytes) -> list:
+    """scraper 原来的提取方式"""
+    soup = BeautifulSoup(html.decode("utf-8", "replace"), "lxml")
+    images = []
+    for idx, link in enumerate(soup.find_all("a", {"data-fancybox": True}), 1):
+        href = link.get("href", "")
+        if href.startswith("http"):
+            images.append({"url": href, "index": idx})
+    return images
+
+
+def extract_stream(html: bytes, chunk_size: int = 16384) -> list:
+    chunks = (html[i:i + chunk_size] for i in range(0, len(html), chunk_size))
+    return list(iter_fancybox_links(chunks))
+
+
+def make_page(page_id: int, images: int) -> bytes:
+    """合成页面：导航、侧栏、正文图集、评论区，正文之后的内容较多"""
+    nav = "".join(f'<li><a href="/index.php/category/{i}/">分类 {i}</a></li>' for i in range(30))
+    links = "".join(
+        f'<figure><a data-fancybox="gallery" href="https://img.example.com/usr/uploads/{page_id}-{k}.jpg">'
+        f'<img src="https://img.example.com/usr/uploads/{page_id}-{k}.jpg" alt="{k}" loading="lazy"></a>'
+        f"<figcaption>图 {k}</figcaption></figure>"
+        for k in range(images)
+    )
+    comments = "".join(
+        f'<li class="comment"><div class="comment-author"><img src="/avatar/{i}.png">访客 {i}</div>'
+        f"<p>{'评论内容 ' * 20}</p></li>"
+        for i in range(40)
+    )
+    return (
+        f'<!DOCTYPE html><html lang="zh-CN"><head><meta charset="UTF-8"><title>归档 {page_id}</title>'
+        f'<link rel="stylesheet" href="/usr/themes/default/style.css"></head><body>'
+        f'<header><nav><ul>{nav}</ul></nav></header>'
+        f'<main><article class="post"><h1 class="post-title">归档 {page_id}</h1>'
+        f'<div class="post-content">{links}</div></article>'
+        f'<section id="comments"><ol>{comments}</ol></section></main>'
+        f'<aside><div class="widget">{nav}</div></aside><footer>© Typecho</footer></body></html>'
+    ).encode("utf-8")
+
+
+def load_corpus(arg: str) -> list:
+    if arg and os.path.isdir(arg):
+        pages = []
+        for path in sorted(glob.glob(os.path.join(arg, "*.html"))):
+            with open(path, "rb") as f:
+                pages.append((os.path.basename(path), f.read()))
+        return pages
+    count = int(arg) if arg else 500
+    return [(f"synthetic-{i}", make_page(i, (i % 12) + 1 if i % 10 else 0)) for i in range(count)]
+
+
+def bench(fn, pages: list, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for _, html in pages:
+            fn(html)
+    return time.perf_counter() - start
+
+
+def main():
+    pages = load_corpus(sys.argv[1] if len(sys.argv) > 1 else "")
+    if not pages:
+        print("❌ 没有页面")
+        return
+    total_mb = sum(len(html) for _, html in pages) / 1024 / 1024
+    print(f"🧪 {len(pages)} 个页面, {total_mb:.1f} MB")
+
+    mismatches = [name for name, html in pages if extract_bs4(html) != extract_stream(html)]
+    if mismatches:
+        print(f"❌ {len(mismatches)} 个页面结果不一致: {', '.join(mismatches[:10])}")
+    else:
+        print(f"✅ 结果一致: {len(pages)}/{len(pages)}")
+
+    rounds = max(1, 2000 // len(pages))
+    results = {}
+    for name, fn in (("BeautifulSoup", extract_bs4), ("流式 lxml", extract_stream)):
+        elapsed = bench(fn, pages, rounds)
+        results[name] = elapsed
+        n = len(pages) * rounds
+        print(f"{name:<14}: {elapsed:7.2f}s  {n / elapsed:8.1f} 页/s  {total_mb * rounds / elapsed:7.1f} MB/s")
+    print(f"加速 {results['BeautifulSoup'] / results['流式 lxml']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
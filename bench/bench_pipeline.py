@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端流水线基准: 本地替身图片站 + 替身 GitHub API，完整运行 scraper.main()
+报告 页面/s、图片/s、MB/s、各阶段 p50/p95 延迟（scraper.metrics）和峰值内存
+用法: python bench/bench_pipeline.py [页面数] [每页图片数] [来源数]
+来源数大于 1 时启动多个替身站点，通过 SOURCES 配置在同一进程中一起抓取
+并发等配置沿用 scraper 的环境变量（PAGE_WORKERS、ENCODE_PROCESSES、UPLOAD_MODE、BLOB_WORKERS、PROFILE ...）
+BENCH_GITHUB_LATENCY_MS: 替身 GitHub 每个请求的模拟延迟，配合 BLOB_WORKERS 观察上传阶段（upload）耗时
+"""
+
+import io
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from fake_services import FakeGitHub, FakeSite  # noqa: E402
+from update_count import PATH_RE  # noqa: E402
+
+REPO = "bench/images"
+FIRST_ID = 342  # 与 scraper.START_ID 一致，替身仓库里没有 progress.json
+
+
+def peak_rss_mb() -> tuple:
+    """(本进程, 已回收的子进程) 峰值 RSS，Linux 上 ru_maxrss 单位为 KB"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return own, children
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    per_page = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    site_count = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+
+    print(f"🧪 生成替身站点: {site_count} 个, 每个 {pages} 个页面, 每页 {per_page} 张图片...")
+    sites = [FakeSite(FIRST_ID, pages, per_page, seed=k).start() for k in range(site_count)]
+    github = FakeGitHub(REPO, latency=float(os.environ.get("BENCH_GITHUB_LATENCY_MS", "0")) / 1000).start()
+    image_count = sum(len(s.images) for s in sites)
+    print(f"   图片 {image_count} 张, {sum(s.image_bytes for s in sites) / 1024 / 1024:.1f} MB")
+
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.chdir(workdir)
+    os.environ.update({
+        "SITE_URL": sites[0].url,
+        "GITHUB_API": github.url,
+        "GH_TOKEN": "bench",
+        "TARGET_REPO": REPO,
+        "SCRAPER_STATE_DIR": os.path.join(workdir, "state"),
+    })
+    if site_count > 1:
+        os.environ["SOURCES"] = json.dumps([
+            {"name": f"site{k}", "url": s.url, "start_id": FIRST_ID} for k, s in enumerate(sites)
+        ])
+
+    # 配置在导入时读取，必须在设置环境变量之后导入
+    import scraper
+
+    print(f"🚀 运行 scraper.main()（输出重定向），工作目录 {workdir}")
+    log = io.StringIO()
+    start = time.perf_counter()
+    with scraper.profiling(scraper.PROFILE, os.path.join(workdir, scraper.PROFILE_OUTPUT)):
+        with redirect_stdout(log):
+            scraper.main()
+    elapsed = time.perf_counter() - start
+    scraper.metrics.write(os.path.join(workdir, scraper.METRICS_FILE))
+
+    files = github.files()
+    stored = [p for p in files if PATH_RE.match(p)]
+    renditions = {kind: sum(1 for p in files if p.startswith(f"{prefix}/"))
+                  for kind, prefix in (("缩略图", scraper.THUMBS_DIR), ("AVIF", scraper.AVIF_DIR),
+                                       ("雪碧图", scraper.SPRITES_DIR))}
+    mb = sum(s.bytes_served for s in sites) / 1024 / 1024
+    own_rss, child_rss = peak_rss_mb()
+
+    print(f"\n⏱️ 总耗时 {elapsed:.2f}s")
+    total_pages = pages * site_count
+    print(f"页面   : {total_pages:6d}  {total_pages / elapsed:8.1f} 页/s")
+    print(f"图片   : {len(stored):6d}  {len(stored) / elapsed:8.1f} 张/s（入库）")
+    print(f"下载   : {mb:6.1f} MB {mb / elapsed:6.1f} MB/s")
+    print(f"其他输出: {', '.join(f'{k} {v}' for k, v in renditions.items())}")
+    print(f"内存   : 主进程峰值 {own_rss:.0f} MB, 子进程峰值 {child_rss:.0f} MB\n")
+    print(f"{'阶段':<14}{'次数':>8}{'p50 ms':>10}{'p95 ms':>10}{'合计 s':>10}")
+    for stage, t in scraper.metrics.snapshot()["stages"].items():
+        print(f"{stage:<14}{t['count']:>8}{t['p50_ms']:>10.1f}{t['p95_ms']:>10.1f}{t['total_s']:>10.2f}")
+    progress = json.loads(files.get("progress.json", b"{}"))
+    print(f"\n进度   : {json.dumps(progress, ensure_ascii=False)}")
+    print("GitHub API 调用: " + ", ".join(f"{k} {v}" for k, v in sorted(github.calls.items())))
+
+    expected = image_count
+    if len(stored) != expected:
+        print(f"\n⚠️ 入库 {len(stored)} 张，预期 {expected} 张；日志末尾:")
+        print("\n".join(log.getvalue().splitlines()[-20:]))
+
+    for s in sites:
+        s.stop()
+    github.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+基准测试用的本地替身服务
+- FakeSite: 模拟图片站（归档页面带 data-fancybox 链接、RSS、合成图片）
+- FakeGitHub: 内存中的 GitHub contents（含删除） / git data API（blob、tree、commit、ref）
+"""
+
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+
+class _Server:
+    """在后台线程运行 ThreadingHTTPServer，请求交给 self.handle(method, path, headers, body)"""
+
+    def __init__(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _dispatch(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status, headers, payload = service.handle(self.command, self.path, self.headers, body)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    try:
+                        self.wfile.write(payload)
+                    except (BrokenPipeError, ConnectionResetError):
+                        pass
+
+            do_GET = do_HEAD = do_POST = do_PUT = do_PATCH = do_DELETE = _dispatch
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, method: str, path: str, headers, body: bytes) -> tuple:
+        raise NotImplementedError
+
+
+def make_image(seed: int, width: int, height: int) -> bytes:
+    """生成一张各不相同的 JPEG（块状噪声 + 随机亮度，避免被感知哈希判为重复）"""
+    rng = np.random.default_rng(seed)
+    base = rng.integers(20, 236)
+    small = np.clip(base + rng.integers(-80, 80, size=(height // 16 + 1, width // 16 + 1, 3)), 0, 255)
+    img = np.repeat(np.repeat(small.astype(np.uint8), 16, axis=0), 16, axis=1)[:height, :width]
+    ok, data = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return data.tobytes()
+
+
+class FakeSite(_Server):
+    """
+    归档页面 first_id..last_id
+    - 每 video_every 个页面一个视频页面（没有图片），每 gap_every 个 ID 一个空缺（404）
+    - 图片在启动前全部生成好，计时不包含生成开销
+    """
+
+    def __init__(self, first_id: int, pages: int, images_per_page: int,
+                 video_every: int = 10, gap_every: int = 13, seed: int = 0):
+        super().__init__()
+        self.first_id = first_id
+        self.last_id = first_id + pages - 1
+        self.lock = threading.Lock()
+        self.bytes_served = 0
+        self.requests = 0
+
+        rng = np.random.default_rng(seed)
+        self.pages = {}
+        self.images = {}
+        for page_id in range(first_id, self.last_id + 1):
+            offset = page_id - first_id
+            if gap_every and offset % gap_every == gap_every - 1 and page_id != self.last_id:
+                continue
+            names = []
+            if not (video_every and offset % video_every == video_every - 1):
+                for k in range(images_per_page):
+                    name = f"{page_id}-{k}.jpg"
+                    w, h = (int(x) for x in rng.integers(400, 1400, size=2))
+                    self.images[name] = make_image(seed * 10 ** 7 + page_id * 1000 + k, w, h)
+                    names.append(name)
+            self.pages[page_id] = names
+
+    @property
+    def image_bytes(self) -> int:
+        return sum(len(data) for data in self.images.values())
+
+    def _page(self, page_id: int) -> bytes:
+        links = "\n".join(
+            f'<a data-fancybox="gallery" href="{self.url}/usr/uploads/{name}">'
+            f'<img src="{self.url}/usr/uploads/{name}"></a>'
+            for name in self.pages[page_id]
+        )
+        return (f"<!DOCTYPE html><html><head><title>{page_id}</title></head><body>"
+                f"<article><h1>归档 {page_id}</h1>{links}</article></body></html>").encode("utf-8")
+
+    def _feed(self) -> bytes:
+        items = "".join(
+            f"<item><link>{self.url}/index.php/archives/{page_id}.html</link></item>"
+            for page_id in sorted(self.pages, reverse=True)[:10]
+        )
+        return f'<?xml version="1.0"?><rss><channel>{items}</channel></rss>'.encode("utf-8")
+
+    def handle(self, method, path, headers, body):
+        path = urlsplit(path).path
+        with self.lock:
+            self.requests += 1
+
+        if path == "/index.php/feed/":
+            return 200, {"Content-Type": "application/rss+xml"}, self._feed()
+
+        m = re.fullmatch(r"/index\.php/archives/(\d+)\.html", path)
+        if m:
+            page_id = int(m.group(1))
+            if page_id not in self.pages:
+                return 404, {"Content-Type": "text/html"}, b"not found"
+            return 200, {"Content-Type": "text/html; charset=utf-8"}, self._page(page_id)
+
+        m = re.fullmatch(r"/usr/uploads/(.+)", path)
+        if m and m.group(1) in self.images:
+            data = self.images[m.group(1)]
+            if method == "GET":
+                with self.lock:
+                    self.bytes_served += len(data)
+            return 200, {"Content-Type": "image/jpeg"}, data
+
+        return 404, {"Content-Type": "text/plain"}, b"not found"
+
+
+class FakeGitHub(_Server):
+    """
+    单仓库单分支的 GitHub API 替身，所有对象保存在内存
+    Contents API 的每次 PUT 也会生成一个提交，和真实接口一致
+    latency: 每个请求的模拟延迟（秒），用于观察上传并发的效果
+    """
+
+    def __init__(self, repo: str, branch: str = "main", latency: float = 0.0):
+        super().__init__()
+        self.repo = repo
+        self.latency = latency
+        self.branch = branch
+        self.lock = threading.Lock()
+        self.blobs = {}
+        self.trees = {}
+        self.commits = {}
+        self.calls = {}
+
+        empty = self._put_tree({})
+        self.head = self._put_commit(empty, [], "init")
+
+    # ---------- 对象存储 ----------
+
+    def _put_blob(self, data: bytes) -> str:
+        sha = hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+        self.blobs[sha] = data
+        return sha
+
+    def _put_tree(self, files: dict) -> str:
+        sha = hashlib.sha1(json.dumps(sorted(files.items())).encode()).hexdigest()
+        self.trees[sha] = dict(files)
+        return sha
+
+    def _put_commit(self, tree_sha: str, parents: list, message: str) -> str:
+        sha = hashlib.sha1(f"{tree_sha}{parents}{message}{len(self.commits)}".encode()).hexdigest()
+        self.commits[sha] = {"tree": tree_sha, "parents": parents, "message": message}
+        return sha
+
+    def files(self) -> dict:
+        """当前分支的 {路径: 内容}"""
+        with self.lock:
+            tree = self.trees[self.commits[self.head]["tree"]]
+            return {path: self.blobs[sha] for path, sha in tree.items()}
+
+    # ---------- 请求处理 ----------
+
+    @staticmethod
+    def _json(status: int, data) -> tuple:
+        return status, {"Content-Type": "application/json"}, json.dumps(data).encode("utf-8")
+
+    def handle(self, method, path, headers, body):
+        parts = urlsplit(path)
+        prefix = f"/repos/{self.repo}"
+        if not parts.path.startswith(prefix):
+            return self._json(404, {"message": "Not Found"})
+        route = parts.path[len(prefix):]
+        payload = json.loads(body) if body else {}
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self.lock:
+            segments = route.strip("/").split("/")
+            key = f"{method} {'/'.join(segments[:2]) if segments[0] == 'git' else segments[0]}"
+            self.calls[key] = self.calls.get(key, 0) + 1
+
+            if route == "":
+                return self._json(200, {"default_branch": self.branch})
+            if route.startswith("/contents/"):
+                return self._contents(method, route[len("/contents/"):], headers, payload)
+            if route.startswith("/git/"):
+                return self._git(method, route[len("/git/"):], parts.query, payload)
+        return self._json(404, {"message": "Not Found"})
+
+    def _contents(self, method, file_path, headers, payload):
+        tree = self.trees[self.commits[self.head]["tree"]]
+        if method == "GET":
+            sha = tree.get(file_path)
+            if sha is None:
+                return self._json(404, {"message": "Not Found"})
+            raw = "raw" in headers.get("Accept", "")
+            etag = f'"{sha}"' if raw else f'W/"{sha}"'
+            if headers.get("If-None-Match") == etag:
+                return 304, {"ETag": etag}, b""
+            if raw:
+                return 200, {"Content-Type": "application/octet-stream", "ETag": etag}, self.blobs[sha]
+            status, resp_headers, body = self._json(200, {
+                "path": file_path, "sha": sha,
+                "content": base64.b64encode(self.blobs[sha]).decode("ascii")
+            })
+            return status, {**resp_headers, "ETag": etag}, body
+        if method == "PUT":
+            current = tree.get(file_path)
+            if current and payload.get("sha") != current:
+                return self._json(409, {"message": "sha mismatch"})
+            files = dict(tree)
+            files[file_path] = self._put_blob(base64.b64decode(payload["content"]))
+            self.head = self._put_commit(self._put_tree(files), [self.head], payload.get("message", ""))
+            return self._json(200 if current else 201, {"content": {"sha": files[file_path]}})
+        if method == "DELETE":
+            current = tree.get(file_path)
+            if current is None:
+                return self._json(404, {"message": "Not Found"})
+            if payload.get("sha") != current:
+                return self._json(409, {"message": "sha mismatch"})
+            files = {k: v for k, v in tree.items() if k != file_path}
+            self.head = self._put_commit(self._put_tree(files), [self.head], payload.get("message", ""))
+            return self._json(200, {"commit": {"sha": self.head}})
+        return self._json(405, {"message": "Method Not Allowed"})
+
+    def _git(self, method, route, query, payload):
+        if method == "GET" and route == f"ref/heads/{self.branch}":
+            return self._json(200, {"object": {"sha": self.head, "type": "commit"}})
+        if method == "GET" and route.startswith("commits/"):
+            commit = self.commits.get(route.split("/", 1)[1])
+            if not commit:
+                return self._json(404, {"message": "Not Found"})
+            return self._json(200, {"tree": {"sha": commit["tree"]}, "parents": commit["parents"]})
+        if method == "GET" and route.startswith("trees/"):
+            files = self.trees.get(route.split("/", 1)[1])
+            if files is None:
+                return self._json(404, {"message": "Not Found"})
+            return self._json(200, {"truncated": False, "tree": [
+                {"path": path, "type": "blob", "sha": sha} for path, sha in sorted(files.items())
+            ]})
+        if method == "POST" and route == "blobs":
+            return self._json(201, {"sha": self._put_blob(base64.b64decode(payload["content"]))})
+        if method == "POST" and route == "trees":
+            files = dict(self.trees.get(payload.get("base_tree"), {}))
+            for entry in payload["tree"]:
+                if "content" in entry:
+                    files[entry["path"]] = self._put_blob(entry["content"].encode("utf-8"))
+                elif entry.get("sha") is None:
+                    files.pop(entry["path"], None)
+                else:
+                    files[entry["path"]] = entry["sha"]
+            return self._json(201, {"sha": self._put_tree(files)})
+        if method == "POST" and route == "commits":
+            return self._json(201, {"sha": self._put_commit(
+                payload["tree"], payload["parents"], payload["message"])})
+        if method == "PATCH" and route == f"refs/heads/{self.branch}":
+            commit = self.commits.get(payload["sha"])
+            if not commit or (not payload.get("force") and self.head not in commit["parents"]):
+                return self._json(422, {"message": "Update is not a fast forward"})
+            self.head = payload["sha"]
+            return self._json(200, {"object": {"sha": self.head}})
+        return self._json(404, {"message": "Not Found"})
@@ -13,7 +13,6 @@ import os
 import sys
 import time
 import json
-import base64
 import requests
 from pathlib import Path
 from datetime import datetime
@@ -23,6 +22,8 @@ from typing import Optional, Dict, Any
 from seleniumbase import SB
 from selenium.webdriver.common.by import By
 
+from github_api import GitHubClient
+
 # ============== 配置 ==============
 FREE_PANEL_URL = "https://billing.kerit.cloud/free_panel"
 SESSION_URL = "https://billing.kerit.cloud/session"
@@ -185,37 +186,8 @@ def update_github_secret(secret_name: str, secret_value: str):
         return
     
     try:
-        from nacl import public, encoding
-        
-        headers = {
-            "Authorization": f"token {REPO_TOKEN}",
-            "Accept": "application/vnd.github.v3+json"
-        }
-        
-        # 获取公钥
-        pub_key_url = f"https://api.github.com/repos/{GITHUB_REPOSITORY}/actions/secrets/public-key"
-        resp = requests.get(pub_key_url, headers=headers, timeout=15)
-        if resp.status_code != 200:
-            log("ERROR", f"获取公钥失败: {resp.status_code}")
-            return
-        
-        pub_key_data = resp.json()
-        pub_key = public.PublicKey(pub_key_data["key"].encode(), encoding.Base64Encoder())
-        
-        # 加密
-        sealed_box = public.SealedBox(pub_key)
-        encrypted = sealed_box.encrypt(secret_value.encode())
-        encrypted_b64 = base64.b64encode(encrypted).decode()
-        
-        # 更新
-        secret_url = f"https://api.github.com/repos/{GITHUB_REPOSITORY}/actions/secrets/{secret_name}"
-        payload = {"encrypted_value": encrypted_b64, "key_id": pub_key_data["key_id"]}
-        resp = requests.put(secret_url, headers=headers, json=payload, timeout=15)
-        
-        if resp.status_code in [201, 204]:
-            log("INFO", "GitHub Secret 已更新")
-        else:
-            log("ERROR", f"更新 Secret 失败: {resp.status_code}")
+        GitHubClient(REPO_TOKEN, GITHUB_REPOSITORY).update_secret(secret_name, secret_value)
+        log("INFO", "GitHub Secret 已更新")
     
     except ImportError:
         log("WARN", "nacl 未安装，跳过 Secret 更新")
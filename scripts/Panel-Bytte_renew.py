@@ -12,6 +12,8 @@ Panel Bytte 自动重启&续约脚本
 6. 自动更新 Cookie 到 GitHub Secrets
 配置变量:
 - PANEL_BYTTE_COOKIES=remember_web_59baxxx=eyJpxxx
+- PANEL_MODE=api  (api: 用 Pterodactyl 客户端 API 列出服务器并并发启动已停止的服务器，浏览器只用于续约页面
+                   和 API 失败的服务器；browser: 全程浏览器)
 """
 
 import os
@@ -22,6 +24,10 @@ from pathlib import Path
 from datetime import datetime
 from urllib.parse import unquote, quote
 
+from github_api import GitHubClient
+from pterodactyl_api import PterodactylClient, PterodactylError
+from page_waits import set_logger, summary as wait_summary, wait_response_sync, wait_selector_sync
+
 try:
     from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
 except ImportError:
@@ -30,7 +36,14 @@ except ImportError:
 
 # ==================== 配置 ====================
 BASE_URL = "https://panel.bytte.cloud"
+PANEL_MODE = os.environ.get("PANEL_MODE", "api").strip().lower()
 OUTPUT_DIR = Path("output/screenshots")
+# 续约框中的余额，设置页加载完成后总会显示（续约按钮只在可续约时出现）
+BALANCE_SELECTORS = [
+    'code.RenewServerBox___StyledCode-sc-pwczq4-3',
+    '.RenewServerBox___StyledDiv2-sc-pwczq4-2 code',
+    'code.TqUPO'
+]
 
 # ==================== 工具函数 ====================
 
@@ -40,6 +53,9 @@ def log(level: str, msg: str):
     print(f"[{timestamp}] [{level}] {msg}")
 
 
+set_logger(lambda msg: log("INFO", msg))
+
+
 def mask_id(server_id: str) -> str:
     """隐藏服务器 ID，只显示首尾字符"""
     if not server_id or len(server_id) <= 4:
@@ -140,35 +156,7 @@ def update_github_secret(secret_name: str, secret_value: str) -> bool:
         return False
     
     try:
-        from nacl import encoding, public
-        
-        headers = {
-            "Authorization": f"Bearer {repo_token}",
-            "Accept": "application/vnd.github+json",
-            "X-GitHub-Api-Version": "2022-11-28"
-        }
-        
-        pub_key_url = f"https://api.github.com/repos/{github_repo}/actions/secrets/public-key"
-        resp = requests.get(pub_key_url, headers=headers, timeout=30)
-        resp.raise_for_status()
-        pub_key_data = resp.json()
-        
-        public_key = public.PublicKey(pub_key_data["key"].encode("utf-8"), encoding.Base64Encoder())
-        sealed_box = public.SealedBox(public_key)
-        encrypted = sealed_box.encrypt(secret_value.encode("utf-8"))
-        encrypted_value = encoding.Base64Encoder().encode(encrypted).decode("utf-8")
-        
-        secret_url = f"https://api.github.com/repos/{github_repo}/actions/secrets/{secret_name}"
-        resp = requests.put(
-            secret_url,
-            headers=headers,
-            json={
-                "encrypted_value": encrypted_value,
-                "key_id": pub_key_data["key_id"]
-            },
-            timeout=30
-        )
-        resp.raise_for_status()
+        GitHubClient(repo_token, github_repo).update_secret(secret_name, secret_value)
         
         log("INFO", f"GitHub Secret 已更新")
         return True
@@ -251,6 +239,11 @@ def send_text_only(bot_token: str, chat_id: str, text: str):
 
 # ==================== 业务逻辑 ====================
 
+def is_power_request(response) -> bool:
+    """电源按钮发出的 POST /api/client/servers/<id>/power"""
+    return response.request.method == "POST" and response.url.endswith("/power")
+
+
 def check_need_restart(page) -> bool:
     """
     检查是否需要重启
@@ -291,8 +284,7 @@ def do_restart(page) -> bool:
             is_disabled = start_btn.get_attribute('disabled') is not None
             if not is_disabled:
                 log("INFO", "▶️ 点击 Start 按钮...")
-                start_btn.click()
-                page.wait_for_timeout(3000)
+                wait_response_sync(page, start_btn.click, is_power_request, "Start 电源API", baseline=3000)
                 return True
         
         # 尝试点击 Restart 按钮
@@ -301,8 +293,7 @@ def do_restart(page) -> bool:
             is_disabled = restart_btn.get_attribute('disabled') is not None
             if not is_disabled:
                 log("INFO", "🔄 点击 Restart 按钮...")
-                restart_btn.click()
-                page.wait_for_timeout(3000)
+                wait_response_sync(page, restart_btn.click, is_power_request, "Restart 电源API", baseline=3000)
                 return True
         
         log("WARN", "未找到可用的启动/重启按钮")
@@ -313,6 +304,44 @@ def do_restart(page) -> bool:
         return False
 
 
+def power_via_api(preset_cookies: str):
+    """
+    API 快速路径：分页列出服务器，并发读取运行状态，已停止的发送 start
+    返回 (服务器列表, {服务器ID: {"needed", "done"}}, 新 Cookie)；API 操作失败的服务器不在字典中，
+    由浏览器重新检查；登录或获取列表失败时返回 None
+    """
+    log("INFO", "⚡ 使用 Pterodactyl 客户端 API...")
+    client = PterodactylClient(BASE_URL, parse_cookie_string(preset_cookies, "panel.bytte.cloud"))
+    try:
+        client.check_login()
+        servers = client.list_servers()
+    except PterodactylError as e:
+        log("WARN", f"⚠️ API 不可用，改用浏览器: {e}")
+        return None
+    if not servers:
+        log("WARN", "⚠️ API 未返回服务器，改用浏览器")
+        return None
+    for server in servers:
+        log("INFO", f"📦 发现服务器: {server['name']} (ID: {mask_id(server['id'])})")
+
+    def start_if_stopped(server):
+        if client.power_state(server["id"]) != "offline":
+            return False
+        log("INFO", f"🔴 {server['name']} 已停止，发送 start...")
+        client.power(server["id"], "start")
+        return True
+
+    power = {}
+    for server, (started, error) in zip(servers, client.run_all(start_if_stopped, servers)):
+        if error:
+            log("WARN", f"⚠️ {server['name']} API 操作失败，改用浏览器检查: {error}")
+        else:
+            log("INFO", f"{'▶️' if started else '🟢'} {server['name']}: {'已启动' if started else '正在运行'}")
+            power[server["id"]] = {"needed": started, "done": started}
+
+    return servers, power, save_cookies_for_update(client.cookies())
+
+
 def check_and_renew(page) -> dict:
     """
     检查续约信息并执行续约
@@ -328,16 +357,8 @@ def check_and_renew(page) -> dict:
     }
     
     try:
-        # 等待页面加载
-        page.wait_for_timeout(2000)
-        
         # 1. 获取余额
-        balance_selectors = [
-            'code.RenewServerBox___StyledCode-sc-pwczq4-3',
-            '.RenewServerBox___StyledDiv2-sc-pwczq4-2 code',
-            'code.TqUPO'
-        ]
-        for selector in balance_selectors:
+        for selector in BALANCE_SELECTORS:
             balance_elem = page.locator(selector)
             if balance_elem.count() > 0:
                 result["balance"] = balance_elem.first.inner_text().strip()
@@ -408,7 +429,7 @@ def check_and_renew(page) -> dict:
             # 点击续约按钮
             log("INFO", "🔄 点击续约按钮...")
             renew_btn.click()
-            page.wait_for_timeout(2000)
+            wait_selector_sync(page, 'button:has-text("Yes, Renew Server")', "续约确认弹窗", baseline=2000, timeout=5000)
             
             # 等待确认弹窗出现并点击 "Yes, Renew Server"
             confirm_selectors = [
@@ -424,8 +445,9 @@ def check_and_renew(page) -> dict:
                     confirm_btn = page.locator(selector)
                     if confirm_btn.count() > 0 and confirm_btn.first.is_visible():
                         log("INFO", "📝 找到确认按钮，点击 'Yes, Renew Server'...")
-                        confirm_btn.first.click()
-                        page.wait_for_timeout(3000)
+                        wait_response_sync(page, confirm_btn.first.click,
+                                           lambda r: r.request.method == "POST" and "/api/client/servers/" in r.url,
+                                           "续约API响应", baseline=3000)
                         confirm_clicked = True
                         break
                 except:
@@ -467,6 +489,19 @@ def main():
         notify_telegram(False, "初始化失败", "Cookie 环境变量未设置")
         sys.exit(1)
     
+    # api_power 为 None 表示 API 不可用，首页、服务器列表和电源操作全部走浏览器
+    api_listed, api_power = [], None
+    if PANEL_MODE == "api":
+        try:
+            outcome = power_via_api(preset_cookies)
+        except Exception as e:
+            # API 路径的任何意外错误都不能影响浏览器流程
+            log("WARN", f"⚠️ API 流程出错，改用浏览器: {e}")
+            outcome = None
+        if outcome:
+            api_listed, api_power, new_cookie_str = outcome
+            preset_cookies = new_cookie_str or preset_cookies
+    
     log("INFO", "🌐 启动浏览器...")
     
     with sync_playwright() as p:
@@ -524,7 +559,10 @@ def main():
                 except Exception as e:
                     log("WARN", f"解析 API 响应失败: {e}")
         
-        page.on("response", handle_response)
+        if api_power is None:
+            page.on("response", handle_response)
+        else:
+            api_servers.extend(api_listed)
         
         final_screenshot = None
         new_cookie_str = ""  # 用于最后更新
@@ -536,43 +574,47 @@ def main():
             if cookies:
                 context.add_cookies(cookies)
             
-            # 2. 访问首页
-            log("INFO", f"🔗 访问 {BASE_URL}...")
-            page.goto(BASE_URL, wait_until="networkidle", timeout=60000)
-            page.wait_for_timeout(5000)
+            if api_power is None:
+                # 2. 访问首页
+                log("INFO", f"🔗 访问 {BASE_URL}...")
+                wait_response_sync(page, lambda: page.goto(BASE_URL, wait_until="networkidle", timeout=60000),
+                                   lambda r: "/api/client" in r.url and "page=" in r.url,
+                                   "服务器列表 API", baseline=5000, timeout=10000)
             
-            current_url = page.url
-            title = page.title()
-            log("INFO", f"当前 URL: {current_url}")
-            log("INFO", f"页面标题: {title}")
+                current_url = page.url
+                title = page.title()
+                log("INFO", f"当前 URL: {current_url}")
+                log("INFO", f"页面标题: {title}")
             
-            # 3. 检查登录状态
-            if "/auth/login" in current_url:
-                sp = screenshot_path("01-need-login")
-                page.screenshot(path=sp, full_page=True)
-                log("ERROR", "❌ Cookie 已失效，需要重新登录")
-                notify_telegram(False, "登录检查", "Cookie 已失效，请更新 Cookie", sp)
-                sys.exit(1)
+                # 3. 检查登录状态
+                if "/auth/login" in current_url:
+                    sp = screenshot_path("01-need-login")
+                    page.screenshot(path=sp, full_page=True)
+                    log("ERROR", "❌ Cookie 已失效，需要重新登录")
+                    notify_telegram(False, "登录检查", "Cookie 已失效，请更新 Cookie", sp)
+                    sys.exit(1)
             
-            log("INFO", "✅ Cookie 有效，已登录")
+                log("INFO", "✅ Cookie 有效，已登录")
             
-            # 移除 API 拦截
-            page.remove_listener("response", handle_response)
+                # 移除 API 拦截
+                page.remove_listener("response", handle_response)
             
-            # 关闭可能的弹窗
-            try:
-                dismiss_btn = page.locator('text=Dismiss').first
-                if dismiss_btn.is_visible():
-                    dismiss_btn.click()
-                    log("INFO", "关闭公告弹窗")
-                    page.wait_for_timeout(1000)
-            except:
-                pass
+                # 关闭可能的弹窗
+                try:
+                    dismiss_btn = page.locator('text=Dismiss').first
+                    if dismiss_btn.is_visible():
+                        dismiss_btn.click()
+                        log("INFO", "关闭公告弹窗")
+                        wait_selector_sync(page, 'text=Dismiss', "公告弹窗关闭", state="hidden", baseline=1000, timeout=3000)
+                except:
+                    pass
             
-            # 4. 截图 Dashboard
-            sp_dashboard = screenshot_path("02-dashboard")
-            page.screenshot(path=sp_dashboard, full_page=True)
-            final_screenshot = sp_dashboard
+                # 4. 截图 Dashboard
+                sp_dashboard = screenshot_path("02-dashboard")
+                page.screenshot(path=sp_dashboard, full_page=True)
+                final_screenshot = sp_dashboard
+            else:
+                log("INFO", "⏭️ 已通过 API 获取服务器列表，跳过首页")
             
             # 5. 获取服务器列表
             servers = api_servers
@@ -609,30 +651,38 @@ def main():
                 try:
                     # ========== 步骤 A: 检查重启状态 ==========
                     log("INFO", "")
-                    log("INFO", "📍 步骤 A: 检查重启状态...")
-                    page.goto(server_url, wait_until="networkidle", timeout=60000)
-                    page.wait_for_timeout(3000)
+                    if api_power is not None and server_id in api_power:
+                        log("INFO", "📍 步骤 A: 已通过 API 完成")
+                        server_result["restart"] = api_power[server_id]
+                    else:
+                        log("INFO", "📍 步骤 A: 检查重启状态...")
+                        page.goto(server_url, wait_until="networkidle", timeout=60000)
+                        wait_selector_sync(page, '#power-start, #power-restart, #power-stop', "电源按钮",
+                                           state="attached", baseline=3000, timeout=10000)
                     
-                    sp_console = screenshot_path(f"04-console-{idx + 1}")
-                    page.screenshot(path=sp_console, full_page=True)
+                        sp_console = screenshot_path(f"04-console-{idx + 1}")
+                        page.screenshot(path=sp_console, full_page=True)
                     
-                    need_restart = check_need_restart(page)
-                    server_result["restart"]["needed"] = need_restart
+                        need_restart = check_need_restart(page)
+                        server_result["restart"]["needed"] = need_restart
                     
-                    if need_restart:
-                        restart_success = do_restart(page)
-                        server_result["restart"]["done"] = restart_success
+                        if need_restart:
+                            restart_success = do_restart(page)
+                            server_result["restart"]["done"] = restart_success
                         
-                        sp_after_restart = screenshot_path(f"05-after-restart-{idx + 1}")
-                        page.screenshot(path=sp_after_restart, full_page=True)
-                        final_screenshot = sp_after_restart
+                            sp_after_restart = screenshot_path(f"05-after-restart-{idx + 1}")
+                            page.screenshot(path=sp_after_restart, full_page=True)
+                            final_screenshot = sp_after_restart
                     
                     # ========== 步骤 B: 检查续约状态 ==========
                     log("INFO", "")
                     log("INFO", "📍 步骤 B: 检查续约状态...")
                     settings_url = f"{server_url}/settings"
                     page.goto(settings_url, wait_until="networkidle", timeout=60000)
-                    page.wait_for_timeout(3000)
+                    # 原来这里和 check_and_renew 开头各固定等待 3 秒 / 2 秒；
+                    # 等总会出现的余额而不是续约按钮，不需要续约时也不会等到上限
+                    wait_selector_sync(page, ", ".join(BALANCE_SELECTORS), "续约信息",
+                                       baseline=5000, timeout=5000)
                     
                     sp_settings = screenshot_path(f"06-settings-{idx + 1}")
                     page.screenshot(path=sp_settings, full_page=True)
@@ -679,8 +729,6 @@ def main():
                 except Exception as e:
                     log("ERROR", f"❌ {server_name} 操作失败: {e}")
                     results.append(f"❌ {server_name}: {str(e)[:30]}")
-                
-                page.wait_for_timeout(2000)
             
             # 7. 保存并更新 Cookie（放在最后）
             log("INFO", "")
@@ -695,6 +743,7 @@ def main():
             log("INFO", "")
             log("INFO", "=" * 50)
             log("INFO", "📊 执行完成")
+            log("INFO", wait_summary())
             log("INFO", "=" * 50)
             
             detail_msg = "\n".join(results)
@@ -4,6 +4,11 @@
 Castle-Host 服务器自动续约脚本 (带截图 & 代理支持)
 功能：多账号支持 + 自动启动关机服务器 + Cookie自动更新 + 截图通知 + 自动识别代理
 配置变量: CASTLE_COOKIES=PHPSESSID=xxx; uid=xxx,PHPSESSID=xxx; uid=xxx  (多账号用,逗号分隔)
+         CASTLE_CONCURRENCY=3  (同时处理的账号数；所有账号共用一个浏览器，每个账号独立的 BrowserContext)
+         CASTLE_SERVER_CONCURRENCY=3  (同一账号内同时续约的服务器数，每个服务器一个页面)
+         CASTLE_MODE=http  (http: 用 aiohttp 直接调用启动 / 续约接口，只在响应无法识别、
+                            页面没有续约表单或需要失败截图时启动浏览器（截图不会再次续约）；
+                            browser: 全程使用浏览器)
 """
 
 import os
@@ -11,26 +16,60 @@ import sys
 import re
 import logging
 import asyncio
+import contextvars
 import aiohttp
+from yarl import URL
 from pathlib import Path
 from enum import Enum
-from base64 import b64encode
 from datetime import datetime
 from dataclasses import dataclass
 from typing import Optional, Tuple, List, Dict
-from playwright.async_api import async_playwright, BrowserContext, Page
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+
+from github_api import GitHubClient
+from page_waits import set_logger, summary as wait_summary, wait_response, wait_selector
 
 LOG_FILE = "castle_renew.log"
 REQUEST_TIMEOUT = 30
 PAGE_TIMEOUT = 60000
 OUTPUT_DIR = Path("output/screenshots")
+ACCOUNT_CONCURRENCY = int(os.environ.get("CASTLE_CONCURRENCY", "3"))
+SERVER_CONCURRENCY = int(os.environ.get("CASTLE_SERVER_CONCURRENCY", "3"))
+
+# http: 直接调用 JSON 接口，只在需要时（接口响应异常 / 失败截图）启动浏览器；browser: 全程浏览器
+MODE = os.environ.get("CASTLE_MODE", "http").strip().lower()
+PROXY_HTTP = os.environ.get("PROXY_HTTP")
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+
+SERVERS_ID_RE = re.compile(r'var\s+ServersID\s*=\s*\[([\d,\s]+)\]')
+EXPIRY_RE = re.compile(r"(\d{2}\.\d{2}\.\d{4})")
+CSRF_META_RE = re.compile(
+    r'<meta[^>]+name=["\'](?:csrf[-_]token|_token)["\'][^>]+content=["\']([^"\']+)', re.I)
+FORM_RE = re.compile(r'<form\b([^>]*)>(.*?)</form>', re.I | re.S)
+INPUT_RE = re.compile(r'<(?:input|select|textarea)\b[^>]*>', re.I)
+ATTR_RE = re.compile(r'([\w-]+)=["\']([^"\']*)["\']')
+BUY_MONTHS_RE = re.compile(r'["\']((?:https?://[^"\']+)?/servers/pay/buy_months/[^"\']*)["\']')
+
+# 账号并发处理时日志会交错，每条日志带上当前账号（每个任务有自己的上下文）
+current_account = contextvars.ContextVar("current_account", default="")
+
+
+class AccountFilter(logging.Filter):
+    def filter(self, record):
+        record.account = current_account.get()
+        return True
+
 
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
+    format="%(asctime)s - %(levelname)s - %(account)s%(message)s",
     handlers=[logging.StreamHandler(sys.stdout), logging.FileHandler(LOG_FILE, encoding="utf-8")]
 )
+for _handler in logging.getLogger().handlers:
+    _handler.addFilter(AccountFilter())
 logger = logging.getLogger(__name__)
+set_logger(logger.info)
 
 
 class RenewalStatus(Enum):
@@ -48,6 +87,7 @@ class ServerResult:
     days: int = 0
     started: bool = False
     screenshot: str = ""
+    stage: str = ""
 
 
 @dataclass
@@ -97,6 +137,63 @@ def days_left(s: str) -> int:
         return 0
 
 
+def classify_renewal(data: dict) -> Optional[Tuple[RenewalStatus, str, str]]:
+    """/servers/pay/buy_months/ 的 JSON 响应 → (状态, 说明, 截图阶段)；无法识别时返回 None"""
+    if not isinstance(data, dict):
+        return None
+    if data.get("status") == "success":
+        return RenewalStatus.SUCCESS, "续约成功", "success"
+    if data.get("status") != "error":
+        return None
+
+    error_msg = data.get("error", "未知错误")
+    m = error_msg.lower()
+    if "24 час" in m or "уже продлен" in m:
+        return RenewalStatus.RATE_LIMITED, "今日已续期(24小时限制)", "limited"
+    if "недостаточно" in m:
+        return RenewalStatus.FAILED, "余额不足", "failed"
+    if "валидации" in m:
+        return RenewalStatus.FAILED, "CSRF验证失败", "csrf_failed"
+    return RenewalStatus.FAILED, error_msg, "failed"
+
+
+def log_result(status: RenewalStatus, msg: str):
+    logger.info(f"📝 结果: {'✅ ' if status == RenewalStatus.SUCCESS else ''}{msg}")
+
+
+def parse_server_ids(html: str) -> List[str]:
+    match = SERVERS_ID_RE.search(html)
+    return [x.strip() for x in match.group(1).split(",") if x.strip()] if match else []
+
+
+def find_csrf(html: str) -> str:
+    """<meta name="csrf-token"> 中的 token（页面脚本用它设置 X-CSRF-Token 头），没有时为空"""
+    match = CSRF_META_RE.search(html)
+    return match.group(1) if match else ""
+
+
+def renewal_form(html: str) -> Optional[Tuple[str, Dict[str, str]]]:
+    """
+    包含 #freebtn 或指向 buy_months 的 <form> → (action, 字段)，只取这个表单里的字段；
+    页面没有这样的表单时返回 None（由浏览器点击按钮）
+    """
+    for attrs, body in FORM_RE.findall(html):
+        action = dict(ATTR_RE.findall(attrs)).get("action", "")
+        if "freebtn" not in body and "/buy_months/" not in action:
+            continue
+        fields = {}
+        for tag in INPUT_RE.findall(body):
+            field = dict((k.lower(), v) for k, v in ATTR_RE.findall(tag))
+            kind = field.get("type", "").lower()
+            if not field.get("name") or kind in ("submit", "button", "image", "file"):
+                continue
+            if kind in ("checkbox", "radio") and not re.search(r'\bchecked\b', tag, re.I):
+                continue
+            fields[field["name"]] = field.get("value", "")
+        return action, fields
+    return None
+
+
 def parse_cookies(s: str) -> List[Dict]:
     cookies = []
     for p in s.split(";"):
@@ -155,47 +252,35 @@ class Notifier:
 class GitHubManager:
     def __init__(self, token: Optional[str], repo: Optional[str]):
         self.token, self.repo = token, repo
-        self.headers = {"Authorization": f"Bearer {token}", "Accept": "application/vnd.github+json"} if token else {}
+        self.client = GitHubClient(token, repo) if token and repo else None
 
     async def update_secret(self, name: str, value: str) -> bool:
-        if not self.token or not self.repo:
+        if not self.client:
             return False
         try:
-            from nacl import encoding, public
-            async with aiohttp.ClientSession() as s:
-                async with s.get(
-                    f"https://api.github.com/repos/{self.repo}/actions/secrets/public-key",
-                    headers=self.headers
-                ) as r:
-                    if r.status != 200:
-                        return False
-                    kd = await r.json()
-                pk = public.PublicKey(kd["key"].encode(), encoding.Base64Encoder())
-                enc = b64encode(public.SealedBox(pk).encrypt(value.encode())).decode()
-                async with s.put(
-                    f"https://api.github.com/repos/{self.repo}/actions/secrets/{name}",
-                    headers=self.headers,
-                    json={"encrypted_value": enc, "key_id": kd["key_id"]}
-                ) as r:
-                    if r.status in [201, 204]:
-                        logger.info(f"✅ Secret {name} 已更新")
-                        return True
+            await asyncio.to_thread(self.client.update_secret, name, value)
+            logger.info(f"✅ Secret {name} 已更新")
+            return True
         except Exception as e:
             logger.error(f"❌ GitHub异常: {e}")
         return False
 
 
 class CastleClient:
+    """
+    self.page 用于读取服务器列表（ServersID）和截图
+    每个服务器在同一个上下文中单独开一个页面：先在该页面的服务器列表上启动，再续约，可以并行
+    """
     BASE = "https://cp.castle-host.com"
 
     def __init__(self, ctx: BrowserContext, page: Page, account_idx: int):
         self.ctx, self.page = ctx, page
         self.account_idx = account_idx
 
-    async def take_screenshot(self, server_id: str, stage: str) -> str:
+    async def take_screenshot(self, server_id: str, stage: str, page: Optional[Page] = None) -> str:
         try:
             path = screenshot_path(self.account_idx, server_id, stage)
-            await self.page.screenshot(path=path, full_page=True)
+            await (page or self.page).screenshot(path=path, full_page=True)
             logger.info("📸 截图已保存")
             return path
         except Exception as e:
@@ -205,33 +290,30 @@ class CastleClient:
     async def get_server_ids(self) -> List[str]:
         try:
             await self.page.goto(f"{self.BASE}/servers", wait_until="networkidle")
-            await self.page.wait_for_timeout(2000)
-            match = re.search(r'var\s+ServersID\s*=\s*\[([\d,\s]+)\]', await self.page.content())
-            if match:
-                ids = [x.strip() for x in match.group(1).split(",") if x.strip()]
+            ids = parse_server_ids(await self.page.content())
+            if ids:
                 logger.info(f"📋 找到 {len(ids)} 个服务器: {[mask_id(x) for x in ids]}")
                 return ids
         except Exception as e:
             logger.error(f"❌ 获取服务器ID失败: {e}")
         return []
 
-    async def check_server_stopped(self, sid: str) -> bool:
+    async def check_server_stopped(self, sid: str, page: Page) -> bool:
         try:
-            start_btn = self.page.locator(f'button.icon-server-bstop[onclick*="sendAction({sid},\'start\')"]')
+            start_btn = page.locator(f'button.icon-server-bstop[onclick*="sendAction({sid},\'start\')"]')
             if await start_btn.count() > 0:
                 return True
             return False
         except:
             return False
 
-    async def start_server_via_api(self, sid: str) -> bool:
+    async def start_server_via_api(self, sid: str, page: Page) -> bool:
+        """在该服务器自己的页面上打开服务器列表并发送启动指令"""
         masked = mask_id(sid)
         try:
-            if "/servers" not in self.page.url or "/control" in self.page.url or "/pay" in self.page.url:
-                await self.page.goto(f"{self.BASE}/servers", wait_until="networkidle")
-                await self.page.wait_for_timeout(2000)
+            await page.goto(f"{self.BASE}/servers", wait_until="networkidle")
 
-            if not await self.check_server_stopped(sid):
+            if not await self.check_server_stopped(sid, page):
                 logger.info(f"✅ 服务器 {masked} 已在运行")
                 return False
 
@@ -239,32 +321,24 @@ class CastleClient:
 
             response_data = {}
 
-            async def handle_response(response):
-                if "/servers/control/action/" in response.url and "/start" in response.url:
+            logger.info(f"🔄 发送启动指令...")
+            response = await wait_response(
+                page, lambda: page.evaluate(f"sendAction({sid}, 'start')"),
+                f"/servers/control/action/{sid}/start", "启动API响应", baseline=5000)
+            if response:
+                try:
+                    response_data['result'] = await response.json()
+                    logger.info(f"📡 启动API响应: {response_data['result']}")
+                except:
                     try:
-                        response_data['result'] = await response.json()
-                        logger.info(f"📡 启动API响应: {response_data['result']}")
+                        response_data['text'] = await response.text()
                     except:
-                        try:
-                            response_data['text'] = await response.text()
-                        except:
-                            pass
-
-            self.page.on("response", handle_response)
-
-            logger.info(f"🔄 发送启动指令...")
-            await self.page.evaluate(f"sendAction({sid}, 'start')")
-
-            await self.page.wait_for_timeout(5000)
-
-            self.page.remove_listener("response", handle_response)
+                        pass
 
             result = response_data.get('result', {})
             if result.get('status') == 'success':
                 logger.info(f"🟢 服务器 {masked} 启动成功")
-                await self.page.wait_for_timeout(3000)
-                await self.page.goto(f"{self.BASE}/servers", wait_until="networkidle")
-                await self.page.wait_for_timeout(2000)
+                await self.log_status_after_start(sid, page)
                 return True
             elif result.get('status') == 'error':
                 logger.warning(f"⚠️ 启动失败: {result.get('error', '未知错误')}")
@@ -273,9 +347,7 @@ class CastleClient:
                 text = response_data.get('text', '')
                 if 'success' in text.lower():
                     logger.info(f"🟢 服务器 {masked} 启动指令已发送")
-                    await self.page.wait_for_timeout(3000)
-                    await self.page.goto(f"{self.BASE}/servers", wait_until="networkidle")
-                    await self.page.wait_for_timeout(2000)
+                    await self.log_status_after_start(sid, page)
                     return True
                 logger.warning(f"⚠️ 启动响应未知")
                 return False
@@ -284,7 +356,16 @@ class CastleClient:
             logger.error(f"❌ 启动服务器 {masked} 失败: {e}")
         return False
 
-    async def renew(self, sid: str) -> Tuple[RenewalStatus, str, str, str, int]:
+    async def log_status_after_start(self, sid: str, page: Page):
+        """重新加载服务器列表后再读取状态（发送指令前加载的列表已过期）"""
+        try:
+            await page.reload(wait_until="networkidle")
+            stopped = await self.check_server_stopped(sid, page)
+            logger.info(f"📊 服务器 {mask_id(sid)} 当前状态: {'仍显示关机' if stopped else '已启动'}")
+        except Exception as e:
+            logger.warning(f"⚠️ 刷新服务器列表失败: {e}")
+
+    async def renew(self, sid: str, page: Page) -> Tuple[RenewalStatus, str, str, str, int]:
         masked = mask_id(sid)
         screenshot_file = ""
         expiry = ""
@@ -292,86 +373,84 @@ class CastleClient:
 
         try:
             logger.info(f"📄 访问续约页面...")
-            await self.page.goto(f"{self.BASE}/servers/pay/index/{sid}", wait_until="networkidle")
-            await self.page.wait_for_timeout(2000)
+            await page.goto(f"{self.BASE}/servers/pay/index/{sid}", wait_until="networkidle")
+            await wait_selector(page, '#freebtn', "续约按钮", state="attached", baseline=2000, timeout=5000)
 
-            content = await self.page.text_content("body")
-            match = re.search(r"(\d{2}\.\d{2}\.\d{4})", content)
+            content = await page.text_content("body")
+            match = EXPIRY_RE.search(content)
             if match:
                 expiry = match.group(1)
                 days = days_left(expiry)
                 logger.info(f"📅 到期: {convert_date(expiry)} ({days}天)")
 
-            renew_btn = self.page.locator('#freebtn')
+            renew_btn = page.locator('#freebtn')
             if await renew_btn.count() == 0:
                 logger.error(f"❌ 找不到续约按钮")
-                screenshot_file = await self.take_screenshot(sid, "no_button")
+                screenshot_file = await self.take_screenshot(sid, "no_button", page)
                 return RenewalStatus.FAILED, "找不到续约按钮", screenshot_file, expiry, days
 
             response_data = {}
 
-            async def handle_response(response):
-                if "/servers/pay/buy_months/" in response.url:
-                    try:
-                        response_data['result'] = await response.json()
-                    except:
-                        pass
-
-            self.page.on("response", handle_response)
-
             logger.info(f"🖱️ 服务器 {masked} 已请求续约")
-            await renew_btn.click()
+            response = await wait_response(page, renew_btn.click, "/servers/pay/buy_months/",
+                                           "续约API响应", baseline=3000)
+            if response:
+                try:
+                    response_data['result'] = await response.json()
+                except:
+                    pass
 
-            await self.page.wait_for_timeout(3000)
+            data = response_data.get('result', {})
+            outcome = classify_renewal(data)
 
-            self.page.remove_listener("response", handle_response)
+            if outcome and outcome[0] == RenewalStatus.SUCCESS:
+                await wait_selector(page, '.iziToast', "续约提示", baseline=1000, timeout=3000)
+            elif outcome is None:
+                success_toast = page.locator('.iziToast-message:has-text("Успешно")')
+                if await success_toast.count() > 0:
+                    outcome = RenewalStatus.SUCCESS, "续约成功", "success"
 
-            data = response_data.get('result', {})
+            if outcome is None:
+                logger.info(f"📝 结果: 未知响应")
+                screenshot_file = await self.take_screenshot(sid, "unknown", page)
+                return RenewalStatus.FAILED, str(data) if data else "无响应", screenshot_file, expiry, days
 
-            if data.get("status") == "success":
-                logger.info(f"📝 结果: ✅ 续约成功")
-                await self.page.wait_for_timeout(1000)
-                screenshot_file = await self.take_screenshot(sid, "success")
-                return RenewalStatus.SUCCESS, "续约成功", screenshot_file, expiry, days
-
-            success_toast = self.page.locator('.iziToast-message:has-text("Успешно")')
-            if await success_toast.count() > 0:
-                logger.info(f"📝 结果: ✅ 续约成功")
-                screenshot_file = await self.take_screenshot(sid, "success")
-                return RenewalStatus.SUCCESS, "续约成功", screenshot_file, expiry, days
-
-            if data.get("status") == "error":
-                error_msg = data.get("error", "未知错误")
-                m = error_msg.lower()
-
-                if "24 час" in m or "уже продлен" in m:
-                    logger.info(f"📝 结果: 今日已续期(24小时限制)")
-                    screenshot_file = await self.take_screenshot(sid, "limited")
-                    return RenewalStatus.RATE_LIMITED, "今日已续期(24小时限制)", screenshot_file, expiry, days
-
-                if "недостаточно" in m:
-                    logger.info(f"📝 结果: 余额不足")
-                    screenshot_file = await self.take_screenshot(sid, "failed")
-                    return RenewalStatus.FAILED, "余额不足", screenshot_file, expiry, days
-
-                if "валидации" in m:
-                    logger.info(f"📝 结果: CSRF验证失败")
-                    screenshot_file = await self.take_screenshot(sid, "csrf_failed")
-                    return RenewalStatus.FAILED, "CSRF验证失败", screenshot_file, expiry, days
-
-                logger.info(f"📝 结果: {error_msg}")
-                screenshot_file = await self.take_screenshot(sid, "failed")
-                return RenewalStatus.FAILED, error_msg, screenshot_file, expiry, days
-
-            logger.info(f"📝 结果: 未知响应")
-            screenshot_file = await self.take_screenshot(sid, "unknown")
-            return RenewalStatus.FAILED, str(data) if data else "无响应", screenshot_file, expiry, days
+            status, msg, stage = outcome
+            log_result(status, msg)
+            screenshot_file = await self.take_screenshot(sid, stage, page)
+            return status, msg, screenshot_file, expiry, days
 
         except Exception as e:
             logger.error(f"❌ 续约服务器 {masked} 异常: {e}")
-            screenshot_file = await self.take_screenshot(sid, "exception")
+            screenshot_file = await self.take_screenshot(sid, "exception", page)
             return RenewalStatus.FAILED, str(e), screenshot_file, expiry, days
 
+    async def capture(self, sid: str, stage: str) -> str:
+        """只打开续约页面截图，不点击续约（HTTP 模式已经得到明确的失败结果）"""
+        try:
+            await self.page.goto(f"{self.BASE}/servers/pay/index/{sid}", wait_until="networkidle")
+        except Exception as e:
+            logger.warning(f"⚠️ 打开续约页面失败: {e}")
+        return await self.take_screenshot(sid, stage)
+
+    async def process_server(self, sid: str, semaphore: asyncio.Semaphore) -> ServerResult:
+        """启动（如已关机）并在独立页面中续约一个服务器"""
+        async with semaphore:
+            logger.info(f"--- 处理服务器 {mask_id(sid)} ---")
+            page = await self.ctx.new_page()
+            page.set_default_timeout(PAGE_TIMEOUT)
+            try:
+                started = await self.start_server_via_api(sid, page)
+                status, msg, screenshot, expiry, days = await self.renew(sid, page)
+            finally:
+                await page.close()
+            return ServerResult(sid, status, msg, expiry, days, started, screenshot)
+
+    async def process_servers(self, server_ids: List[str]) -> List[ServerResult]:
+        """同一账号的服务器并行处理（SERVER_CONCURRENCY 限制），结果按 server_ids 顺序返回"""
+        semaphore = asyncio.Semaphore(max(1, SERVER_CONCURRENCY))
+        return list(await asyncio.gather(*(self.process_server(sid, semaphore) for sid in server_ids)))
+
     async def extract_cookies(self) -> Optional[str]:
         try:
             cc = [c for c in await self.ctx.cookies() if "castle-host.com" in c.get("domain", "")]
@@ -380,42 +459,272 @@ class CastleClient:
             return None
 
 
-async def process_account(cookie_str: str, idx: int, notifier: Notifier) -> Tuple[Optional[str], List[ServerResult]]:
-    cookies = parse_cookies(cookie_str)
-    if not cookies:
-        logger.error(f"❌ 账号#{idx + 1} Cookie解析失败")
-        return None, []
+class CastleHttpClient:
+    """
+    HTTP 模式：复用账号 Cookie 直接调用 sendAction / #freebtn 背后的两个 JSON 接口，不启动浏览器
+    CSRF token 在 /servers 页面的 meta 中取一次，只作为 X-CSRF-Token 头发送；续约只提交续约表单里的字段
+    响应无法识别或页面没有续约表单时返回 None，由调用方改用浏览器处理该服务器
+    """
+    BASE = CastleClient.BASE
 
-    logger.info(f"{'=' * 50}")
-    logger.info(f"📌 处理账号 #{idx + 1}")
-
-    async with async_playwright() as p:
-        # ---------------------------------------------------------
-        # 【代理配置核心逻辑】读取系统环境变量自动挂载代理
-        # ---------------------------------------------------------
-        # proxy_server = os.environ.get("PROXY_SOCKS5") or os.environ.get("PROXY_HTTP")
-        proxy_server = os.environ.get("PROXY_HTTP") or os.environ.get("PROXY_SOCKS5")
-        launch_args = {"headless": True, "args": ["--no-sandbox"]}
-        
-        if proxy_server:
-            launch_args["proxy"] = {"server": proxy_server}
-            logger.info(f"🌐 已启用 Playwright 代理: {proxy_server}")
+    def __init__(self, cookie_str: str):
+        self.session = aiohttp.ClientSession(
+            headers={"User-Agent": USER_AGENT},
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        )
+        self.session.cookie_jar.update_cookies(
+            {c["name"]: c["value"] for c in parse_cookies(cookie_str)}, URL(self.BASE))
+        self.csrf = ""
+        self.servers_html = ""
+
+    async def __aenter__(self) -> "CastleHttpClient":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    async def _get(self, path: str) -> Tuple[str, str]:
+        """返回 (最终 URL, HTML)"""
+        async with self.session.get(f"{self.BASE}{path}", proxy=PROXY_HTTP) as r:
+            r.raise_for_status()
+            return str(r.url), await r.text()
+
+    async def _post_json(self, url: str, data: Dict[str, str], referer: str) -> Optional[dict]:
+        headers = {"X-Requested-With": "XMLHttpRequest", "Referer": referer, "Origin": self.BASE}
+        if self.csrf:
+            headers["X-CSRF-Token"] = self.csrf
+        async with self.session.post(url if url.startswith("http") else f"{self.BASE}{url}",
+                                     data=data, headers=headers, proxy=PROXY_HTTP) as r:
+            try:
+                result = await r.json(content_type=None)
+            except ValueError:
+                logger.warning(f"⚠️ 接口返回非 JSON: HTTP {r.status}")
+                return None
+        return result if isinstance(result, dict) else None
+
+    async def get_server_ids(self) -> Optional[List[str]]:
+        """Cookie 失效（跳转到登录页）或页面里没有 ServersID 时返回 None"""
+        url, html = await self._get("/servers")
+        if "login" in url:
+            return None
+        self.csrf = find_csrf(html)
+        self.servers_html = html
+        ids = parse_server_ids(html)
+        if not ids:
+            return None
+        logger.info(f"📋 找到 {len(ids)} 个服务器: {[mask_id(x) for x in ids]}"
+                    + ("" if self.csrf else "（未找到 CSRF token）"))
+        return ids
+
+    def server_stopped(self, sid: str) -> bool:
+        """与 CastleClient.check_server_stopped 相同：列表中有该服务器的启动按钮"""
+        action = re.compile(rf"sendAction\(\s*{sid}\s*,\s*'start'\s*\)")
+        return any("icon-server-bstop" in tag and action.search(tag)
+                   for tag in re.findall(r"<button[^>]*>", self.servers_html))
+
+    async def start_server(self, sid: str) -> Optional[bool]:
+        """True 已启动，False 无需启动或启动失败，None 响应无法识别"""
+        masked = mask_id(sid)
+        if not self.server_stopped(sid):
+            logger.info(f"✅ 服务器 {masked} 已在运行")
+            return False
+        logger.info(f"🔴 服务器 {masked} 已关机，发送启动请求...")
+        result = await self._post_json(f"/servers/control/action/{sid}/start", {}, f"{self.BASE}/servers")
+        logger.info(f"📡 启动API响应: {result}")
+        if not result or result.get("status") not in ("success", "error"):
+            return None
+        if result["status"] == "success":
+            logger.info(f"🟢 服务器 {masked} 启动成功")
+            return True
+        logger.warning(f"⚠️ 启动失败: {result.get('error', '未知错误')}")
+        return False
+
+    async def renew(self, sid: str) -> Optional[Tuple[RenewalStatus, str, str, str, int]]:
+        """返回 (状态, 说明, 截图阶段, 到期, 剩余天数)；找不到续约表单或响应无法识别时返回 None"""
+        referer = f"{self.BASE}/servers/pay/index/{sid}"
+        _, html = await self._get(f"/servers/pay/index/{sid}")
+        expiry, days = "", 0
+        match = EXPIRY_RE.search(html)
+        if match:
+            expiry = match.group(1)
+            days = days_left(expiry)
+            logger.info(f"📅 到期: {convert_date(expiry)} ({days}天)")
+
+        form = renewal_form(html)
+        if form is None:
+            logger.warning(f"⚠️ 续约页面没有续约表单，改用浏览器")
+            return None
+
+        # 表单没有 action 时用页面脚本里的接口地址
+        action, fields = form
+        match = BUY_MONTHS_RE.search(html)
+        url = action or (match.group(1) if match else "")
+        if not url:
+            logger.warning(f"⚠️ 找不到续约接口地址，改用浏览器")
+            return None
+        logger.info(f"🖱️ 服务器 {mask_id(sid)} 已请求续约 (HTTP)")
+        outcome = classify_renewal(await self._post_json(url, fields, referer))
+        if outcome is None:
+            return None
+        status, msg, stage = outcome
+        log_result(status, msg)
+        return status, msg, stage, expiry, days
+
+    async def process_server(self, sid: str, semaphore: asyncio.Semaphore) -> Optional[ServerResult]:
+        """None 表示需要浏览器处理"""
+        async with semaphore:
+            logger.info(f"--- 处理服务器 {mask_id(sid)} (HTTP) ---")
+            try:
+                started = await self.start_server(sid)
+                if started is None:
+                    return None
+                outcome = await self.renew(sid)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"⚠️ 服务器 {mask_id(sid)} HTTP 请求失败: {e}")
+                return None
+            if outcome is None:
+                return None
+            status, msg, stage, expiry, days = outcome
+            return ServerResult(sid, status, msg, expiry, days, started, stage=stage)
+
+    async def process_servers(self, server_ids: List[str]) -> Dict[str, Optional[ServerResult]]:
+        semaphore = asyncio.Semaphore(max(1, SERVER_CONCURRENCY))
+        results = await asyncio.gather(*(self.process_server(sid, semaphore) for sid in server_ids))
+        return dict(zip(server_ids, results))
+
+    def cookie_string(self) -> Optional[str]:
+        cc = list(self.session.cookie_jar)
+        return "; ".join(f"{c.key}={c.value}" for c in cc) if cc else None
+
+
+class SharedBrowser:
+    """HTTP 模式下多数运行用不到浏览器：第一次需要时才启动 Chromium，之后各账号共用"""
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.playwright = None
+        self.browser: Optional[Browser] = None
+
+    async def get(self) -> Browser:
+        async with self.lock:
+            if self.browser is None:
+                self.playwright = await async_playwright().start()
+                self.browser = await launch_browser(self.playwright)
+            return self.browser
+
+    async def close(self):
+        if self.browser:
+            await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+
+
+async def launch_browser(p) -> Browser:
+    # ---------------------------------------------------------
+    # 【代理配置核心逻辑】读取系统环境变量自动挂载代理
+    # ---------------------------------------------------------
+    # proxy_server = os.environ.get("PROXY_SOCKS5") or os.environ.get("PROXY_HTTP")
+    proxy_server = os.environ.get("PROXY_HTTP") or os.environ.get("PROXY_SOCKS5")
+    launch_args = {"headless": True, "args": ["--no-sandbox"]}
+    
+    if proxy_server:
+        launch_args["proxy"] = {"server": proxy_server}
+        logger.info(f"🌐 已启用 Playwright 代理: {proxy_server}")
+    else:
+        logger.info("🌐 未检测到代理环境变量，将使用直连模式")
+    
+    return await p.chromium.launch(**launch_args)
+
+
+async def notify_results(notifier: Notifier, idx: int, results: List[ServerResult]):
+    for r in results:
+        if r.status == RenewalStatus.SUCCESS:
+            status_icon, status_text = "✅", "续约成功"
+        elif r.status == RenewalStatus.RATE_LIMITED:
+            status_icon, status_text = "⏭️", "今日已续期"
         else:
-            logger.info("🌐 未检测到代理环境变量，将使用直连模式")
-        
-        browser = await p.chromium.launch(**launch_args)
-        
-        ctx = await browser.new_context(
-            viewport={"width": 1920, "height": 1080}
+            status_icon, status_text = "❌", f"续约失败: {r.message}"
+
+        started_line = "🟢 服务器已启动\n" if r.started else ""
+        masked_id = mask_id(r.server_id)
+        caption = (
+            f"🖥️ Castle-Host 自动续约\n\n"
+            f"状态: {status_icon} {status_text}\n"
+            f"账号: #{idx + 1}\n\n"
+            f"💻 服务器: {masked_id}\n"
+            f"📅 到期: {convert_date(r.expiry)}\n"
+            f"⏳ 剩余: {r.days} 天\n"
+            f"{started_line}\n"
+            f"⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         )
-        
-        await ctx.add_cookies(cookies)
-        page = await ctx.new_page()
-        page.set_default_timeout(PAGE_TIMEOUT)
-        client = CastleClient(ctx, page, idx)
-        results: List[ServerResult] = []
+        await notifier.send_photo(caption, r.screenshot)
 
-        try:
+
+async def renew_via_http(cookie_str: str) -> Optional[Tuple[Dict[str, Optional[ServerResult]], Optional[str]]]:
+    """返回 ({服务器ID: 结果或 None}, 新 Cookie)；整个账号需要改用浏览器时返回 None"""
+    try:
+        async with CastleHttpClient(cookie_str) as http:
+            server_ids = await http.get_server_ids()
+            if not server_ids:
+                logger.warning("⚠️ HTTP 模式未取到服务器列表（Cookie 失效或页面变化），改用浏览器")
+                return None
+            return await http.process_servers(server_ids), http.cookie_string()
+    except Exception as e:
+        logger.warning(f"⚠️ HTTP 模式失败，改用浏览器: {e}")
+        return None
+
+
+async def open_context(browser: Browser, cookie_str: str) -> Tuple[BrowserContext, Page]:
+    # 每个账号独立的上下文（Cookie / 存储互相隔离），浏览器进程共用
+    ctx = await browser.new_context(
+        viewport={"width": 1920, "height": 1080}
+    )
+
+    await ctx.add_cookies(parse_cookies(cookie_str))
+    page = await ctx.new_page()
+    page.set_default_timeout(PAGE_TIMEOUT)
+    return ctx, page
+
+
+async def capture_via_browser(shared: SharedBrowser, cookie_str: str, idx: int, results: List[ServerResult]):
+    """HTTP 模式下明确失败（余额不足、CSRF 验证失败等）的服务器只补一张截图，不再提交续约"""
+    try:
+        browser = await shared.get()
+    except Exception as e:
+        logger.error(f"❌ 启动浏览器失败，跳过失败截图: {e}")
+        return
+    try:
+        ctx, page = await open_context(browser, cookie_str)
+    except Exception as e:
+        logger.error(f"❌ 创建浏览器上下文失败，跳过失败截图: {e}")
+        return
+    client = CastleClient(ctx, page, idx)
+    try:
+        for r in results:
+            r.screenshot = await client.capture(r.server_id, r.stage or "failed")
+    finally:
+        await ctx.close()
+
+
+async def renew_via_browser(shared: SharedBrowser, cookie_str: str, idx: int, notifier: Notifier,
+                            server_ids: Optional[List[str]] = None
+                            ) -> Tuple[Optional[List[ServerResult]], Optional[str]]:
+    """
+    浏览器流程；server_ids 为 None 时从服务器列表页获取
+    返回 (结果, 新 Cookie)，Cookie 失效或异常时已发送通知并返回 (None, None)
+    """
+    try:
+        browser = await shared.get()
+    except Exception as e:
+        logger.error(f"❌ 启动浏览器失败: {e}")
+        await notifier.send(f"❌ Castle-Host 账号#{idx + 1}\n\n启动浏览器失败: {e}")
+        return None, None
+
+    ctx, page = await open_context(browser, cookie_str)
+    client = CastleClient(ctx, page, idx)
+
+    try:
+        if server_ids is None:
             server_ids = await client.get_server_ids()
             if not server_ids:
                 if "login" in page.url:
@@ -426,61 +735,65 @@ async def process_account(cookie_str: str, idx: int, notifier: Notifier) -> Tupl
                         f"⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
                         error_screenshot
                     )
-                return None, []
+                return None, None
+
+        results = await client.process_servers(server_ids)
+        return results, await client.extract_cookies()
+
+    except Exception as e:
+        logger.error(f"❌ 账号#{idx + 1} 异常: {e}")
+        error_screenshot = await client.take_screenshot("error", "exception")
+        await notifier.send_photo(
+            f"❌ Castle-Host 账号#{idx + 1}\n\n异常: {e}\n\n"
+            f"⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            error_screenshot
+        )
+        return None, None
+    finally:
+        await ctx.close()
 
-            for sid in server_ids:
-                masked = mask_id(sid)
-                logger.info(f"--- 处理服务器 {masked} ---")
-
-                started = await client.start_server_via_api(sid)
-                status, msg, screenshot, expiry, days = await client.renew(sid)
-
-                results.append(ServerResult(sid, status, msg, expiry, days, started, screenshot))
-
-                if len(server_ids) > 1 and sid != server_ids[-1]:
-                    await page.goto(f"{client.BASE}/servers", wait_until="networkidle")
-                    await page.wait_for_timeout(2000)
-
-            for r in results:
-                if r.status == RenewalStatus.SUCCESS:
-                    status_icon, status_text = "✅", "续约成功"
-                elif r.status == RenewalStatus.RATE_LIMITED:
-                    status_icon, status_text = "⏭️", "今日已续期"
-                else:
-                    status_icon, status_text = "❌", f"续约失败: {r.message}"
-
-                started_line = "🟢 服务器已启动\n" if r.started else ""
-                masked_id = mask_id(r.server_id)
-                caption = (
-                    f"🖥️ Castle-Host 自动续约\n\n"
-                    f"状态: {status_icon} {status_text}\n"
-                    f"账号: #{idx + 1}\n\n"
-                    f"💻 服务器: {masked_id}\n"
-                    f"📅 到期: {convert_date(r.expiry)}\n"
-                    f"⏳ 剩余: {r.days} 天\n"
-                    f"{started_line}\n"
-                    f"⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                )
-                await notifier.send_photo(caption, r.screenshot)
-
-            new_cookie = await client.extract_cookies()
-            if new_cookie and new_cookie != cookie_str:
-                logger.info(f"🔄 账号#{idx + 1} Cookie已变化")
-                return new_cookie, results
-            return cookie_str, results
 
-        except Exception as e:
-            logger.error(f"❌ 账号#{idx + 1} 异常: {e}")
-            error_screenshot = await client.take_screenshot("error", "exception")
-            await notifier.send_photo(
-                f"❌ Castle-Host 账号#{idx + 1}\n\n异常: {e}\n\n"
-                f"⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-                error_screenshot
-            )
-            return None, []
-        finally:
-            await ctx.close()
-            await browser.close()
+async def process_account(shared: SharedBrowser, cookie_str: str, idx: int, notifier: Notifier,
+                          semaphore: asyncio.Semaphore, mode: str) -> Tuple[Optional[str], List[ServerResult]]:
+    current_account.set(f"[#{idx + 1}] ")
+    if not parse_cookies(cookie_str):
+        logger.error(f"❌ 账号#{idx + 1} Cookie解析失败")
+        return None, []
+
+    async with semaphore:
+        logger.info(f"{'=' * 50}")
+        logger.info(f"📌 处理账号 #{idx + 1}")
+
+        outcome = await renew_via_http(cookie_str) if mode == "http" else None
+        if outcome is None:
+            results, new_cookie = await renew_via_browser(shared, cookie_str, idx, notifier)
+            if results is None:
+                return None, []
+        else:
+            by_id, new_cookie = outcome
+            # 只有响应无法识别的服务器用浏览器重做；明确失败的不能再提交一次，只补截图
+            retry = [sid for sid, r in by_id.items() if r is None]
+            failed = [r for r in by_id.values() if r and r.status == RenewalStatus.FAILED]
+            if failed:
+                await capture_via_browser(shared, new_cookie or cookie_str, idx, failed)
+            if retry:
+                logger.info(f"🌐 {len(retry)} 个服务器改用浏览器处理: {[mask_id(x) for x in retry]}")
+                retried, browser_cookie = await renew_via_browser(
+                    shared, new_cookie or cookie_str, idx, notifier, retry)
+                for r in retried or []:
+                    previous = by_id[r.server_id]
+                    r.started = r.started or bool(previous and previous.started)
+                    by_id[r.server_id] = r
+                new_cookie = browser_cookie or new_cookie
+            results = [r or ServerResult(sid, RenewalStatus.FAILED, "HTTP 响应无法识别")
+                       for sid, r in by_id.items()]
+
+        await notify_results(notifier, idx, results)
+
+        if new_cookie and new_cookie != cookie_str:
+            logger.info(f"🔄 账号#{idx + 1} Cookie已变化")
+            return new_cookie, results
+        return cookie_str, results
 
 
 async def main():
@@ -502,16 +815,37 @@ async def main():
 
     new_cookies, changed = [], False
 
-    for i, cookie in enumerate(config.cookies_list):
-        new, _ = await process_account(cookie, i, notifier)
+    mode = MODE
+    if mode == "http" and os.environ.get("PROXY_SOCKS5") and not PROXY_HTTP:
+        logger.info("🌐 aiohttp 不支持 SOCKS5 代理，改用浏览器模式")
+        mode = "browser"
+    logger.info(f"⚙️ 模式: {mode}")
+
+    # 浏览器最多启动一次（HTTP 模式下只在需要时启动），账号在信号量限制下并发处理
+    shared = SharedBrowser()
+    semaphore = asyncio.Semaphore(max(1, ACCOUNT_CONCURRENCY))
+    logger.info(f"🧵 账号并发: {max(1, ACCOUNT_CONCURRENCY)}")
+    try:
+        outcomes = await asyncio.gather(
+            *(process_account(shared, cookie, i, notifier, semaphore, mode)
+              for i, cookie in enumerate(config.cookies_list)),
+            return_exceptions=True
+        )
+    finally:
+        await shared.close()
+    logger.info(wait_summary())
+
+    for i, (cookie, outcome) in enumerate(zip(config.cookies_list, outcomes)):
+        if isinstance(outcome, BaseException):
+            logger.error(f"❌ 账号#{i + 1} 异常: {outcome}")
+            outcome = (None, [])
+        new, _ = outcome
         if new:
             new_cookies.append(new)
             if new != cookie:
                 changed = True
         else:
             new_cookies.append(cookie)
-        if i < len(config.cookies_list) - 1:
-            await asyncio.sleep(5)
 
     if changed:
         await github.update_secret("CASTLE_COOKIES", ",".join(new_cookies))
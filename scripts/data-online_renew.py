@@ -20,6 +20,8 @@ import httpx
 from datetime import datetime
 from playwright.async_api import async_playwright
 
+from page_waits import summary as wait_summary, wait_selector, wait_url
+
 async def send_telegram_notification(bot_token, chat_id, username, screenshot_path, status="success", error_msg=None, command=None):
     """发送 Telegram 通知"""
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
@@ -186,7 +188,7 @@ async def main():
                 # 检查是否被 Cloudflare 拦截
                 if 'challenge' in html_content.lower() or 'cloudflare' in html_content.lower():
                     print("  ⚠️ 检测到 Cloudflare 保护，等待更长时间...")
-                    await asyncio.sleep(10)
+                    await wait_selector(page, 'input', "Cloudflare 验证", baseline=10000, timeout=10000)
                     await page.screenshot(path="0_cloudflare.png")
             
             # 再次尝试等待输入框
@@ -306,10 +308,12 @@ async def main():
             
             # 检查登录结果
             print("⏳ 等待登录响应...")
-            await asyncio.sleep(3)
+            await wait_url(page, lambda url: '/login' not in url or 'account-disabled' in url or 'wrong-password' in url,
+                           "登录跳转", baseline=4000, timeout=4000)
             
             for i in range(10):
-                await asyncio.sleep(1)
+                if i:
+                    await asyncio.sleep(1)
                 status, message = await check_login_status(page)
                 print(f"  🔍 状态: {status} - {message}")
                 
@@ -346,14 +350,14 @@ async def main():
                 await page.goto(terminal_url, timeout=60000)
                 await page.wait_for_load_state('networkidle')
                 
-                await asyncio.sleep(2)
                 if '/login' in page.url:
                     print("  ❌ 被重定向到登录页")
                     final_status = "failed"
                     error_message = "会话失效"
                 else:
                     print("  ✅ 进入终端页面")
-                    await asyncio.sleep(5)
+                    await wait_selector(page, '.xterm-screen, .xterm, .terminal, canvas', "终端渲染",
+                                        baseline=7000, timeout=15000)
                     await page.screenshot(path="4_terminal.png")
                     
                     print(f"⌨️ 执行命令...")
@@ -391,6 +395,7 @@ async def main():
                 pass
         finally:
             await browser.close()
+            print(wait_summary())
         
         # 发送通知
         if tg_bot_token and tg_chat_id:
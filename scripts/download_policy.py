@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+图片下载检查
+- 响应头: Content-Type 不是图片、Content-Length 超过上限时直接放弃，不读取正文
+- 文件头: 按魔数识别格式，从文件头解析宽高（不完整解码），尺寸太小立即中止
+- 传输中: 超过最大字节数立即中止
+- 按 Content-Length 选择分块大小
+每次运行汇总被拒绝的下载和节省的流量
+"""
+
+import struct
+import threading
+
+# 能被 cv2.imdecode 解码的格式
+MAGIC = [
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+]
+SNIFF_BYTES = 12                  # 识别格式需要的字节数
+HEADER_LIMIT = 256 * 1024         # 超过该长度仍解析不出宽高（例如超大 EXIF）则交给解码判断
+MIN_CHUNK = 64 * 1024
+MAX_CHUNK = 1024 * 1024
+DEFAULT_CHUNK = 256 * 1024
+
+
+def image_type(head: bytes) -> str | None:
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    for magic, kind in MAGIC:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+def _jpeg_scan(data: bytes, pos: int = 2) -> tuple:
+    """从 pos 开始逐段扫描，返回 ((宽, 高) 或 None, 下次继续扫描的位置)"""
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            pos += 1
+            continue
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        # SOF0-SOF15（不含 DHT / JPG / DAC）
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if pos + 9 > len(data):
+                return None, pos
+            h, w = struct.unpack(">HH", data[pos + 5:pos + 9])
+            return (w, h), pos
+        length = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+        pos += 2 + length
+    return None, pos
+
+
+def _jpeg_size(data: bytes) -> tuple | None:
+    return _jpeg_scan(data)[0]
+
+
+def _webp_size(data: bytes) -> tuple | None:
+    if len(data) < 30:
+        return None
+    chunk = data[12:16]
+    if chunk == b"VP8 ":
+        w, h = struct.unpack("<HH", data[26:30])
+        return w & 0x3FFF, h & 0x3FFF
+    if chunk == b"VP8L":
+        bits = struct.unpack("<I", data[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        w = int.from_bytes(data[24:27], "little") + 1
+        h = int.from_bytes(data[27:30], "little") + 1
+        return w, h
+    return None
+
+
+def image_size(data: bytes, kind: str) -> tuple | None:
+    """从文件头解析 (宽, 高)，字节不够或无法解析时返回 None"""
+    try:
+        if kind == "jpeg":
+            return _jpeg_size(data)
+        if kind == "png" and len(data) >= 24:
+            return struct.unpack(">II", data[16:24])
+        if kind == "gif" and len(data) >= 10:
+            return struct.unpack("<HH", data[6:10])
+        if kind == "bmp" and len(data) >= 26:
+            w, h = struct.unpack("<ii", data[18:26])
+            return w, abs(h)
+        if kind == "webp":
+            return _webp_size(data)
+    except struct.error:
+        pass
+    return None
+
+
+class DownloadPolicy:
+    """下载规则和整次运行的统计（线程安全）"""
+
+    def __init__(self, max_bytes: int, min_side: int):
+        self.max_bytes = max_bytes
+        self.min_side = min_side
+        self.lock = threading.Lock()
+        self.rejected = {}
+        self.bytes_avoided = 0
+
+    def guard(self) -> "DownloadGuard":
+        return DownloadGuard(self)
+
+    def record(self, reason: str, avoided: int):
+        with self.lock:
+            self.rejected[reason] = self.rejected.get(reason, 0) + 1
+            self.bytes_avoided += max(0, avoided)
+
+    def summary(self) -> str:
+        with self.lock:
+            total = sum(self.rejected.values())
+            reasons = ", ".join(f"{k} {v}" for k, v in sorted(self.rejected.items()))
+            return (f"拒绝 {total} 个下载"
+                    + (f" ({reasons})" if reasons else "")
+                    + f", 节省 {self.bytes_avoided / 1024 / 1024:.1f} MB")
+
+
+class DownloadGuard:
+    """
+    单次下载的检查状态
+    check_headers() / feed() 返回 False 表示应立即中止传输，原因见 reason
+    """
+
+    def __init__(self, policy: DownloadPolicy):
+        self.policy = policy
+        self.expected = None      # Content-Length
+        self.received = 0
+        self.head = bytearray()
+        self.kind = None
+        self.size = None
+        self.reason = None
+        self.jpeg_pos = 2         # JPEG 已扫描到的位置，新数据到达时从这里继续
+
+    def _reject(self, reason: str) -> bool:
+        self.reason = reason
+        avoided = self.expected - self.received if self.expected else 0
+        self.policy.record(reason, avoided)
+        return False
+
+    def check_headers(self, headers) -> int | bool:
+        """检查响应头，通过时返回建议的分块大小"""
+        self.expected = _int(headers.get("content-length"))
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type.split("/")[0] in ("video", "audio", "text"):
+            return self._reject(f"类型 {content_type}")
+        if self.expected and self.expected > self.policy.max_bytes:
+            return self._reject("过大")
+
+        if not self.expected:
+            return DEFAULT_CHUNK
+        return max(MIN_CHUNK, min(MAX_CHUNK, self.expected // 4))
+
+    def feed(self, chunk: bytes) -> bool:
+        self.received += len(chunk)
+        if self.received > self.policy.max_bytes:
+            return self._reject("过大")
+
+        if self.size is None and len(self.head) < HEADER_LIMIT:
+            self.head.extend(chunk[:HEADER_LIMIT - len(self.head)])
+            if self.kind is None and len(self.head) >= SNIFF_BYTES:
+                self.kind = image_type(self.head)
+                if self.kind is None:
+                    return self._reject("非图片")
+            if self.kind == "jpeg":
+                self.size, self.jpeg_pos = _jpeg_scan(self.head, self.jpeg_pos)
+            elif self.kind:
+                self.size = image_size(self.head, self.kind)
+                if self.size and min(self.size) < self.policy.min_side:
+                    return self._reject("尺寸过小")
+        return True
+
+    def finish(self) -> bool:
+        """传输结束后的检查（文件过短无法识别）"""
+        if self.kind is None:
+            return self._reject("非图片")
+        return True
+
+
+def _int(value) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
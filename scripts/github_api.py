@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+GitHub REST API 客户端（爬虫、count.json 更新和各续期脚本共用）
+- 连接复用：默认 requests.Session，也可以传入任何带 request(method, url, **kw) 的对象（如 HttpEngine）
+- GET 自动带 If-None-Match，304 直接返回缓存内容（不计入速率限制）；
+  调用方自己带 If-None-Match 时不使用内置缓存，304 原样返回；内置缓存按总大小淘汰最久未用的条目
+- 令牌桶限速，并根据 X-RateLimit-Remaining / Reset 自动放慢；
+  写请求（POST / PUT / PATCH / DELETE）另有一个更慢的令牌桶（默认约 1 次/秒，避免触发二级限速）；
+  大量并发、本身不改变仓库内容的写请求（如创建 blob）可以用 write_limit=False 只走通用令牌桶
+- 429、二级限速 403、5xx 和连接错误按 Retry-After / 限速头退避重试
+- 统计请求数、耗时、304 命中、重试和等待时间
+"""
+
+import json
+import random
+import threading
+import time
+from base64 import b64encode
+from collections import OrderedDict
+
+import requests
+
+API_URL = "https://api.github.com"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+MAX_CACHED_BODY = 8 * 1024 * 1024
+MAX_CACHE_BYTES = 32 * 1024 * 1024  # ETag 缓存中响应内容的总大小上限
+LOW_QUOTA = 0.2  # 剩余额度低于上限的该比例时开始放慢
+
+
+class GitHubError(Exception):
+    def __init__(self, response: "ApiResponse", message: str = ""):
+        self.response = response
+        super().__init__(message or f"{response.status_code} {response.text[:200]}")
+
+
+class ApiResponse:
+    """与传输层无关的响应（requests / httpx 的响应都会转换成它）"""
+
+    def __init__(self, status_code: int, headers: dict, content: bytes, from_cache: bool = False):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status_code < 300
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", "replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise GitHubError(self)
+
+
+class TokenBucket:
+    """每秒补充 rate 个令牌，最多积累 capacity 个"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """取一个令牌，返回等待的秒数"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def adapt(self, remaining: int, limit: int, reset_in: float):
+        """剩余额度不足 LOW_QUOTA 时，把剩余额度平摊到重置前的时间"""
+        with self.lock:
+            if remaining > limit * LOW_QUOTA:
+                self.rate = self.base_rate
+            else:
+                self.rate = max(0.05, min(self.base_rate, remaining / max(1.0, reset_in)))
+
+
+class GitHubClient:
+
+    def __init__(self, token: str, repo: str = "", api: str = API_URL, session=None,
+                 rate: float = 10.0, burst: int = 20, write_rate: float = 1.0, write_burst: int = 5,
+                 max_retries: int = 5, max_wait: float = 900):
+        self.token = token
+        self.repo = repo
+        self.api = api.rstrip("/")
+        self.session = session or self._create_session()
+        self.bucket = TokenBucket(rate, burst)
+        self.write_bucket = TokenBucket(write_rate, write_burst)
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28",
+        }
+
+        self.lock = threading.Lock()
+        self.etags = OrderedDict()
+        self.etag_bytes = 0
+        self.stats = {"requests": 0, "not_modified": 0, "retries": 0, "errors": 0,
+                      "waited_s": 0.0, "latency_s": 0.0, "rate_remaining": None}
+        self.routes = {}
+
+    @staticmethod
+    def _create_session() -> requests.Session:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def repo_url(self, path: str = "") -> str:
+        return f"{self.api}/repos/{self.repo}" + (f"/{path.lstrip('/')}" if path else "")
+
+    # ---------- 请求 ----------
+
+    def request(self, method: str, url: str, payload: dict = None, headers: dict = None,
+                timeout: float = 30, write_limit: bool = True) -> ApiResponse:
+        """
+        url 可以是完整地址，也可以是相对仓库的路径（如 "contents/ri/count.json"）
+        重试用尽后返回最后一次响应；连接错误重试用尽后抛出
+        """
+        if not url.startswith("http"):
+            url = self.repo_url(url)
+        merged = {**self.headers, **(headers or {})}
+        cache_key = (url, merged.get("Accept"))
+
+        # 调用方自己管理 ETag 时不覆盖它的 If-None-Match，也不缓存响应内容
+        use_cache = method == "GET" and not any(k.lower() == "if-none-match" for k in (headers or {}))
+        cached = None
+        if use_cache:
+            with self.lock:
+                cached = self.etags.get(cache_key)
+                if cached:
+                    self.etags.move_to_end(cache_key)
+            if cached:
+                merged["If-None-Match"] = cached[0]
+
+        for attempt in range(self.max_retries + 1):
+            if write_limit and method in WRITE_METHODS:
+                self._record_wait(self.write_bucket.acquire())
+            self._record_wait(self.bucket.acquire())
+            start = time.perf_counter()
+            try:
+                raw = self.session.request(method, url, headers=merged, json=payload, timeout=timeout)
+            except Exception:
+                self._record(method, url, time.perf_counter() - start, error=True)
+                if attempt >= self.max_retries:
+                    raise
+                self._sleep(self._backoff(attempt))
+                continue
+
+            resp = ApiResponse(raw.status_code, raw.headers, raw.content)
+            self._record(method, url, time.perf_counter() - start)
+            self._track_limit(resp)
+
+            if resp.status_code == 304:
+                with self.lock:
+                    self.stats["not_modified"] += 1
+                if cached:
+                    return ApiResponse(200, cached[1], cached[2], from_cache=True)
+
+            delay = self._retry_delay(resp, attempt)
+            if delay is None:
+                if use_cache and resp.ok and resp.headers.get("ETag") \
+                        and len(resp.content) <= MAX_CACHED_BODY:
+                    self._cache_store(cache_key, (resp.headers["ETag"], resp.headers, resp.content))
+                return resp
+            with self.lock:
+                self.stats["retries"] += 1
+            self._sleep(delay)
+        return resp
+
+    def _cache_store(self, key: tuple, entry: tuple):
+        """存入 ETag 缓存，总大小超过 MAX_CACHE_BYTES 时淘汰最久未用的条目"""
+        with self.lock:
+            old = self.etags.pop(key, None)
+            if old:
+                self.etag_bytes -= len(old[2])
+            self.etags[key] = entry
+            self.etag_bytes += len(entry[2])
+            while self.etag_bytes > MAX_CACHE_BYTES and len(self.etags) > 1:
+                _, evicted = self.etags.popitem(last=False)
+                self.etag_bytes -= len(evicted[2])
+
+    def get(self, url: str, **kwargs) -> ApiResponse:
+        return self.request("GET", url, **kwargs)
+
+    def get_json(self, url: str, **kwargs):
+        """成功返回 JSON，404 返回 None，其他错误抛出 GitHubError"""
+        resp = self.get(url, **kwargs)
+        if resp.status_code == 404:
+            return None
+        resp.raise_for_status()
+        return resp.json()
+
+    # ---------- 限速 / 退避 ----------
+
+    def _track_limit(self, resp: ApiResponse):
+        remaining = resp.headers.get("X-RateLimit-Remaining")
+        reset = resp.headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        remaining = int(remaining)
+        limit = int(resp.headers.get("X-RateLimit-Limit") or remaining or 1)
+        with self.lock:
+            self.stats["rate_remaining"] = remaining
+        self.bucket.adapt(remaining, limit, int(reset) - time.time())
+        self.write_bucket.adapt(remaining, limit, int(reset) - time.time())
+
+    def _retry_delay(self, resp: ApiResponse, attempt: int) -> float | None:
+        """需要重试时返回等待秒数，否则返回 None"""
+        if attempt >= self.max_retries:
+            return None
+        status = resp.status_code
+        limited = status == 429 or (status == 403 and (
+            resp.headers.get("X-RateLimit-Remaining") == "0"
+            or "rate limit" in resp.text.lower()
+        ))
+        if not limited and status not in RETRY_STATUS:
+            return None
+
+        retry_after = resp.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+        elif limited and resp.headers.get("X-RateLimit-Remaining") == "0":
+            delay = float(resp.headers.get("X-RateLimit-Reset", 0)) - time.time() + 1
+        elif limited:
+            # 二级限速没有给出等待时间时至少等一分钟
+            delay = max(60.0, self._backoff(attempt))
+        else:
+            delay = self._backoff(attempt)
+
+        if delay > self.max_wait:
+            return None
+        return max(0.0, delay)
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return min(60.0, 2 ** attempt) * (0.5 + random.random() / 2)
+
+    def _sleep(self, seconds: float):
+        time.sleep(seconds)
+        self._record_wait(seconds)
+
+    # ---------- 统计 ----------
+
+    def _record_wait(self, seconds: float):
+        if seconds:
+            with self.lock:
+                self.stats["waited_s"] += seconds
+
+    def _record(self, method: str, url: str, seconds: float, error: bool = False):
+        base = self.repo_url()
+        path = url[len(base):] if url.startswith(base) else url[len(self.api):]
+        parts = path.split("?")[0].strip("/").split("/")
+        route = f"{method} {'/'.join(parts[:2]) if parts[0] in ('git', 'actions') else parts[0] or 'repo'}"
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["latency_s"] += seconds
+            if error:
+                self.stats["errors"] += 1
+            count, total = self.routes.get(route, (0, 0.0))
+            self.routes[route] = (count + 1, total + seconds)
+
+    def summary(self) -> str:
+        with self.lock:
+            s = dict(self.stats)
+            routes = ", ".join(f"{k} {n}" for k, (n, _) in sorted(self.routes.items()))
+        avg = s["latency_s"] / s["requests"] * 1000 if s["requests"] else 0
+        return (f"{s['requests']} 次请求 (平均 {avg:.0f} ms), 304 命中 {s['not_modified']}, "
+                f"重试 {s['retries']}, 等待 {s['waited_s']:.1f}s, 剩余额度 {s['rate_remaining']}"
+                + (f" | {routes}" if routes else ""))
+
+    # ---------- Actions Secret ----------
+
+    def update_secret(self, name: str, value: str):
+        """加密并写入仓库的 Actions Secret；需要 PyNaCl，失败抛出 GitHubError"""
+        from nacl import encoding, public
+
+        key = self.get_json("actions/secrets/public-key")
+        if key is None:
+            raise GitHubError(ApiResponse(404, {}, b""), "获取公钥失败: 404")
+        sealed = public.SealedBox(public.PublicKey(key["key"].encode("utf-8"), encoding.Base64Encoder()))
+        encrypted = b64encode(sealed.encrypt(value.encode("utf-8"))).decode("utf-8")
+        resp = self.request("PUT", f"actions/secrets/{name}",
+                            {"encrypted_value": encrypted, "key_id": key["key_id"]})
+        resp.raise_for_status()
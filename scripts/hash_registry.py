@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+紧凑二进制哈希注册表
+- 每条记录定长 45 字节: sha256(32) + dHash(8) + 文件夹(1) + 编号(4)
+- 段文件内按键排序，二分查找判断是否存在
+- 每次运行只追加一个增量段，段数达到阈值时合并为新的基础段
+
+目录结构（目标仓库 ri/registry/）:
+    manifest.json       {"version": 1, "folders": [...], "base": "base.bin",
+                         "deltas": ["delta-000001.bin", ...], "next_delta": 2, "count": N}
+    base.bin            基础段
+    delta-NNNNNN.bin    增量段
+"""
+
+import re
+import struct
+
+MAGIC = b"HREG"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")      # magic, version, record_size, count
+HAS_PHASH = 0x80
+NO_FOLDER = 0x7F
+
+PATH_RE = re.compile(r"^([^/]+)/(\d+)\.webp$")
+
+
+def encode_segment(records: list, record_size: int) -> bytes:
+    """records: 已排序且去重的记录字节串列表"""
+    return HEADER.pack(MAGIC, VERSION, record_size, len(records)) + b"".join(records)
+
+
+class Segment:
+    """只读段，数据可以是 bytes 或 mmap；记录以 key_size 字节的键开头"""
+
+    def __init__(self, data, record_size: int, key_size: int):
+        magic, version, size, count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION or size != record_size:
+            raise ValueError("无效的注册表段")
+        self.view = memoryview(data)[HEADER.size:HEADER.size + count * record_size]
+        self.record_size = record_size
+        self.key_size = key_size
+        self.count = count
+
+    def _key(self, i: int) -> bytes:
+        off = i * self.record_size
+        return bytes(self.view[off:off + self.key_size])
+
+    def find(self, key: bytes) -> int:
+        """二分查找，返回记录下标，不存在返回 -1"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._key(lo) == key:
+            return lo
+        return -1
+
+    def record(self, i: int) -> bytes:
+        off = i * self.record_size
+        return bytes(self.view[off:off + self.record_size])
+
+    def records(self):
+        for i in range(self.count):
+            yield self.record(i)
+
+
+class SegmentTable:
+    """
+    定长记录表：已有条目在只读段中，本次运行新增的条目在 pending 中
+    子类定义 RECORD（以键开头的 struct）、KEY_SIZE 和文件名前缀
+    """
+
+    RECORD: struct.Struct
+    KEY_SIZE: int
+    MANIFEST = "manifest.json"
+    PREFIX = ""
+
+    def __init__(self, manifest: dict = None, segments: list = None):
+        self.manifest = manifest or {
+            "version": VERSION, "base": None, "deltas": [], "next_delta": 1, "count": 0
+        }
+        self.segments = segments or []
+        self.pending = {}
+
+    def _find_record(self, key: bytes) -> bytes | None:
+        if key in self.pending:
+            return self.pending[key]
+        for seg in reversed(self.segments):
+            i = seg.find(key)
+            if i >= 0:
+                return seg.record(i)
+        return None
+
+    def _records(self):
+        for seg in self.segments:
+            yield from seg.records()
+        yield from self.pending.values()
+
+    def __len__(self):
+        return sum(seg.count for seg in self.segments) + len(self.pending)
+
+    def _manifest(self) -> dict:
+        return dict(self.manifest)
+
+    def plan_write(self, compact_every: int) -> tuple:
+        """
+        生成本次需要写入的段文件
+        返回: (files, manifest)
+        files: {文件名: bytes 或 None(删除)}，没有新条目时为空
+        """
+        if not self.pending:
+            return {}, self.manifest
+
+        manifest = self._manifest()
+        deltas = list(manifest["deltas"])
+        files = {}
+
+        if manifest["base"] is None or len(deltas) + 1 >= compact_every:
+            # 合并所有段为新的基础段
+            merged = {}
+            for record in self._records():
+                merged[record[:self.KEY_SIZE]] = record
+            base = f"{self.PREFIX}base.bin"
+            files[base] = encode_segment([merged[k] for k in sorted(merged)], self.RECORD.size)
+            for name in deltas:
+                files[name] = None
+            manifest.update(base=base, deltas=[], count=len(merged))
+        else:
+            name = f"{self.PREFIX}delta-{manifest['next_delta']:06d}.bin"
+            files[name] = encode_segment(sorted(self.pending.values()), self.RECORD.size)
+            manifest.update(deltas=deltas + [name], next_delta=manifest["next_delta"] + 1,
+                            count=len(self))
+
+        return files, manifest
+
+    @classmethod
+    def _read_segments(cls, manifest: dict, read_segment) -> list:
+        """read_segment(name) -> bytes | None"""
+        segments = []
+        for name in [manifest.get("base")] + list(manifest.get("deltas", [])):
+            if not name:
+                continue
+            data = read_segment(name)
+            if data is None:
+                raise IOError(f"注册表段缺失: {name}")
+            segments.append(Segment(data, cls.RECORD.size, cls.KEY_SIZE))
+        return segments
+
+
+class HashRegistry(SegmentTable):
+    """sha256 → (路径, dHash)"""
+
+    RECORD = struct.Struct("<32sQBI")     # sha256, dhash, folder|flags, number
+    KEY_SIZE = 32
+
+    def __init__(self, folders: list, manifest: dict = None, segments: list = None):
+        super().__init__(manifest, segments)
+        self.folders = list(self.manifest.get("folders", []))
+        for f in folders:
+            if f not in self.folders:
+                self.folders.append(f)
+
+    def _manifest(self) -> dict:
+        return dict(self.manifest, folders=self.folders)
+
+    # ---------- 编解码 ----------
+
+    def _pack(self, sha: str, path: str, phash: int | None) -> bytes:
+        folder_idx, num = NO_FOLDER, 0
+        m = PATH_RE.match(path or "")
+        if m and m.group(1) in self.folders:
+            folder_idx, num = self.folders.index(m.group(1)), int(m.group(2))
+        flags = folder_idx | (HAS_PHASH if phash is not None else 0)
+        return self.RECORD.pack(bytes.fromhex(sha), phash or 0, flags, num)
+
+    def _unpack(self, record: bytes) -> tuple:
+        digest, phash, flags, num = self.RECORD.unpack(record)
+        folder_idx = flags & ~HAS_PHASH
+        path = f"{self.folders[folder_idx]}/{num}.webp" if folder_idx != NO_FOLDER else None
+        return digest.hex(), path, (phash if flags & HAS_PHASH else None)
+
+    # ---------- 查询 ----------
+
+    def __contains__(self, sha: str) -> bool:
+        return self._find_record(bytes.fromhex(sha)) is not None
+
+    def get(self, sha: str, default=None):
+        record = self._find_record(bytes.fromhex(sha))
+        return self._unpack(record)[1] if record else default
+
+    def phashes(self):
+        """遍历所有带 dHash 的条目: (sha, dhash)"""
+        for record in self._records():
+            sha, _, phash = self._unpack(record)
+            if phash is not None:
+                yield sha, phash
+
+    # ---------- 修改 ----------
+
+    def add(self, sha: str, path: str, phash: int | None = None):
+        self.pending[bytes.fromhex(sha)] = self._pack(sha, path, phash)
+
+    def pop(self, sha: str, default=None):
+        """只能撤销本次运行新增的条目"""
+        record = self.pending.pop(bytes.fromhex(sha), None)
+        return self._unpack(record)[1] if record else default
+
+    def import_json(self, hash_registry: dict, phash_registry: dict = None):
+        """从旧的 hash_registry.json / phash_registry.json 导入"""
+        phash_registry = phash_registry or {}
+        for sha, path in hash_registry.items():
+            phash = phash_registry.get(sha)
+            self.add(sha, path, int(phash, 16) if phash else None)
+
+    @classmethod
+    def load(cls, folders: list, manifest: dict, read_segment) -> "HashRegistry":
+        return cls(folders, manifest, cls._read_segments(manifest, read_segment))
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+异步 HTTP 引擎
+- 后台线程运行 asyncio 事件循环，所有请求共用一个连接池（keep-alive，可选 HTTP/2）
+- 按主机限制同时进行的请求数
+- 提供同步接口，供线程池中的流水线阶段直接调用
+"""
+
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx
+
+
+class HttpEngine:
+
+    def __init__(self, per_host: int = 4, max_connections: int = 64,
+                 http2: bool = True, timeout: float = 60, headers: dict = None):
+        self.per_host = max(1, per_host)
+        self._slots = {}
+        self.http2 = http2 and self._h2_available()
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+        async def create_client():
+            return httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                    keepalive_expiry=60
+                ),
+                timeout=timeout,
+                headers=headers,
+                follow_redirects=True
+            )
+
+        self.client = self._run(create_client())
+
+    @staticmethod
+    def _h2_available() -> bool:
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            print("⚠️ 未安装 h2，HTTP/2 不可用，使用 HTTP/1.1")
+            return False
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    @asynccontextmanager
+    async def _slot(self, url: str):
+        host = urlsplit(url).netloc
+        sem = self._slots.get(host)
+        if sem is None:
+            sem = self._slots[host] = asyncio.Semaphore(self.per_host)
+        async with sem:
+            yield
+
+    # ---------- 异步接口 ----------
+
+    async def arequest(self, method: str, url: str, **kwargs) -> httpx.Response:
+        async with self._slot(url):
+            return await self.client.request(method, url, **kwargs)
+
+    async def astream(self, url: str, on_chunk, chunk_size: int = 65536,
+                      on_response=None, **kwargs) -> httpx.Response:
+        """
+        流式 GET，on_chunk(chunk) 返回 False 时中止传输
+        on_response(resp) 在读取正文前调用：返回 False 不读取正文，返回整数则作为分块大小
+        """
+        async with self._slot(url):
+            async with self.client.stream("GET", url, **kwargs) as resp:
+                if resp.status_code < 400 and on_response:
+                    decision = on_response(resp)
+                    if decision is False:
+                        return resp
+                    if decision:
+                        chunk_size = decision
+                if resp.status_code < 400:
+                    async for chunk in resp.aiter_bytes(chunk_size):
+                        if on_chunk(chunk) is False:
+                            break
+                return resp
+
+    # ---------- 同步接口 ----------
+
+    def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        return self._run(self.arequest(method, url, **kwargs))
+
+    def get(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("GET", url, **kwargs)
+
+    def stream(self, url: str, on_chunk, chunk_size: int = 65536,
+               on_response=None, **kwargs) -> httpx.Response:
+        return self._run(self.astream(url, on_chunk, chunk_size, on_response, **kwargs))
+
+    def update_cookies(self, cookie_jar, headers: dict = None):
+        """同步外部会话（如 cloudscraper）的 Cookie 和请求头"""
+        async def update():
+            for c in cookie_jar:
+                self.client.cookies.set(c.name, c.value, domain=c.domain, path=c.path)
+            if headers:
+                self.client.headers.update(headers)
+        self._run(update())
+
+    def close(self):
+        try:
+            self._run(self.client.aclose())
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+图片解码 / 分类 / 编码
+不依赖网络和全局状态，可以在子进程中直接导入
+一次解码产生全部输出（见 render_variants）: 原尺寸 WebP、固定宽度缩略图、可选 AVIF
+"""
+
+import os
+import time
+
+import cv2
+import numpy as np
+
+from phash_index import dhash
+
+BRIGHTNESS_THRESHOLD = 130
+THUMB_SIZE = 100
+WEBP_QUALITY = 85
+MIN_SIDE = 10
+
+# 缩略图固定宽度（瀑布流布局只需要按宽度缩放），0 = 不生成
+THUMB_WIDTH = int(os.environ.get("THUMB_WIDTH", "320"))
+THUMB_QUALITY = 75
+# AVIF 输出（需要 OpenCV 编译了 AVIF 支持，不支持时自动跳过）
+AVIF = os.environ.get("AVIF", "0") == "1"
+AVIF_QUALITY = 60
+
+# Rec.709 亮度系数（BGR 顺序，直接作用于 gamma 编码值的近似算法）
+REC709_BGR = np.array([0.0722, 0.7152, 0.2126], dtype=np.float32)
+
+# 分类方法: lab = 与逐张分析完全一致, luma = Rec.709 近似（更快）
+CLASSIFY_METHOD = os.environ.get("CLASSIFY_METHOD", "lab")
+
+
+def decode_image(data: bytes):
+    """从内存解码图片（BGR），失败返回 None"""
+    try:
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    except Exception:
+        return None
+
+
+def convert_to_webp(img, quality: int = WEBP_QUALITY) -> bytes | None:
+    """把已解码的图片编码为 WebP"""
+    try:
+        ok, encoded = cv2.imencode(".webp", img, [cv2.IMWRITE_WEBP_QUALITY, quality])
+        return encoded.tobytes() if ok else None
+    except:
+        return None
+
+
+_avif_supported = None
+
+
+def avif_supported() -> bool:
+    """当前 OpenCV 能否编码 AVIF（首次调用时检测）"""
+    global _avif_supported
+    if _avif_supported is None:
+        try:
+            ok, _ = cv2.imencode(".avif", np.zeros((16, 16, 3), dtype=np.uint8))
+            _avif_supported = bool(ok) and hasattr(cv2, "IMWRITE_AVIF_QUALITY")
+        except cv2.error:
+            _avif_supported = False
+    return _avif_supported
+
+
+def convert_to_avif(img) -> bytes | None:
+    """编码为 AVIF，不支持或失败返回 None"""
+    if not avif_supported():
+        return None
+    try:
+        ok, encoded = cv2.imencode(".avif", img, [cv2.IMWRITE_AVIF_QUALITY, AVIF_QUALITY])
+        return encoded.tobytes() if ok else None
+    except cv2.error:
+        return None
+
+
+def make_thumbnail(img, width: int = THUMB_WIDTH):
+    """缩放到固定宽度，高度按比例（至少 1 像素）"""
+    h, w = img.shape[:2]
+    height = max(1, round(h * width / w))
+    interpolation = cv2.INTER_AREA if width < w else cv2.INTER_LINEAR
+    return cv2.resize(img, (width, height), interpolation=interpolation)
+
+
+def render_variants(img, thumb_width: int = THUMB_WIDTH, avif: bool = AVIF) -> dict:
+    """
+    从同一个已解码数组生成全部输出
+    返回 {"webp", "thumb", "thumb_height", "avif", "timings"}，未生成的项为 None
+    """
+    timings = {}
+    start = time.perf_counter()
+    result = {"webp": convert_to_webp(img), "thumb": None, "thumb_height": None, "avif": None}
+    timings["encode"] = time.perf_counter() - start
+
+    if thumb_width > 0:
+        start = time.perf_counter()
+        thumb = make_thumbnail(img, thumb_width)
+        result["thumb"] = convert_to_webp(thumb, THUMB_QUALITY)
+        result["thumb_height"] = thumb.shape[0]
+        timings["thumb"] = time.perf_counter() - start
+
+    if avif:
+        start = time.perf_counter()
+        result["avif"] = convert_to_avif(img)
+        timings["avif"] = time.perf_counter() - start
+
+    result["timings"] = timings
+    return result
+
+
+def analyze_image(img) -> dict | None:
+    """分析已解码的图片，返回分类文件夹"""
+    try:
+        if img is None:
+            return None
+
+        h, w = img.shape[:2]
+        if w < MIN_SIDE or h < MIN_SIDE:
+            return None
+
+        orientation = "h" if w >= h else "v"
+
+        resized = cv2.resize(img, (THUMB_SIZE, THUMB_SIZE))
+        lab = cv2.cvtColor(resized, cv2.COLOR_BGR2LAB)
+        avg_l = lab[:, :, 0].mean()
+        brightness = "d" if avg_l < BRIGHTNESS_THRESHOLD else "l"
+
+        folder = orientation + brightness
+        print(f"  📐 {w}x{h} L={avg_l:.1f} → {folder}")
+
+        return {"folder": folder, "phash": dhash(resized)}
+    except Exception as e:
+        print(f"❌ 分析失败: {e}")
+        return None
+
+
+def batch_luminance(thumbs: np.ndarray, method: str = "lab") -> np.ndarray:
+    """
+    thumbs: (N, S, S, 3) uint8 BGR 缩略图
+    返回每张图的平均亮度（0-255）
+    """
+    n, h, w, _ = thumbs.shape
+    if method == "luma":
+        return (thumbs.reshape(n, -1, 3) @ REC709_BGR).mean(axis=1)
+    # 把整批拼成一张高图，一次 cvtColor 完成全部转换
+    lab = cv2.cvtColor(thumbs.reshape(n * h, w, 3), cv2.COLOR_BGR2LAB)
+    return lab[:, :, 0].reshape(n, -1).mean(axis=1)
+
+
+def classify_batch(images: list, method: str = None) -> list:
+    """
+    批量分类已解码的图片
+    返回与输入等长的列表，元素为 {"folder", "phash", "luminance"} 或 None（无效图片）
+    """
+    method = method or CLASSIFY_METHOD
+    results = [None] * len(images)
+    valid = [i for i, img in enumerate(images)
+             if img is not None and min(img.shape[:2]) >= MIN_SIDE]
+    if not valid:
+        return results
+
+    thumbs = np.stack([cv2.resize(images[i], (THUMB_SIZE, THUMB_SIZE)) for i in valid])
+    luminance = batch_luminance(thumbs, method)
+
+    for k, i in enumerate(valid):
+        h, w = images[i].shape[:2]
+        orientation = "h" if w >= h else "v"
+        brightness = "d" if luminance[k] < BRIGHTNESS_THRESHOLD else "l"
+        results[i] = {
+            "folder": orientation + brightness,
+            "phash": dhash(thumbs[k]),
+            "luminance": float(luminance[k])
+        }
+    return results
+
+
+def process_batch(blobs: list, method: str = None) -> list:
+    """
+    解码 → 批量分类 → 生成各输出（可在子进程中运行）
+    返回与输入等长的列表，元素为 classify_batch 的结果加上 width/height 和
+    render_variants 的输出（webp/thumb/thumb_height/avif），或 None
+    timings 为各步骤耗时（秒），批量分类的耗时平摊到每张图片
+    """
+    images, decode_times = [], []
+    for data in blobs:
+        start = time.perf_counter()
+        images.append(decode_image(data))
+        decode_times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    results = classify_batch(images, method)
+    valid = sum(1 for info in results if info)
+    classify_time = (time.perf_counter() - start) / max(1, valid)
+
+    for img, info, decode_time in zip(images, results, decode_times):
+        if info:
+            h, w = img.shape[:2]
+            variants = render_variants(img)
+            timings = variants.pop("timings")
+            info.update(width=w, height=h, **variants, timings={
+                "decode": decode_time,
+                "classify": classify_time,
+                **timings
+            })
+    return results
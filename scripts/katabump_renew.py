@@ -15,6 +15,9 @@ import time
 from datetime import datetime, timezone, timedelta
 from playwright.async_api import async_playwright
 
+from page_waits import (set_logger, summary as wait_summary, wait_function, wait_load, wait_response,
+                        wait_selector, wait_url)
+
 # 配置
 DASHBOARD_URL = 'https://dashboard.katabump.com'
 SERVER_ID = os.environ.get('KATA_SERVER_ID') or ''
@@ -33,6 +36,9 @@ def log(msg):
     print(f'[{t}] {msg}')
 
 
+set_logger(log)
+
+
 def tg_notify(message):
     if not TG_BOT_TOKEN or not TG_CHAT_ID:
         return False
@@ -165,17 +171,13 @@ async def run():
             # 登录
             log('🔐 正在登录...')
             await page.goto(f'{DASHBOARD_URL}/auth/login', timeout=60000)
-            await page.wait_for_timeout(2000)
+            await wait_selector(page, 'input[name="email"], input[type="email"]', '登录表单', baseline=2000)
             
             await page.locator('input[name="email"], input[type="email"]').fill(KATA_EMAIL)
             await page.locator('input[name="password"], input[type="password"]').fill(KATA_PASSWORD)
             await page.locator('button[type="submit"], input[type="submit"]').first.click()
             
-            await page.wait_for_timeout(4000)
-            try:
-                await page.wait_for_url('**/dashboard**', timeout=15000)
-            except:
-                pass
+            await wait_url(page, '**/dashboard**', '登录跳转', baseline=4000, timeout=19000)
             
             if '/auth/login' in page.url:
                 screenshot_path = os.path.join(SCREENSHOT_DIR, 'login_failed.png')
@@ -214,14 +216,11 @@ async def run():
             
             log('🖱 点击 Renew 按钮...')
             await main_renew_btn.first.click()
-            await page.wait_for_timeout(2000)
             
             # 等待模态框
-            modal = page.locator('#renew-modal')
-            try:
-                await modal.wait_for(state='visible', timeout=5000)
+            if await wait_selector(page, '#renew-modal', '续订模态框', baseline=2000, timeout=7000):
                 log('✅ 模态框已打开')
-            except:
+            else:
                 screenshot_path = os.path.join(SCREENSHOT_DIR, 'modal_error.png')
                 await page.screenshot(path=screenshot_path, full_page=True)
                 tg_notify_photo(screenshot_path, '❌ 模态框未打开')
@@ -236,7 +235,8 @@ async def run():
                 log('🛡 检测到 Turnstile 验证码')
                 
                 # 等待 iframe 加载
-                await page.wait_for_timeout(2000)
+                await wait_selector(page, '#renew-modal iframe[src*="turnstile"]', 'Turnstile iframe',
+                                    state='attached', baseline=2000, timeout=10000)
                 
                 # 尝试点击 Turnstile checkbox
                 log('🖱 尝试点击 Turnstile...')
@@ -249,26 +249,16 @@ async def run():
                 except Exception as e:
                     log(f'⚠️ 点击 checkbox 失败: {e}')
                 
-                # 等待验证完成
+                # 等待验证完成：token 写入 cf-turnstile-response 后立即继续
                 log('⏳ 等待 Turnstile 验证...')
-                response_input = page.locator('#renew-modal input[name="cf-turnstile-response"]')
-                
-                for i in range(30):
-                    await page.wait_for_timeout(1000)
-                    
-                    if await response_input.count() > 0:
-                        current_value = await response_input.get_attribute('value') or ''
-                        if len(current_value) > 20:
-                            log(f'✅ Turnstile 验证成功 ({i+1}秒)')
-                            turnstile_token = current_value
-                            break
-                    
-                    if i % 5 == 4:
-                        log(f'⏳ 继续等待... ({i+1}秒)')
-                        # 每5秒截图查看状态
-                        if i == 9:
-                            screenshot_path = os.path.join(SCREENSHOT_DIR, 'turnstile_waiting.png')
-                            await page.screenshot(path=screenshot_path, full_page=True)
+                response_selector = '#renew-modal input[name="cf-turnstile-response"]'
+                if await wait_function(
+                    page,
+                    '(selector) => { const i = document.querySelector(selector); return !!i && i.value.length > 20; }',
+                    'Turnstile 验证', arg=response_selector, timeout=30000
+                ):
+                    turnstile_token = await page.locator(response_selector).first.input_value()
+                    log('✅ Turnstile 验证成功')
                 
                 if not turnstile_token and CAPSOLVER_KEY:
                     turnstile_token = solve_turnstile_capsolver(server_url, TURNSTILE_SITEKEY)
@@ -295,15 +285,12 @@ async def run():
             if await submit_btn.count() == 0:
                 submit_btn = page.locator('#renew-modal .modal-footer button.btn-primary')
             
-            await submit_btn.first.click()
-            
             log('⏳ 等待服务器响应...')
-            await page.wait_for_timeout(5000)
-            
-            try:
-                await page.wait_for_load_state('domcontentloaded', timeout=15000)
-            except:
-                pass
+            # 表单提交后跳转到带 renew=success / renew-error 的页面，等到最终文档（非重定向）的响应
+            await wait_response(page, submit_btn.first.click,
+                                lambda r: r.request.is_navigation_request() and not 300 <= r.status < 400,
+                                '续订提交', baseline=5000, timeout=20000)
+            await wait_load(page, '结果页面', state='domcontentloaded')
             
             # 检查结果
             log('🔍 检查续订结果...')
@@ -330,7 +317,7 @@ async def run():
             else:
                 log('🔄 重新检查到期时间...')
                 await page.goto(server_url, timeout=60000, wait_until='domcontentloaded')
-                await page.wait_for_timeout(3000)
+                await wait_load(page, '服务器页面', baseline=3000, timeout=10000)
                 
                 page_content = await page.content()
                 new_expiry = get_expiry_from_text(page_content) or '未知'
@@ -358,6 +345,7 @@ async def run():
         
         finally:
             await browser.close()
+            log(wait_summary())
 
 
 def main():
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+归档页面图片链接提取（流式）
+用 lxml HTMLParser 的 target 接口边接收边解析，不构建文档树；
+发现 data-fancybox 链接立即产出，正文（<article>）结束后停止解析
+结果与 BeautifulSoup find_all("a", {"data-fancybox": True}) 一致（index 按页面中出现的顺序计数）
+"""
+
+from lxml import etree
+
+# 正文容器；其中出现过链接且已结束时停止解析
+BODY_TAG = "article"
+
+
+class FancyboxTarget:
+    """lxml 解析器回调：收集 <a data-fancybox href="http...">（attr 可换成其他标记属性）"""
+
+    def __init__(self, stop_after_body: bool = True, attr: str = "data-fancybox"):
+        self.stop_after_body = stop_after_body
+        self.attr = attr
+        self.index = 0
+        self.links = []
+        self.done = False
+
+    def start(self, tag, attrib):
+        if tag == "a" and self.attr in attrib:
+            self.index += 1
+            href = attrib.get("href", "")
+            if href.startswith("http"):
+                self.links.append({"url": href, "index": self.index})
+
+    def end(self, tag):
+        if self.stop_after_body and tag == BODY_TAG and self.index:
+            self.done = True
+
+    def data(self, text):
+        pass
+
+    def close(self):
+        return self.links
+
+
+def iter_fancybox_links(chunks, encoding: str = "utf-8", stop_after_body: bool = True,
+                        attr: str = "data-fancybox"):
+    """
+    chunks: 页面内容的字节块（例如 resp.iter_content()）
+    逐个产出 {"url", "index"}，正文结束后不再读取剩余内容
+    """
+    target = FancyboxTarget(stop_after_body, attr)
+    parser = etree.HTMLParser(target=target, encoding=encoding)
+    emitted = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        parser.feed(chunk)
+        while emitted < len(target.links):
+            yield target.links[emitted]
+            emitted += 1
+        if target.done:
+            break
+    try:
+        parser.close()
+    except etree.LxmlError:
+        # 空文档或被提前截断
+        pass
+    while emitted < len(target.links):
+        yield target.links[emitted]
+        emitted += 1
+
+
+def extract_fancybox_links(html: bytes | str, stop_after_body: bool = True) -> list:
+    if isinstance(html, str):
+        html = html.encode("utf-8")
+    return list(iter_fancybox_links([html], stop_after_body=stop_after_body))
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+远程元数据的本地缓存（progress.json、count.json、注册表 manifest 和段文件）
+- 保存在 Actions cache 目录，跨运行复用：index.json 记录 {路径: {"sha", "etag"}}，
+  内容按 git blob SHA 存放在 objects/ 下（读取时校验 SHA，损坏的条目直接丢弃）
+- 读取时用 ETag 做条件请求，304 直接使用本地内容
+- 写入时复用已知的 blob SHA，不再单独查询；内容与远程相同则跳过写入
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+
+def git_blob_sha(content: bytes) -> str:
+    """与 GitHub 相同的 blob SHA"""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class MetadataCache:
+
+    INDEX = "index.json"
+
+    def __init__(self, root: str):
+        self.root = root
+        self.objects = os.path.join(root, "objects")
+        self.lock = threading.Lock()
+        self.entries = {}
+        # 本次运行中确认过的路径（条件请求或写入成功），值为当前 blob SHA，None 表示远程不存在
+        self.validated = {}
+        self.stats = {"hits": 0, "fetched": 0, "writes_skipped": 0}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.root, self.INDEX), "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _object_path(self, sha: str) -> str:
+        return os.path.join(self.objects, sha)
+
+    def _read_object(self, sha: str) -> bytes | None:
+        try:
+            with open(self._object_path(sha), "rb") as f:
+                content = f.read()
+        except OSError:
+            return None
+        return content if git_blob_sha(content) == sha else None
+
+    # ---------- 读取 ----------
+
+    def lookup(self, path: str) -> tuple:
+        """返回 (etag, content)；没有可用的本地副本时返回 (None, None)"""
+        with self.lock:
+            entry = self.entries.get(path)
+        if not entry:
+            return None, None
+        content = self._read_object(entry["sha"])
+        if content is None:
+            self.forget(path)
+            return None, None
+        return entry.get("etag"), content
+
+    def store(self, path: str, content: bytes, etag: str = None, hit: bool = False) -> str:
+        """记录下载到的远程内容；hit=True 表示来自 304"""
+        with self.lock:
+            self.stats["hits" if hit else "fetched"] += 1
+        return self._put(path, content, etag)
+
+    def _put(self, path: str, content: bytes, etag: str | None) -> str:
+        sha = git_blob_sha(content)
+        if not os.path.exists(self._object_path(sha)):
+            os.makedirs(self.objects, exist_ok=True)
+            tmp = f"{self._object_path(sha)}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(content)
+            os.replace(tmp, self._object_path(sha))
+        with self.lock:
+            self.entries[path] = {"sha": sha, "etag": etag}
+            self.validated[path] = sha
+        return sha
+
+    def forget(self, path: str, missing: bool = False):
+        """删除条目；missing=True 表示已确认远程不存在"""
+        with self.lock:
+            self.entries.pop(path, None)
+            if missing:
+                self.validated[path] = None
+            else:
+                self.validated.pop(path, None)
+
+    # ---------- 写入 ----------
+
+    def known(self, path: str) -> bool:
+        """本次运行中是否已确认远程状态"""
+        with self.lock:
+            return path in self.validated
+
+    def sha(self, path: str) -> str | None:
+        """已确认的远程 blob SHA；未确认时退回上次运行记录的 SHA"""
+        with self.lock:
+            if path in self.validated:
+                return self.validated[path]
+            entry = self.entries.get(path)
+        return entry["sha"] if entry else None
+
+    def unchanged(self, path: str, content: bytes) -> bool:
+        """内容与本次运行确认过的远程内容相同（只信任本次确认过的状态）"""
+        with self.lock:
+            same = self.validated.get(path) == git_blob_sha(content)
+            if same:
+                self.stats["writes_skipped"] += 1
+        return same
+
+    def written(self, path: str, content: bytes):
+        """写入成功后更新；新内容的 ETag 未知，下次读取时重新获取"""
+        self._put(path, content, None)
+
+    # ---------- 持久化 ----------
+
+    def save(self):
+        """写出索引，并删除不再被引用的对象"""
+        with self.lock:
+            entries = dict(self.entries)
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            tmp = os.path.join(self.root, f"{self.INDEX}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, os.path.join(self.root, self.INDEX))
+
+            referenced = {entry["sha"] for entry in entries.values()}
+            if os.path.isdir(self.objects):
+                for name in os.listdir(self.objects):
+                    if name not in referenced:
+                        os.remove(os.path.join(self.objects, name))
+        except OSError as e:
+            print(f"⚠️ 保存元数据缓存失败: {e}")
+
+    def summary(self) -> str:
+        with self.lock:
+            s = dict(self.stats)
+            files = len(self.entries)
+        return (f"{files} 个文件, 304 复用 {s['hits']}, 下载 {s['fetched']}, "
+                f"跳过未变化的写入 {s['writes_skipped']}")
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+运行指标：分阶段计时、计数器（次数 / 字节）、耗时直方图
+- 运行结束时写出 JSON，并在 GitHub Actions 中写入任务摘要（GITHUB_STEP_SUMMARY）
+- 可选性能分析: PROFILE=cprofile | pyinstrument
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# 直方图桶上界（毫秒），最后一个桶收集更慢的样本
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+
+def _percentile(values: list, q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+class Metrics:
+    """线程安全；计时样本在进程内保存，结束时汇总"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.timings = {}
+        self.counters = {}
+
+    def observe(self, name: str, seconds: float):
+        with self.lock:
+            self.timings.setdefault(name, []).append(seconds)
+
+    def count(self, name: str, n: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name: str):
+        """装饰器版本的 timer"""
+        def decorator(fn):
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return fn(*args, **kwargs)
+            wrapper.__name__ = fn.__name__
+            wrapper.__doc__ = fn.__doc__
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            timings = {name: sorted(values) for name, values in self.timings.items()}
+            counters = dict(self.counters)
+
+        stages = {}
+        for name, values in timings.items():
+            histogram = [0] * (len(BUCKETS_MS) + 1)
+            for seconds in values:
+                ms = seconds * 1000
+                histogram[next((i for i, edge in enumerate(BUCKETS_MS) if ms <= edge), len(BUCKETS_MS))] += 1
+            stages[name] = {
+                "count": len(values),
+                "total_s": round(sum(values), 4),
+                "p50_ms": round(_percentile(values, 0.5) * 1000, 2),
+                "p95_ms": round(_percentile(values, 0.95) * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2),
+                "histogram": histogram,
+            }
+        return {
+            "started": self.started,
+            "elapsed_s": round(time.time() - self.started, 2),
+            "buckets_ms": BUCKETS_MS,
+            "stages": stages,
+            "counters": counters,
+        }
+
+    def summary_markdown(self, title: str = "爬虫运行指标") -> str:
+        data = self.snapshot()
+        lines = [f"### {title}", "", f"总耗时 {data['elapsed_s']:.1f}s", "",
+                 "| 阶段 | 次数 | 合计 s | p50 ms | p95 ms | 最大 ms |",
+                 "|---|---:|---:|---:|---:|---:|"]
+        for name, s in data["stages"].items():
+            lines.append(f"| {name} | {s['count']} | {s['total_s']:.2f} | {s['p50_ms']:.1f} "
+                         f"| {s['p95_ms']:.1f} | {s['max_ms']:.1f} |")
+        if data["counters"]:
+            lines += ["", "| 计数器 | 值 |", "|---|---:|"]
+            for name, value in sorted(data["counters"].items()):
+                shown = f"{value / 1024 / 1024:.1f} MB" if name.endswith("_bytes") else value
+                lines.append(f"| {name} | {shown} |")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """写出 JSON；在 Actions 中同时追加任务摘要"""
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+            print(f"📈 运行指标已写入 {path}")
+        except OSError as e:
+            print(f"⚠️ 写入运行指标失败: {e}")
+
+        summary = os.environ.get("GITHUB_STEP_SUMMARY")
+        if summary:
+            try:
+                with open(summary, "a", encoding="utf-8") as f:
+                    f.write(self.summary_markdown())
+            except OSError as e:
+                print(f"⚠️ 写入任务摘要失败: {e}")
+
+
+# ============ 性能分析 ============
+
+class _ThreadedCProfile:
+    """
+    cProfile 只记录启用它的线程：3.12 之前给每个新线程各装一个，结束时合并
+    3.12 起 cProfile 基于 sys.monitoring，一个实例即可覆盖所有线程
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.profiles = [cProfile.Profile()]
+        self.per_thread = sys.version_info < (3, 12)
+
+    def _thread_hook(self, *args):
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        with self.lock:
+            self.profiles.append(profile)
+        profile.enable()
+
+    def start(self):
+        if self.per_thread:
+            threading.setprofile(self._thread_hook)
+        self.profiles[0].enable()
+
+    def stop(self, path: str):
+        self.profiles[0].disable()
+        if self.per_thread:
+            threading.setprofile(None)
+        stats = pstats.Stats(self.profiles[0])
+        for profile in self.profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(path)
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(25)
+        print(out.getvalue())
+        print(f"🔬 cProfile 结果已写入 {path}")
+
+
+@contextmanager
+def profiling(mode: str, path_prefix: str):
+    """
+    mode: "" 关闭 / "cprofile"（所有线程，输出 .pstats）/ "pyinstrument"（主线程采样，输出 .html）
+    """
+    mode = (mode or "").lower()
+    if mode == "cprofile":
+        profiler = _ThreadedCProfile()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop(f"{path_prefix}.pstats")
+    elif mode == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("⚠️ 未安装 pyinstrument，跳过性能分析")
+            yield
+            return
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(f"{path_prefix}.html", "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+            print(f"🔬 pyinstrument 结果已写入 {path_prefix}.html")
+    else:
+        if mode:
+            print(f"⚠️ 未知的 PROFILE={mode}，跳过性能分析")
+        yield
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+查找归档的最新页面 ID，让爬虫一开始就拿到确定的抓取范围
+1. 解析站点 RSS（Typecho /feed/），一次请求拿到最新文章 ID
+2. RSS 不可用时，对页面是否存在做指数 + 二分搜索（HEAD 请求）
+   归档 ID 不连续，"存在" 按窗口判断：[x, x + window) 内任意页面存在即可
+"""
+
+import re
+
+ARCHIVE_RE = re.compile(r"/archives/(\d+)\.html")
+
+
+def latest_from_feed(text: str) -> int | None:
+    """从 RSS / 首页 HTML 中取最大的归档 ID"""
+    ids = [int(m) for m in ARCHIVE_RE.findall(text or "")]
+    return max(ids) if ids else None
+
+
+class PageProber:
+    """
+    exists(page_id) -> bool，请求失败时抛出异常
+    同一个 ID 只请求一次
+    """
+
+    def __init__(self, exists, window: int = 5, max_id: int = 1 << 24):
+        self.exists = exists
+        self.window = max(1, window)
+        self.max_id = max_id
+        self.cache = {}
+
+    @property
+    def requests(self) -> int:
+        return len(self.cache)
+
+    def check(self, page_id: int) -> bool:
+        if page_id not in self.cache:
+            self.cache[page_id] = self.exists(page_id)
+        return self.cache[page_id]
+
+    def alive(self, page_id: int) -> bool:
+        return any(self.check(page_id + k) for k in range(self.window))
+
+    def latest(self, known: int) -> int:
+        """
+        known: 已知存在（或已处理）的 ID
+        返回 >= known 的最新页面 ID；没有更新的页面时返回 known
+        """
+        # 指数扩张：找到第一个不存活的上界
+        lo, step = known, 1
+        while lo + step <= self.max_id and self.alive(lo + step):
+            lo += step
+            step *= 2
+        hi = min(lo + step, self.max_id + 1)
+
+        # 二分：alive(lo) 为真（或 lo == known），alive(hi) 为假
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if self.alive(mid):
+                lo = mid
+            else:
+                hi = mid
+        # alive(lo + 1) 为假，所以 lo 本身就是最后一个存在的页面
+        return lo
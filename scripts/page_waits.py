@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Playwright 事件驱动等待（各续期脚本共用）
+代替 wait_for_timeout 固定等待：目标 API 响应、元素状态、URL、页面加载状态或页面中的条件一出现就返回，
+timeout 是等待上限；每次等待记录实际耗时，并和原来的固定等待（baseline）比较，日志给出节省的时间
+- async_api: wait_response / wait_selector / wait_url / wait_load / wait_function
+- sync_api:  同名的 *_sync 版本
+超时不抛异常，返回 None / False，由调用方按原来的逻辑判断结果
+日志默认 print，可用 set_logger 换成脚本自己的日志函数
+"""
+
+import threading
+import time
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeout
+
+DEFAULT_TIMEOUT = 15000
+
+_log = print
+_lock = threading.Lock()
+stats = {"waits": 0, "timeouts": 0, "waited_ms": 0.0, "saved_ms": 0.0}
+
+
+def set_logger(fn):
+    """fn(msg)"""
+    global _log
+    _log = fn
+
+
+def _matcher(match):
+    """match: URL 片段或 predicate(response)"""
+    if callable(match):
+        return match
+    return lambda response: match in response.url
+
+
+def _record(label: str, start: float, baseline: int, ok: bool):
+    elapsed = (time.perf_counter() - start) * 1000
+    saved = baseline - elapsed
+    with _lock:
+        stats["waits"] += 1
+        stats["timeouts"] += 0 if ok else 1
+        stats["waited_ms"] += elapsed
+        if baseline:
+            stats["saved_ms"] += saved
+    msg = f"⏱️ {label}: {elapsed:.0f} ms" + ("" if ok else "（超时）")
+    if baseline:
+        msg += f"，原固定等待 {baseline} ms，" + (f"节省 {saved:.0f} ms" if saved >= 0 else f"多等 {-saved:.0f} ms")
+    _log(msg)
+
+
+def summary() -> str:
+    with _lock:
+        s = dict(stats)
+    return (f"⏱️ 等待 {s['waits']} 次 (超时 {s['timeouts']}), 共 {s['waited_ms'] / 1000:.1f}s, "
+            f"比固定等待节省 {s['saved_ms'] / 1000:.1f}s")
+
+
+# ============ async_api ============
+
+async def wait_response(page, action, match, label: str, baseline: int = 0, timeout: int = DEFAULT_TIMEOUT):
+    """
+    执行 action()（返回 awaitable 的函数，如 locator.click）并等待匹配的响应
+    返回 Response，超时返回 None；action 本身的异常照常抛出
+    """
+    start = time.perf_counter()
+    acted = False
+    try:
+        async with page.expect_response(_matcher(match), timeout=timeout) as info:
+            await action()
+            acted = True
+        response = await info.value
+    except PlaywrightTimeout:
+        if not acted:
+            raise
+        _record(label, start, baseline, False)
+        return None
+    _record(label, start, baseline, True)
+    return response
+
+
+async def wait_selector(page, selector: str, label: str, state: str = "visible",
+                        baseline: int = 0, timeout: int = DEFAULT_TIMEOUT) -> bool:
+    start = time.perf_counter()
+    try:
+        await page.wait_for_selector(selector, state=state, timeout=timeout)
+    except PlaywrightTimeout:
+        _record(label, start, baseline, False)
+        return False
+    _record(label, start, baseline, True)
+    return True
+
+
+async def wait_url(page, url, label: str, baseline: int = 0, timeout: int = DEFAULT_TIMEOUT) -> bool:
+    """url: glob、正则或 predicate(url)，同 page.wait_for_url"""
+    start = time.perf_counter()
+    try:
+        await page.wait_for_url(url, timeout=timeout)
+    except PlaywrightTimeout:
+        _record(label, start, baseline, False)
+        return False
+    _record(label, start, baseline, True)
+    return True
+
+
+async def wait_load(page, label: str, state: str = "networkidle",
+                    baseline: int = 0, timeout: int = DEFAULT_TIMEOUT) -> bool:
+    start = time.perf_counter()
+    try:
+        await page.wait_for_load_state(state, timeout=timeout)
+    except PlaywrightTimeout:
+        _record(label, start, baseline, False)
+        return False
+    _record(label, start, baseline, True)
+    return True
+
+
+async def wait_function(page, expression: str, label: str, arg=None,
+                        baseline: int = 0, timeout: int = DEFAULT_TIMEOUT) -> bool:
+    """expression 在页面中返回真值时结束，同 page.wait_for_function"""
+    start = time.perf_counter()
+    try:
+        await page.wait_for_function(expression, arg=arg, timeout=timeout)
+    except PlaywrightTimeout:
+        _record(label, start, baseline, False)
+        return False
+    _record(label, start, baseline, True)
+    return True
+
+
+# ============ sync_api ============
+
+def wait_response_sync(page, action, match, label: str, baseline: int = 0, timeout: int = DEFAULT_TIMEOUT):
+    start = time.perf_counter()
+    acted = False
+    try:
+        with page.expect_response(_matcher(match), timeout=timeout) as info:
+            action()
+            acted = True
+        response = info.value
+    except PlaywrightTimeout:
+        if not acted:
+            raise
+        _record(label, start, baseline, False)
+        return None
+    _record(label, start, baseline, True)
+    return response
+
+
+def wait_selector_sync(page, selector: str, label: str, state: str = "visible",
+                       baseline: int = 0, timeout: int = DEFAULT_TIMEOUT) -> bool:
+    start = time.perf_counter()
+    try:
+        page.wait_for_selector(selector, state=state, timeout=timeout)
+    except PlaywrightTimeout:
+        _record(label, start, baseline, False)
+        return False
+    _record(label, start, baseline, True)
+    return True
+
+
+def wait_url_sync(page, url, label: str, baseline: int = 0, timeout: int = DEFAULT_TIMEOUT) -> bool:
+    start = time.perf_counter()
+    try:
+        page.wait_for_url(url, timeout=timeout)
+    except PlaywrightTimeout:
+        _record(label, start, baseline, False)
+        return False
+    _record(label, start, baseline, True)
+    return True
+
+
+def wait_load_sync(page, label: str, state: str = "networkidle",
+                   baseline: int = 0, timeout: int = DEFAULT_TIMEOUT) -> bool:
+    start = time.perf_counter()
+    try:
+        page.wait_for_load_state(state, timeout=timeout)
+    except PlaywrightTimeout:
+        _record(label, start, baseline, False)
+        return False
+    _record(label, start, baseline, True)
+    return True
+
+
+def wait_function_sync(page, expression: str, label: str, arg=None,
+                       baseline: int = 0, timeout: int = DEFAULT_TIMEOUT) -> bool:
+    start = time.perf_counter()
+    try:
+        page.wait_for_function(expression, arg=arg, timeout=timeout)
+    except PlaywrightTimeout:
+        _record(label, start, baseline, False)
+        return False
+    _record(label, start, baseline, True)
+    return True
@@ -2,6 +2,9 @@
 # -*- coding: utf-8 -*-
 """
 Panel NA1 自动重启脚本
+配置变量:
+- PANEL_NA1_COOKIES=remember_web_xxx=值; XSRF-TOKEN=值; pterodactyl_session=值
+- PANEL_MODE=api  (api: 先用 Pterodactyl 客户端 API 并发重启，只有 API 失败的部分才用浏览器；browser: 全程浏览器)
 """
 
 import os
@@ -11,6 +14,10 @@ from pathlib import Path
 from datetime import datetime
 from urllib.parse import unquote, quote
 
+from github_api import GitHubClient
+from pterodactyl_api import PterodactylClient, PterodactylError
+from page_waits import set_logger, summary as wait_summary, wait_response_sync, wait_selector_sync
+
 try:
     from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
 except ImportError:
@@ -19,6 +26,7 @@ except ImportError:
 
 # ==================== 配置 ====================
 BASE_URL = "https://panel.na1.host"
+PANEL_MODE = os.environ.get("PANEL_MODE", "api").strip().lower()
 OUTPUT_DIR = Path("output/screenshots")
 
 # Cookie 格式提示
@@ -40,6 +48,9 @@ def log(level: str, msg: str):
     print(f"[{timestamp}] [{level}] {msg}")
 
 
+set_logger(lambda msg: log("INFO", msg))
+
+
 def mask_id(server_id: str) -> str:
     """隐藏服务器 ID，只显示首尾字符"""
     if not server_id or len(server_id) <= 2:
@@ -140,35 +151,7 @@ def update_github_secret(secret_name: str, secret_value: str) -> bool:
         return False
     
     try:
-        from nacl import encoding, public
-        
-        headers = {
-            "Authorization": f"Bearer {repo_token}",
-            "Accept": "application/vnd.github+json",
-            "X-GitHub-Api-Version": "2022-11-28"
-        }
-        
-        pub_key_url = f"https://api.github.com/repos/{github_repo}/actions/secrets/public-key"
-        resp = requests.get(pub_key_url, headers=headers, timeout=30)
-        resp.raise_for_status()
-        pub_key_data = resp.json()
-        
-        public_key = public.PublicKey(pub_key_data["key"].encode("utf-8"), encoding.Base64Encoder())
-        sealed_box = public.SealedBox(public_key)
-        encrypted = sealed_box.encrypt(secret_value.encode("utf-8"))
-        encrypted_value = encoding.Base64Encoder().encode(encrypted).decode("utf-8")
-        
-        secret_url = f"https://api.github.com/repos/{github_repo}/actions/secrets/{secret_name}"
-        resp = requests.put(
-            secret_url,
-            headers=headers,
-            json={
-                "encrypted_value": encrypted_value,
-                "key_id": pub_key_data["key_id"]
-            },
-            timeout=30
-        )
-        resp.raise_for_status()
+        GitHubClient(repo_token, github_repo).update_secret(secret_name, secret_value)
         
         log("INFO", f"GitHub Secret 已更新")
         return True
@@ -181,6 +164,26 @@ def update_github_secret(secret_name: str, secret_value: str) -> bool:
         return False
 
 
+def cookie_values(cookie_str: str) -> dict:
+    """Cookie 字符串中的 {名称: 值}（值已 URL 解码），用于判断 Cookie 是否变化"""
+    values = {}
+    for item in (cookie_str or "").split(";"):
+        name, sep, value = item.strip().partition("=")
+        if sep:
+            values[name.strip()] = unquote(value.strip())
+    return values
+
+
+def sync_cookie_secret(new_cookie_str: str, stored: str):
+    """新 Cookie 与 Secret 中的不同时才写入"""
+    if not new_cookie_str:
+        return
+    if cookie_values(new_cookie_str) == cookie_values(stored):
+        log("INFO", "Cookie 未变化，跳过 Secret 更新")
+        return
+    update_github_secret("PANEL_NA1_COOKIES", new_cookie_str)
+
+
 def notify_telegram(ok: bool, stage: str, msg: str = "", screenshot_file: str = None):
     """发送 Telegram 通知（带截图）"""
     bot_token = env_or_default("TG_BOT_TOKEN")
@@ -251,6 +254,69 @@ def send_text_only(bot_token: str, chat_id: str, text: str):
 
 # ==================== 主逻辑 ====================
 
+def restart_via_api(preset_cookies: str):
+    """
+    API 快速路径：分页列出服务器，已停止的发送 start，其他发送 restart（并发）
+    返回 (结果行, 失败的服务器 ID, 新 Cookie)；登录或获取列表失败时返回 None，整个流程改用浏览器
+    """
+    log("INFO", "⚡ 使用 Pterodactyl 客户端 API...")
+    client = PterodactylClient(BASE_URL, parse_cookie_string(preset_cookies, "panel.na1.host"))
+    try:
+        client.check_login()
+        servers = client.list_servers()
+    except PterodactylError as e:
+        log("WARN", f"⚠️ API 不可用，改用浏览器: {e}")
+        return None
+    if not servers:
+        log("WARN", "⚠️ API 未返回服务器，改用浏览器")
+        return None
+    for server in servers:
+        log("INFO", f"📦 发现服务器: {server['name']} ({mask_id(server['id'])})")
+
+    def power(server):
+        signal = "start" if client.power_state(server["id"]) == "offline" else "restart"
+        client.power(server["id"], signal)
+        return signal
+
+    results, failed = [], []
+    for server, (signal, error) in zip(servers, client.run_all(power, servers)):
+        name = server["name"]
+        if error:
+            log("WARN", f"⚠️ {name} API 操作失败: {error}")
+            failed.append(server["id"])
+        elif signal == "start":
+            log("INFO", f"✅ {name} 已启动")
+            results.append(f"▶️ {name}: 已启动")
+        else:
+            log("INFO", f"✅ {name} 重启成功")
+            results.append(f"🔄 {name}: 已重启")
+
+    return results, failed, save_cookies_for_update(client.cookies())
+
+
+def report(success_count: int, fail_count: int, results: list, final_screenshot: str = None):
+    """发送汇总通知并退出"""
+    log("INFO", "")
+    log("INFO", "=" * 50)
+    total = success_count + fail_count
+    summary = f"成功 {success_count}/{total}, 失败 {fail_count}/{total}"
+    log("INFO", f"📊 执行完成 - {summary}")
+    log("INFO", wait_summary())
+    log("INFO", "=" * 50)
+    
+    detail_msg = f"📊 {summary}\n\n" + "\n".join(results)
+    
+    if fail_count == 0:
+        notify_telegram(True, "全部完成", detail_msg, final_screenshot)
+        sys.exit(0)
+    elif success_count > 0:
+        notify_telegram(True, "部分完成", detail_msg, final_screenshot)
+        sys.exit(0)
+    else:
+        notify_telegram(False, "全部失败", detail_msg, final_screenshot)
+        sys.exit(1)
+
+
 def main():
     """主函数"""
     log("INFO", "=" * 50)
@@ -261,11 +327,30 @@ def main():
     
     try:
         preset_cookies = env_or_throw("PANEL_NA1_COOKIES")
+        secret_cookies = preset_cookies
     except ValueError as e:
         log("ERROR", str(e))
         notify_telegram(False, "初始化失败", f"Cookie 环境变量未设置\n\n{COOKIE_FORMAT_HINT}")
         sys.exit(1)
     
+    # API 成功的服务器不再经过浏览器；retry 为 None 表示全部走浏览器
+    api_results, retry = [], None
+    if PANEL_MODE == "api":
+        try:
+            outcome = restart_via_api(preset_cookies)
+        except Exception as e:
+            # API 路径的任何意外错误都不能影响浏览器流程
+            log("WARN", f"⚠️ API 流程出错，改用浏览器: {e}")
+            outcome = None
+        if outcome:
+            api_results, retry, new_cookie_str = outcome
+            if not retry:
+                sync_cookie_secret(new_cookie_str, secret_cookies)
+                report(len(api_results), 0, api_results)
+            # 还要走浏览器时用新 Cookie 登录，Secret 等浏览器流程结束后只写一次
+            preset_cookies = new_cookie_str or preset_cookies
+            log("INFO", f"🌐 {len(retry)} 个服务器改用浏览器处理")
+    
     log("INFO", "🌐 启动浏览器...")
     
     with sync_playwright() as p:
@@ -335,8 +420,9 @@ def main():
             
             # 2. 访问首页
             log("INFO", f"🔗 访问 {BASE_URL}...")
-            page.goto(BASE_URL, wait_until="networkidle", timeout=60000)
-            page.wait_for_timeout(5000)
+            wait_response_sync(page, lambda: page.goto(BASE_URL, wait_until="networkidle", timeout=60000),
+                               lambda r: "/api/client" in r.url and "page=" in r.url,
+                               "服务器列表 API", baseline=5000, timeout=10000)
             
             current_url = page.url
             title = page.title()
@@ -362,7 +448,7 @@ def main():
                 if dismiss_btn.is_visible():
                     dismiss_btn.click()
                     log("INFO", "关闭公告弹窗")
-                    page.wait_for_timeout(1000)
+                    wait_selector_sync(page, 'text=Dismiss', "公告弹窗关闭", state="hidden", baseline=1000, timeout=3000)
             except:
                 pass
             
@@ -371,7 +457,7 @@ def main():
                 if maybe_later.is_visible():
                     maybe_later.click()
                     log("INFO", "关闭反馈弹窗")
-                    page.wait_for_timeout(1000)
+                    wait_selector_sync(page, 'text=Maybe later', "反馈弹窗关闭", state="hidden", baseline=1000, timeout=3000)
             except:
                 pass
             
@@ -384,12 +470,11 @@ def main():
             new_cookies = context.cookies()
             new_cookie_str = save_cookies_for_update(new_cookies)
             
-            # 6. 更新 GitHub Secret
-            if new_cookie_str:
-                update_github_secret("PANEL_NA1_COOKIES", new_cookie_str)
+            # 6. 更新 GitHub Secret（与运行开始时的不同才写入）
+            sync_cookie_secret(new_cookie_str, secret_cookies)
             
             # 7. 获取服务器列表
-            servers = api_servers
+            servers = [s for s in api_servers if retry is None or s["id"] in retry]
             
             if not servers:
                 sp = screenshot_path("03-no-servers")
@@ -400,10 +485,10 @@ def main():
             
             log("INFO", f"📋 共找到 {len(servers)} 个服务器")
             
-            # 8. 遍历服务器
-            success_count = 0
+            # 8. 遍历服务器（接着 API 的结果统计）
+            success_count = len(api_results)
             fail_count = 0
-            results = []
+            results = list(api_results)
             
             for idx, server in enumerate(servers):
                 server_id = server["id"]
@@ -416,7 +501,7 @@ def main():
                 
                 try:
                     page.goto(server_url, wait_until="networkidle", timeout=60000)
-                    page.wait_for_timeout(3000)
+                    wait_selector_sync(page, 'button:has-text("Restart")', "电源按钮", baseline=3000, timeout=10000)
                     
                     sp_server = screenshot_path(f"04-server-{idx + 1}")
                     page.screenshot(path=sp_server, full_page=True)
@@ -457,8 +542,8 @@ def main():
                             start_btn = page.locator('button:has-text("Start")').first
                             if not start_btn.is_disabled():
                                 log("INFO", "▶️ 点击 Start 按钮...")
-                                start_btn.click()
-                                page.wait_for_timeout(3000)
+                                wait_response_sync(page, start_btn.click, f"/api/client/servers/{server_id}/power",
+                                                   "Start 电源API", baseline=3000)
                                 
                                 sp_started = screenshot_path(f"05-started-{idx + 1}")
                                 page.screenshot(path=sp_started, full_page=True)
@@ -476,8 +561,8 @@ def main():
                         continue
                     
                     log("INFO", f"🔄 点击 Restart 按钮...")
-                    restart_btn.click()
-                    page.wait_for_timeout(5000)
+                    wait_response_sync(page, restart_btn.click, f"/api/client/servers/{server_id}/power",
+                                       "Restart 电源API", baseline=5000)
                     
                     sp_restarted = screenshot_path(f"05-restarted-{idx + 1}")
                     page.screenshot(path=sp_restarted, full_page=True)
@@ -496,28 +581,9 @@ def main():
                     log("ERROR", f"❌ {server_name} 操作失败: {e}")
                     results.append(f"❌ {server_name}: 失败")
                     fail_count += 1
-                
-                page.wait_for_timeout(2000)
             
             # 9. 报告
-            log("INFO", "")
-            log("INFO", "=" * 50)
-            total = len(servers)
-            summary = f"成功 {success_count}/{total}, 失败 {fail_count}/{total}"
-            log("INFO", f"📊 执行完成 - {summary}")
-            log("INFO", "=" * 50)
-            
-            detail_msg = f"📊 {summary}\n\n" + "\n".join(results)
-            
-            if fail_count == 0:
-                notify_telegram(True, "全部完成", detail_msg, final_screenshot)
-                sys.exit(0)
-            elif success_count > 0:
-                notify_telegram(True, "部分完成", detail_msg, final_screenshot)
-                sys.exit(0)
-            else:
-                notify_telegram(False, "全部失败", detail_msg, final_screenshot)
-                sys.exit(1)
+            report(success_count, fail_count, results, final_screenshot)
             
         except Exception as e:
             log("ERROR", f"💥 发生异常: {e}")
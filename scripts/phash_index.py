@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+感知哈希（dHash）与 BK-tree 近似重复索引
+- dhash: 64 位差值哈希，对重新压缩 / 缩放不敏感
+- BKTree: 按汉明距离组织，查询阈值内的近邻无需遍历全部条目
+"""
+
+import cv2
+import numpy as np
+
+
+def dhash(img) -> int:
+    """计算 64 位 dHash，img 为 BGR 或灰度图（通常是已缩放的 100x100）"""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def to_hex(h: int) -> str:
+    return f"{h:016x}"
+
+
+def from_hex(s: str) -> int:
+    return int(s, 16)
+
+
+class BKTree:
+    """
+    汉明距离 BK-tree
+    节点: [hash, value, {distance: child}]
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, h: int, value):
+        self.size += 1
+        if self.root is None:
+            self.root = [h, value, {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(h, node[0])
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, value, {}]
+                return
+            node = child
+
+    def search(self, h: int, max_dist: int) -> list:
+        """返回 [(distance, hash, value), ...]，按距离升序"""
+        if self.root is None or max_dist < 0:
+            return []
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= max_dist:
+                found.append((d, node[0], node[1]))
+            lo, hi = d - max_dist, d + max_dist
+            for dist, child in node[2].items():
+                if lo <= dist <= hi:
+                    stack.append(child)
+        found.sort(key=lambda x: x[0])
+        return found
+
+    def __len__(self):
+        return self.size
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Pterodactyl 客户端 API（用面板的登录 Cookie 认证，panel-na1 / Panel-Bytte 共用）
+- 复用浏览器 Cookie（remember_web_* / pterodactyl_session / XSRF-TOKEN），
+  写操作带 X-XSRF-TOKEN 头（XSRF-TOKEN Cookie URL 解码后的值，与面板前端的 axios 相同）
+- GET /api/client 分页列出服务器；GET /api/client/servers/<id>/resources 读取运行状态
+- POST /api/client/servers/<id>/power 发送 start / restart，多个服务器并发
+- Cookie 失效、接口报错时抛出 PterodactylError，由调用方退回浏览器流程
+- 预设 Cookie 和面板下发的 Cookie 可能同名但域名不同（.host / host），
+  XSRF-TOKEN 取面板最近一次下发的值，不用 cookies.get（会抛 CookieConflictError）；
+  cookies() 按名称去重，面板下发过的 Cookie 优先
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+import requests
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+
+
+class PterodactylError(Exception):
+    pass
+
+
+class PterodactylClient:
+
+    def __init__(self, base_url: str, cookies: list, timeout: float = 30, workers: int = 4):
+        """cookies: parse_cookie_string 的结果（[{"name", "value", "domain", ...}]）"""
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.workers = workers
+        self.issued = {}          # 面板下发的 Cookie: 名称 -> 最近一次的值
+        self.session = requests.Session()
+        self.session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept": "application/json",
+            "X-Requested-With": "XMLHttpRequest",
+            "Referer": f"{self.base_url}/",
+        })
+        for c in cookies:
+            self.session.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path", "/"))
+
+    # ---------- 请求 ----------
+
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        headers = kwargs.pop("headers", {})
+        xsrf = self._xsrf_token()
+        if xsrf:
+            headers["X-XSRF-TOKEN"] = unquote(xsrf)
+        try:
+            resp = self.session.request(method, f"{self.base_url}{path}", headers=headers,
+                                        timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            raise PterodactylError(f"{method} {path}: {e}") from e
+        # 包括重定向途中下发的 Cookie
+        for r in (*resp.history, resp):
+            for c in r.cookies:
+                self.issued[c.name] = c.value
+        if resp.status_code in (401, 419):
+            raise PterodactylError(f"{method} {path}: {resp.status_code}，Cookie 已失效")
+        if resp.status_code >= 400:
+            raise PterodactylError(f"{method} {path}: {resp.status_code} {resp.text[:200]}")
+        return resp
+
+    def _xsrf_token(self) -> str:
+        """面板最近一次下发的 XSRF-TOKEN；还没有时用预设 Cookie 中的（有多个时取最后一个）"""
+        if self.issued.get("XSRF-TOKEN"):
+            return self.issued["XSRF-TOKEN"]
+        values = [c.value for c in self.session.cookies if c.name == "XSRF-TOKEN"]
+        return values[-1] if values else ""
+
+    def _json(self, method: str, path: str, **kwargs) -> dict:
+        try:
+            data = self._request(method, path, **kwargs).json()
+        except ValueError as e:
+            raise PterodactylError(f"{method} {path} 返回的不是 JSON: {e}") from e
+        if not isinstance(data, dict):
+            raise PterodactylError(f"{method} {path} 返回了意外的数据")
+        return data
+
+    def check_login(self):
+        """打开首页刷新会话和 XSRF-TOKEN；跳转到登录页时抛出 PterodactylError"""
+        resp = self._request("GET", "/", headers={"Accept": "text/html"})
+        if "/auth/login" in resp.url:
+            raise PterodactylError("Cookie 已失效，跳转到登录页")
+
+    # ---------- 服务器 ----------
+
+    def list_servers(self) -> list:
+        """[{"id", "name", "url"}]，按面板分页逐页读取"""
+        servers, page, total_pages = [], 1, 1
+        while page <= total_pages:
+            data = self._json("GET", "/api/client", params={"page": page})
+            for item in data.get("data", []):
+                if isinstance(item, dict) and item.get("object") == "server":
+                    attrs = item.get("attributes", {})
+                    if attrs.get("identifier"):
+                        servers.append({
+                            "id": attrs["identifier"],
+                            "name": attrs.get("name", "unknown"),
+                            "url": f"{self.base_url}/server/{attrs['identifier']}",
+                        })
+            total_pages = data.get("meta", {}).get("pagination", {}).get("total_pages", 1)
+            page += 1
+        return servers
+
+    def power_state(self, server_id: str) -> str:
+        """running / starting / stopping / offline"""
+        data = self._json("GET", f"/api/client/servers/{server_id}/resources")
+        return data.get("attributes", {}).get("current_state", "")
+
+    def power(self, server_id: str, signal: str):
+        """signal: start / stop / restart / kill；成功时面板返回 204"""
+        self._request("POST", f"/api/client/servers/{server_id}/power", json={"signal": signal})
+
+    def run_all(self, fn, items: list) -> list:
+        """并发执行 fn(item)，按 items 顺序返回 (结果, 异常)"""
+        def call(item):
+            try:
+                return fn(item), None
+            except Exception as e:
+                return None, e
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(items) or 1))) as pool:
+            return list(pool.map(call, items))
+
+    def cookies(self) -> list:
+        """[{"name", "value"}]，格式与 Playwright context.cookies() 兼容（save_cookies_for_update 用）"""
+        latest = {c.name: c.value for c in self.session.cookies}
+        latest.update(self.issued)
+        return [{"name": name, "value": value} for name, value in latest.items()]
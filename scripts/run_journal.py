@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+追加写入的 JSONL 运行日志
+每行一个事件，写入后立即 flush；进程被杀时最多丢失最后一行（读取时忽略不完整的行）
+"""
+
+import json
+import os
+import threading
+
+
+class RunJournal:
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self._file = None
+
+    def read(self) -> list:
+        events = []
+        if not os.path.exists(self.path):
+            return events
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # 被中断写入的最后一行
+                    break
+        return events
+
+    def open(self, events: list = None):
+        """打开日志继续追加；传入 events 时先用它们重写日志"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self.lock:
+            if self._file:
+                self._file.close()
+            if events is not None:
+                tmp = f"{self.path}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    for event in events:
+                        f.write(json.dumps(event, ensure_ascii=False) + "\n")
+                os.replace(tmp, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def append(self, event: dict):
+        with self.lock:
+            if not self._file:
+                return
+            self._file.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def clear(self):
+        with self.lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
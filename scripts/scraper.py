@@ -5,125 +5,488 @@ import os
 import json
 import hashlib
 import base64
+import queue
 import shutil
+import threading
+import time
+import multiprocessing
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from urllib.parse import urlsplit
 
 import cloudscraper
-from bs4 import BeautifulSoup
-import cv2
 import requests
 
+from hash_registry import HashRegistry
+from http_engine import HttpEngine
+from download_policy import DownloadPolicy
+from github_api import GitHubClient
+from image_ops import MIN_SIDE, THUMB_WIDTH, process_batch
+from link_extract import iter_fancybox_links
+from metadata_cache import MetadataCache
+from metrics import Metrics, profiling
+from page_discovery import PageProber
+from phash_index import BKTree
+from run_journal import RunJournal
+from sprites import INDEX as SPRITE_INDEX, plan_sprites
+from sources import (TypechoSource, describe_progress, load_sources, read_progress,
+                     write_progress)
+from update_count import apply_uploaded, normalize as normalize_counts
+from url_index import UrlIndex
+
 # ==== 配置 ====
-BRIGHTNESS_THRESHOLD = 130
 BATCH_SIZE = 100
-TEMP_DIR = "temp_download"
-LOCAL_DIR = "local_images"
+# 本地状态目录（由 Actions cache 保存，任务中断后可以续跑）
+STATE_DIR = os.environ.get("SCRAPER_STATE_DIR", ".scraper_state")
+LOCAL_DIR = os.path.join(STATE_DIR, "local_images")
+JOURNAL_FILE = os.path.join(STATE_DIR, "journal.jsonl")
 
 # 起始ID
 START_ID = 342
-# 最大连续404次数（真正的结束）
+# 近似重复判定的汉明距离阈值（dHash 64位），-1 关闭
+PHASH_THRESHOLD = int(os.environ.get("PHASH_THRESHOLD", "6"))
+NEAR_DUP_REPORT = "near_duplicates.json"
+
+# 最大连续404次数（真正的结束）；也是探测最新页面时容忍的 ID 空缺
 MAX_404_COUNT = 5
+# 开始前先查找最新页面 ID（RSS，失败则探测），得到确定的抓取范围
+DISCOVER_LATEST = os.environ.get("DISCOVER_LATEST", "1") == "1"
+
+# 并发配置
+PAGE_WORKERS = int(os.environ.get("PAGE_WORKERS", "4"))          # 同时抓取的页面数
+DOWNLOAD_WORKERS = int(os.environ.get("DOWNLOAD_WORKERS", "8"))  # 下载线程数
+ENCODE_WORKERS = int(os.environ.get("ENCODE_WORKERS", str(os.cpu_count() or 2)))  # 分析/编码线程数
+ENCODE_PROCESSES = int(os.environ.get("ENCODE_PROCESSES", str(os.cpu_count() or 2)))  # 编码进程数，0 = 在线程中编码
+CLASSIFY_BATCH = int(os.environ.get("CLASSIFY_BATCH", "16"))      # 每次批量分类的最大图片数
+HOST_CONCURRENCY = int(os.environ.get("HOST_CONCURRENCY", "4"))  # 每个主机同时进行的请求数
+HTTP2 = os.environ.get("HTTP2", "1") == "1"                       # GitHub API / 图片主机启用 HTTP/2
+
+# 运行指标（JSON + Actions 任务摘要）；PROFILE=cprofile|pyinstrument 开启性能分析
+METRICS_FILE = os.environ.get("METRICS_FILE", "scraper_metrics.json")
+PROFILE = os.environ.get("PROFILE", "")
+PROFILE_OUTPUT = "scraper_profile"
+
+# 下载检查：超过该大小或宽高小于 MIN_SIDE 的图片在传输中途放弃
+MAX_IMAGE_BYTES = int(os.environ.get("MAX_IMAGE_BYTES", str(40 * 1024 * 1024)))
+
+# 默认站点和 GitHub API 地址（基准测试中指向本地替身服务）
+SITE_URL = os.environ.get("SITE_URL", "https://img.hyun.cc").rstrip("/")
+DEFAULT_SOURCE = "main"
+# 多个来源（JSON 列表，格式见 sources.py），为空时只抓默认站点
+SOURCES = os.environ.get("SOURCES", "")
+GITHUB_API = os.environ.get("GITHUB_API", "https://api.github.com").rstrip("/")
 
 # 目标私有仓库
 TARGET_REPO = os.environ.get("TARGET_REPO", "")
 GITHUB_TOKEN = os.environ.get("GH_TOKEN", "")
 TARGET_BRANCH = "main"
 
+# 上传模式: bulk = Git Data API 单次提交, contents = 逐个文件 PUT
+UPLOAD_MODE = os.environ.get("UPLOAD_MODE", "bulk")
+BLOB_WORKERS = int(os.environ.get("BLOB_WORKERS", "8"))  # 并发创建 blob 的线程数
+BULK_COMMIT_RETRIES = 3
+GITHUB_RATE = float(os.environ.get("GITHUB_RATE", "10"))  # GitHub API 每秒请求数上限（令牌桶）
+GITHUB_WRITE_RATE = float(os.environ.get("GITHUB_WRITE_RATE", "1"))  # 其中写请求（提交、Contents PUT 等，不含 blob）的上限
+
 # 目标仓库中的路径
 IMAGES_DIR = "ri"
 FOLDERS = ["vd", "vl", "hd", "hl"]
+# 二进制哈希注册表（见 hash_registry.py），增量段达到该数量时合并
+REGISTRY_DIR = f"{IMAGES_DIR}/registry"
+REGISTRY_COMPACT_EVERY = 16
+# 其他输出：缩略图、AVIF（见 image_ops.render_variants）和缩略图雪碧图（见 sprites.py）
+THUMBS_DIR = f"{IMAGES_DIR}/thumbs"
+AVIF_DIR = f"{IMAGES_DIR}/avif"
+SPRITES_DIR = f"{IMAGES_DIR}/sprites"
+SPRITES = os.environ.get("SPRITES", "1") == "1"
 
 scraper = cloudscraper.create_scraper(
     browser={'browser': 'chrome', 'platform': 'windows', 'mobile': False}
 )
 
 
-# ============ GitHub API ============
+class HostLimiter:
+    """按主机限制同时进行的请求数"""
 
-def github_get_sha(path: str) -> str | None:
-    if not GITHUB_TOKEN or not TARGET_REPO:
-        return None
-    
-    url = f"https://api.github.com/repos/{TARGET_REPO}/contents/{path}"
-    headers = {
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-    
-    try:
-        resp = requests.get(url, headers=headers, timeout=30)
-        if resp.status_code == 200:
-            return resp.json().get("sha")
-    except:
-        pass
-    return None
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self._lock = threading.Lock()
+        self._slots = {}
 
+    @contextmanager
+    def slot(self, url: str):
+        host = urlsplit(url).netloc
+        with self._lock:
+            sem = self._slots.get(host)
+            if sem is None:
+                sem = self._slots[host] = threading.BoundedSemaphore(self.limit)
+        with sem:
+            yield
 
-def github_get_json(path: str) -> tuple:
-    if not GITHUB_TOKEN or not TARGET_REPO:
-        return None, None
-    
-    url = f"https://api.github.com/repos/{TARGET_REPO}/contents/{path}"
-    headers = {
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-    
+
+def create_encode_pool() -> ProcessPoolExecutor | None:
+    """
+    创建编码进程池并立即启动全部子进程
+    使用 fork：子进程只运行 image_ops 中的函数，不会重新执行本脚本的模块级初始化；
+    在 main() 中、任何线程（HttpEngine 的事件循环、流水线线程）启动之前调用，
+    fork 时进程里只有主线程，子进程不会继承被其他线程持有的锁
+    """
+    if ENCODE_PROCESSES <= 0:
+        return None
     try:
-        resp = requests.get(url, headers=headers, timeout=30)
-        if resp.status_code == 200:
-            data = resp.json()
-            content = base64.b64decode(data["content"]).decode("utf-8")
-            return content, data["sha"]
+        pool = ProcessPoolExecutor(
+            max_workers=ENCODE_PROCESSES,
+            mp_context=multiprocessing.get_context("fork")
+        )
+        # fork 方式下首次提交会一次性启动全部子进程，之后不再 fork
+        pool.submit(process_batch, []).result()
+        return pool
     except Exception as e:
-        print(f"⚠️ 获取JSON失败 {path}: {e}")
-    return None, None
+        print(f"⚠️ 编码进程池不可用，改为线程编码: {e}")
+        return None
+
 
+host_limiter = HostLimiter(HOST_CONCURRENCY)
 
-def github_upload(path: str, content: bytes, message: str, sha: str = None) -> bool:
-    if not GITHUB_TOKEN or not TARGET_REPO:
+download_policy = DownloadPolicy(MAX_IMAGE_BYTES, MIN_SIDE)
+metrics = Metrics()
+
+
+# ============ GitHub API ============
+
+class RemoteStore:
+    """
+    目标仓库的读写：GitHubClient（限速 / 重试 / ETag）+ 远程元数据的跨运行缓存（内容 + blob SHA + ETag）
+    在 main() 中创建，传给加载和上传函数
+    """
+
+    def __init__(self, github: GitHubClient, cache: MetadataCache):
+        self.github = github
+        self.cache = cache
+
+    # ---------- Contents API ----------
+
+    def get_sha(self, path: str) -> str | None:
+        if not GITHUB_TOKEN or not TARGET_REPO:
+            return None
+
+        try:
+            data = self.github.get_json(f"contents/{path}")
+            return data.get("sha") if data else None
+        except Exception as e:
+            print(f"⚠️ 获取SHA失败 {path}: {e}")
+        return None
+
+    def fetch(self, path: str) -> bytes | None:
+        """
+        下载文件原始内容（支持超过 1MB 的文件），带本地缓存的 ETag 做条件请求
+        未变化（304）时直接使用缓存内容；文件不存在或失败返回 None
+        """
+        if not GITHUB_TOKEN or not TARGET_REPO:
+            return None
+
+        etag, cached = self.cache.lookup(path)
+        headers = {"Accept": "application/vnd.github.raw"}
+        if etag:
+            headers["If-None-Match"] = etag
+        try:
+            resp = self.github.get(f"contents/{path}", headers=headers, timeout=120)
+        except Exception as e:
+            print(f"⚠️ 下载文件失败 {path}: {e}")
+            return None
+
+        if resp.status_code == 304 and cached is not None:
+            self.cache.store(path, cached, etag, hit=True)
+            return cached
+        if resp.status_code == 404:
+            self.cache.forget(path, missing=True)
+            return None
+        if resp.status_code != 200:
+            print(f"⚠️ 下载文件失败 {path}: {resp.status_code}")
+            return None
+        self.cache.store(path, resp.content, resp.headers.get("ETag"), hit=resp.from_cache)
+        return resp.content
+
+    def get_json(self, path: str) -> tuple:
+        """返回 (文本, blob SHA)；SHA 记在缓存里，之后写入同一文件时直接复用"""
+        content = self.fetch(path)
+        if content is None:
+            return None, None
+        return content.decode("utf-8"), self.cache.sha(path)
+
+    def upload(self, path: str, content: bytes, message: str, sha: str = None) -> bool:
+        if not GITHUB_TOKEN or not TARGET_REPO:
+            return False
+
+        data = {
+            "message": message,
+            "content": base64.b64encode(content).decode("utf-8"),
+            "branch": TARGET_BRANCH
+        }
+        if sha:
+            data["sha"] = sha
+
+        try:
+            with metrics.timer("github_upload"):
+                resp = self.github.request("PUT", f"contents/{path}", data, timeout=60)
+            metrics.count("github_upload_bytes", len(content))
+            if not resp.ok:
+                print(f"⚠️ 上传 {path}: {resp.status_code} {resp.text[:200]}")
+            return resp.ok
+        except Exception as e:
+            print(f"❌ 上传失败 {path}: {e}")
+            return False
+
+    def delete(self, path: str, message: str) -> bool:
+        """删除文件；文件本来就不存在时视为成功"""
+        if not GITHUB_TOKEN or not TARGET_REPO:
+            return False
+
+        sha = self.cache.sha(path) if self.cache.known(path) else self.get_sha(path)
+        if not sha:
+            return True
+        try:
+            resp = self.github.request("DELETE", f"contents/{path}",
+                                       {"message": message, "sha": sha, "branch": TARGET_BRANCH},
+                                       timeout=60)
+            if resp.ok or resp.status_code == 404:
+                self.cache.forget(path, missing=True)
+                return True
+            print(f"⚠️ 删除 {path}: {resp.status_code} {resp.text[:200]}")
+        except Exception as e:
+            print(f"⚠️ 删除失败 {path}: {e}")
         return False
+
+    def load_json(self, path: str, default=None) -> dict:
+        content, _ = self.get_json(path)
+        if content:
+            try:
+                return json.loads(content)
+            except:
+                pass
+        return default if default is not None else {}
+
+    def save_file(self, path: str, content: bytes, msg: str) -> bool:
+        """
+        写入文件：内容与远程相同则跳过；SHA 优先用本次读取时记下的，
+        只有从未读取过的文件才单独查询，缓存的 SHA 过期（写入失败）时查询后重试一次
+        """
+        if self.cache.unchanged(path, content):
+            return True
+        known = self.cache.known(path)
+        sha = self.cache.sha(path) if known else self.get_sha(path)
+        ok = self.upload(path, content, msg, sha)
+        if not ok and known:
+            fresh = self.get_sha(path)
+            if fresh != sha:
+                ok = self.upload(path, content, msg, fresh)
+        if ok:
+            self.cache.written(path, content)
+        return ok
+
+    def save_json(self, path: str, data: dict, msg: str) -> bool:
+        content = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+        return self.save_file(path, content, msg)
+
+    # ---------- Git Data API（单次提交批量上传） ----------
+
+    def git_request(self, method: str, path: str, payload: dict = None,
+                    write_limit: bool = True) -> dict | None:
+        """调用 /repos/{repo}/git/* 接口，失败返回 None"""
+        if not GITHUB_TOKEN or not TARGET_REPO:
+            return None
+
+        try:
+            resp = self.github.request(method, f"git/{path}", payload, timeout=60,
+                                       write_limit=write_limit)
+            if resp.ok:
+                return resp.json()
+            print(f"⚠️ Git API {method} {path}: {resp.status_code} {resp.text[:200]}")
+        except Exception as e:
+            print(f"⚠️ Git API {method} {path} 失败: {e}")
+        return None
+
+    def create_blob(self, content: bytes) -> str | None:
+        # blob 在提交之前不会出现在仓库里，不走写请求令牌桶，BLOB_WORKERS 个线程并发创建
+        with metrics.timer("github_blob"):
+            data = self.git_request("POST", "blobs", {
+                "content": base64.b64encode(content).decode("utf-8"),
+                "encoding": "base64"
+            }, write_limit=False)
+        metrics.count("github_upload_bytes", len(content))
+        return data.get("sha") if data else None
+
+    def get_head(self) -> tuple:
+        """返回目标分支的 (commit_sha, tree_sha)"""
+        ref = self.git_request("GET", f"ref/heads/{TARGET_BRANCH}")
+        if not ref:
+            return None, None
+        commit_sha = ref["object"]["sha"]
+        commit = self.git_request("GET", f"commits/{commit_sha}")
+        if not commit:
+            return None, None
+        return commit_sha, commit["tree"]["sha"]
+
+    def commit_tree(self, entries: list, message: str) -> str | None:
+        """
+        基于分支最新提交创建一棵树 + 一个提交 + 一次 ref 更新
+        ref 更新冲突（分支被其他人推进）时基于新的 HEAD 重试
+        """
+        with metrics.timer("github_commit"):
+            return self._commit_tree(entries, message)
+
+    def _commit_tree(self, entries: list, message: str) -> str | None:
+        for attempt in range(1, BULK_COMMIT_RETRIES + 1):
+            parent_sha, base_tree = self.get_head()
+            if not parent_sha:
+                return None
+
+            tree = self.git_request("POST", "trees", {"base_tree": base_tree, "tree": entries})
+            if not tree:
+                return None
+
+            commit = self.git_request("POST", "commits", {
+                "message": message,
+                "tree": tree["sha"],
+                "parents": [parent_sha]
+            })
+            if not commit:
+                return None
+
+            if self.git_request("PATCH", f"refs/heads/{TARGET_BRANCH}",
+                                {"sha": commit["sha"], "force": False}):
+                return commit["sha"]
+
+            print(f"⚠️ 更新分支失败，重试 ({attempt}/{BULK_COMMIT_RETRIES})")
+        return None
+
+
+def save_progress(remote: RemoteStore, sources: list, last_ids: dict) -> bool:
+    """按来源更新 progress.json，其他来源和字段保持不变"""
+    progress = write_progress(remote.load_json("progress.json", {}), last_ids, sources)
+    return remote.save_json("progress.json", progress,
+                            f"Update progress to {describe_progress(last_ids)}")
+
+
+def load_registry(remote: RemoteStore) -> HashRegistry:
+    """加载二进制注册表；不存在时从旧的 JSON 注册表迁移"""
+    manifest = remote.load_json(f"{REGISTRY_DIR}/manifest.json", {})
+    if manifest:
+        return HashRegistry.load(
+            FOLDERS, manifest, lambda name: remote.fetch(f"{REGISTRY_DIR}/{name}")
+        )
     
-    url = f"https://api.github.com/repos/{TARGET_REPO}/contents/{path}"
-    headers = {
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-    
-    data = {
-        "message": message,
-        "content": base64.b64encode(content).decode("utf-8"),
-        "branch": TARGET_BRANCH
-    }
-    if sha:
-        data["sha"] = sha
-    
-    try:
-        resp = requests.put(url, headers=headers, json=data, timeout=60)
-        return resp.status_code in [200, 201]
-    except Exception as e:
-        print(f"❌ 上传失败 {path}: {e}")
+    print("🔄 未找到二进制注册表，从 hash_registry.json 迁移")
+    registry = HashRegistry(FOLDERS)
+    registry.import_json(
+        remote.load_json(f"{IMAGES_DIR}/hash_registry.json", {}),
+        remote.load_json(f"{IMAGES_DIR}/phash_registry.json", {})
+    )
+    return registry
+
+
+def load_url_index(remote: RemoteStore) -> UrlIndex:
+    """加载已入库图片链接索引"""
+    manifest = remote.load_json(f"{REGISTRY_DIR}/{UrlIndex.MANIFEST}", {})
+    if manifest:
+        return UrlIndex.load(manifest, lambda name: remote.fetch(f"{REGISTRY_DIR}/{name}"))
+    return UrlIndex()
+
+
+def save_table_contents(remote: RemoteStore, table) -> bool:
+    """
+    通过 Contents API 写入分段表，与单次提交相同每 REGISTRY_COMPACT_EVERY 段合并一次
+    先写段文件和 manifest，合并掉的增量段最后删除（删除失败只留下未引用的文件）
+    """
+    files, manifest = table.plan_write(REGISTRY_COMPACT_EVERY)
+    if not files:
+        return True
+    for name, data in files.items():
+        if data is None:
+            continue
+        path = f"{REGISTRY_DIR}/{name}"
+        if not remote.save_file(path, data, f"Update {path}"):
+            return False
+    if not remote.save_json(f"{REGISTRY_DIR}/{table.MANIFEST}", manifest,
+                            f"Update {table.MANIFEST} ({manifest['count']})"):
         return False
+    for name, data in files.items():
+        if data is None:
+            path = f"{REGISTRY_DIR}/{name}"
+            if not remote.delete(path, f"Remove {path}"):
+                print(f"  ⚠️ 未能删除已合并的 {path}")
+    return True
 
 
-def get_remote_json(path: str, default=None) -> dict:
-    content, _ = github_get_json(path)
-    if content:
-        try:
-            return json.loads(content)
-        except:
-            pass
-    return default if default is not None else {}
+def rendition_paths(remote_path: str) -> dict:
+    """ri/<folder>/<n>.webp 对应的缩略图和 AVIF 路径"""
+    folder, name = remote_path.split("/")[-2:]
+    stem = name.rsplit(".", 1)[0]
+    return {"thumb": f"{THUMBS_DIR}/{folder}/{stem}.webp", "avif": f"{AVIF_DIR}/{folder}/{stem}.avif"}
 
 
-def save_remote_json(path: str, data: dict, msg: str) -> bool:
-    sha = github_get_sha(path)
-    content = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
-    return github_upload(path, content, msg, sha)
+def item_files(item: dict) -> list:
+    """上传项的全部文件 [(本地路径, 远程路径)]，主图在前，其他输出只包含本地存在的"""
+    files = [(item["local_path"], item["remote_path"])]
+    for path in rendition_paths(item["remote_path"]).values():
+        local_path = os.path.join(LOCAL_DIR, path)
+        if os.path.exists(local_path):
+            files.append((local_path, path))
+    return files
+
+
+def build_sprites(remote: RemoteStore, uploaded: list) -> tuple:
+    """
+    把本次上传成功的图片（主图远程路径）的缩略图拼进各文件夹的雪碧图
+    返回 ({雪碧图路径: WebP}, {index.json 路径: 数据})；某个文件夹失败时跳过该文件夹
+    """
+    if not SPRITES or THUMB_WIDTH <= 0:
+        return {}, {}
+    
+    by_folder = {}
+    for remote_path in uploaded:
+        local_path = os.path.join(LOCAL_DIR, rendition_paths(remote_path)["thumb"])
+        if not os.path.exists(local_path):
+            continue
+        folder, name = remote_path.split("/")[-2:]
+        with open(local_path, "rb") as f:
+            by_folder.setdefault(folder, {})[int(name.split(".")[0])] = f.read()
+    
+    sheets, indexes = {}, {}
+    for folder, thumbs in sorted(by_folder.items()):
+        base = f"{SPRITES_DIR}/{folder}"
+        loaded = []
+        
+        def load_thumbs(nums: list, folder=folder, loaded=loaded) -> dict:
+            paths = [f"{THUMBS_DIR}/{folder}/{num}.webp" for num in nums]
+            loaded.extend(paths)
+            with ThreadPoolExecutor(max_workers=max(1, BLOB_WORKERS)) as pool:
+                return dict(zip(nums, pool.map(remote.fetch, paths)))
+        
+        try:
+            with metrics.timer("sprites"):
+                files, index, open_nums = plan_sprites(
+                    remote.load_json(f"{base}/{SPRITE_INDEX}", {}), THUMB_WIDTH, thumbs, load_thumbs
+                )
+        except Exception as e:
+            print(f"⚠️ 雪碧图生成失败 {folder}: {e}")
+            continue
+        sheets.update({f"{base}/{name}": data for name, data in files.items()})
+        indexes[f"{base}/{SPRITE_INDEX}"] = index
+        print(f"🧩 {folder}: {len(thumbs)} 张缩略图 → {', '.join(files) or '无变化'}")
+        
+        # 已写满的雪碧图不会再重建，其中的缩略图不必留在元数据缓存里
+        still_open = {f"{THUMBS_DIR}/{folder}/{num}.webp" for num in open_nums}
+        for path in loaded:
+            if path not in still_open:
+                remote.cache.forget(path)
+    return sheets, indexes
 
 
-def batch_upload_to_github(upload_queue: list, hash_registry: dict, 
-                           folder_counts: dict, last_id: int) -> bool:
+def batch_upload_to_github(remote: RemoteStore, upload_queue: list, registry: HashRegistry, url_index: UrlIndex,
+                           count_data: dict, sources: list, last_ids: dict) -> bool:
     """批量上传所有文件到GitHub"""
     if not upload_queue:
         print("📭 没有需要上传的文件")
@@ -135,6 +498,7 @@ def batch_upload_to_github(upload_queue: list, hash_registry: dict,
     
     success_count = 0
     fail_count = 0
+    uploaded = []
     
     for idx, item in enumerate(upload_queue, 1):
         local_path = item["local_path"]
@@ -147,16 +511,20 @@ def batch_upload_to_github(upload_queue: list, hash_registry: dict,
             with open(local_path, "rb") as f:
                 content = f.read()
             
-            if github_upload(remote_path, content, f"Add {remote_path}"):
-                hash_registry[file_hash] = remote_path.replace(f"{IMAGES_DIR}/", "")
+            if remote.upload(remote_path, content, f"Add {remote_path}"):
                 success_count += 1
+                uploaded.append(remote_path)
                 print("✅")
+                # 缩略图 / AVIF 失败不影响主图
+                for extra_local, extra_remote in item_files(item)[1:]:
+                    with open(extra_local, "rb") as f:
+                        if not remote.upload(extra_remote, f.read(), f"Add {extra_remote}"):
+                            print(f"  ⚠️ {extra_remote} 上传失败")
             else:
                 fail_count += 1
                 print("❌")
-                folder = remote_path.split("/")[-2]
-                if folder in folder_counts:
-                    folder_counts[folder] -= 1
+                registry.pop(file_hash)
+                url_index.discard_sha(file_hash)
         except Exception as e:
             fail_count += 1
             print(f"❌ {e}")
@@ -164,81 +532,295 @@ def batch_upload_to_github(upload_queue: list, hash_registry: dict,
     print(f"\n📊 上传完成: 成功 {success_count}, 失败 {fail_count}")
     
     # 上传元数据
+    counted = False
     if success_count > 0:
         print("\n📝 更新元数据...")
         
-        if save_remote_json(f"{IMAGES_DIR}/hash_registry.json", hash_registry,
-                           f"Update hash_registry (+{success_count})"):
-            print("  ✅ hash_registry.json")
+        for table in (registry, url_index):
+            if save_table_contents(remote, table):
+                print(f"  ✅ {REGISTRY_DIR}/{table.MANIFEST}")
         
-        if save_remote_json(f"{IMAGES_DIR}/count.json", folder_counts, "Update count"):
+        # 雪碧图全部写入后再更新索引
+        sheets, indexes = build_sprites(remote, uploaded)
+        if all(remote.save_file(path, data, f"Update {path}") for path, data in sheets.items()):
+            for path, index in indexes.items():
+                if remote.save_json(path, index, f"Update {path}"):
+                    print(f"  ✅ {path}")
+        
+        # 只按本次上传的路径增量更新，失败的编号记为缺失
+        if remote.save_json(f"{IMAGES_DIR}/count.json",
+                            apply_uploaded(count_data, uploaded, FOLDERS), "Update count"):
             print("  ✅ count.json")
+            counted = True
+        else:
+            print("  ⚠️ count.json 未更新")
         
         # 更新进度
-        progress = get_remote_json("progress.json", {"last_id": START_ID - 1})
-        progress["last_id"] = last_id
-        if save_remote_json("progress.json", progress, f"Update progress to {last_id}"):
+        if save_progress(remote, sources, last_ids):
             print("  ✅ progress.json")
     
-    return fail_count == 0
+    # count.json 没写入时保留日志，下次运行重新计数
+    return fail_count == 0 and counted
 
 
-# ============ 工具函数 ============
+# ============ Git Data API（单次提交批量上传） ============
+
+def table_tree_entries(remote: RemoteStore, table, written: dict) -> list | None:
+    """
+    分段表本次需要写入的树条目（段文件 + manifest），失败返回 None
+    written 中记录写入的 {路径: 内容或 None(删除)}，提交成功后更新元数据缓存
+    """
+    files, manifest = table.plan_write(REGISTRY_COMPACT_EVERY)
+    if not files:
+        return []
+    entries = []
+    for name, data in files.items():
+        path = f"{REGISTRY_DIR}/{name}"
+        written[path] = data
+        if data is None:
+            entries.append({"path": path, "mode": "100644", "type": "blob", "sha": None})
+            continue
+        blob_sha = remote.create_blob(data)
+        if not blob_sha:
+            print(f"❌ 注册表段上传失败 {path}")
+            return None
+        entries.append({"path": path, "mode": "100644", "type": "blob", "sha": blob_sha})
+    entries.extend(json_tree_entries(remote, {f"{REGISTRY_DIR}/{table.MANIFEST}": manifest}, written))
+    return entries
 
-def build_url(page_id: int) -> str:
-    return f"https://img.hyun.cc/index.php/archives/{page_id}.html"
 
+def sprite_tree_entries(remote: RemoteStore, uploaded: list, written: dict) -> list:
+    """雪碧图和索引的树条目；有雪碧图上传失败时本次不更新雪碧图"""
+    sheets, indexes = build_sprites(remote, uploaded)
+    entries = []
+    for path, data in sheets.items():
+        blob_sha = remote.create_blob(data)
+        if not blob_sha:
+            print(f"⚠️ 雪碧图上传失败 {path}，本次不更新雪碧图")
+            return []
+        entries.append({"path": path, "mode": "100644", "type": "blob", "sha": blob_sha})
+    return entries + json_tree_entries(remote, indexes, written)
+
+
+def json_tree_entries(remote: RemoteStore, files: dict, written: dict) -> list:
+    """{路径: 数据} 转为内联内容的树条目，跳过与远程相同的文件"""
+    entries = []
+    for path, data in files.items():
+        content = json.dumps(data, ensure_ascii=False, indent=2)
+        if remote.cache.unchanged(path, content.encode("utf-8")):
+            continue
+        written[path] = content.encode("utf-8")
+        entries.append({"path": path, "mode": "100644", "type": "blob", "content": content})
+    return entries
 
-def get_file_hash(filepath: str) -> str:
-    sha256 = hashlib.sha256()
-    with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            sha256.update(chunk)
-    return sha256.hexdigest()
+
+def bulk_upload_to_github(remote: RemoteStore, upload_queue: list, registry: HashRegistry, url_index: UrlIndex,
+                          count_data: dict, sources: list, last_ids: dict) -> bool:
+    """
+    并发创建 blob，然后把所有图片和元数据放进同一个提交
+    元数据与图片一起原子写入；提交成功返回 True（个别 blob 失败只跳过该图片）
+    """
+    if not upload_queue:
+        print("📭 没有需要上传的文件")
+        return True
+    
+    print(f"\n{'='*50}")
+    print(f"📤 批量上传 {len(upload_queue)} 个文件（单次提交）")
+    print(f"{'='*50}\n")
+    
+    def create_blobs(item: dict) -> list | None:
+        """主图和其他输出各建一个 blob；主图失败返回 None，其他输出失败只跳过该文件"""
+        item_entries = []
+        for local_path, remote_path in item_files(item):
+            try:
+                with open(local_path, "rb") as f:
+                    blob_sha = remote.create_blob(f.read())
+            except Exception as e:
+                print(f"❌ 读取失败 {local_path}: {e}")
+                blob_sha = None
+            if not blob_sha:
+                if not item_entries:
+                    return None
+                print(f"  ⚠️ {remote_path} 上传失败，跳过")
+                continue
+            item_entries.append({"path": remote_path, "mode": "100644",
+                                 "type": "blob", "sha": blob_sha})
+        return item_entries
+    
+    entries = []
+    uploaded = []
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, BLOB_WORKERS)) as pool:
+        for idx, (item, item_entries) in enumerate(
+                zip(upload_queue, pool.map(create_blobs, upload_queue)), 1):
+            remote_path = item["remote_path"]
+            if item_entries:
+                entries.extend(item_entries)
+                uploaded.append(remote_path)
+                print(f"[{idx}/{len(upload_queue)}] {remote_path} ✅")
+            else:
+                failed.append(item)
+                print(f"[{idx}/{len(upload_queue)}] {remote_path} ❌")
+    
+    print(f"\n📊 Blob 创建完成: 成功 {len(uploaded)}, 失败 {len(failed)}")
+    
+    if not uploaded:
+        # 全部失败：队列和注册表保持原样，由逐个上传重试
+        return False
+    
+    # 未上传的图片不能留在注册表里；同时移出队列，提交失败改为逐个上传时不会再上传它们
+    # （否则图片进了仓库，注册表里却没有，下次运行会重复下载）
+    for item in failed:
+        registry.pop(item["hash"])
+        url_index.discard_sha(item["hash"])
+    if failed:
+        upload_queue[:] = [item for item in upload_queue if item not in failed]
+    
+    image_count = len(uploaded)
+    counts = apply_uploaded(count_data, uploaded, FOLDERS)
+    
+    # 注册表只写入增量段（或合并后的基础段）
+    written = {}
+    for table in (registry, url_index):
+        table_entries = table_tree_entries(remote, table, written)
+        if table_entries is None:
+            return False
+        entries.extend(table_entries)
+    entries.extend(sprite_tree_entries(remote, uploaded, written))
+    
+    progress = write_progress(remote.load_json("progress.json", {}), last_ids, sources)
+    
+    entries.extend(json_tree_entries(remote, {
+        f"{IMAGES_DIR}/count.json": counts,
+        "progress.json": progress,
+    }, written))
+    
+    commit_sha = remote.commit_tree(
+        entries, f"Add {image_count} images, progress to {describe_progress(last_ids)}"
+    )
+    if not commit_sha:
+        print("❌ 提交失败")
+        return False
+    
+    for path, data in written.items():
+        if data is None:
+            remote.cache.forget(path, missing=True)
+        else:
+            remote.cache.written(path, data)
+    
+    print(f"✅ 已提交 {commit_sha[:7]}: {image_count} 张图片 + 元数据")
+    return True
+
+
+# ============ 工具函数 ============
+
+def set_step_output(name: str, value: str):
+    """写入 GitHub Actions 步骤输出，本地运行时忽略"""
+    path = os.environ.get("GITHUB_OUTPUT")
+    if path:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(f"{name}={value}\n")
 
 
 def ensure_dir(path: str):
     Path(path).mkdir(parents=True, exist_ok=True)
 
 
+def page_exists(url: str) -> bool:
+    """HEAD 请求判断页面是否存在，请求失败抛出异常"""
+    with host_limiter.slot(url):
+        resp = scraper.head(url, timeout=30, allow_redirects=True)
+        if resp.status_code == 405:
+            resp = scraper.get(url, timeout=30)
+    if resp.status_code == 404:
+        return False
+    resp.raise_for_status()
+    return True
+
+
+def discover_latest_id(source, last_id: int) -> int | None:
+    """
+    查找来源的最新页面 ID，优先读 RSS，失败则指数 + 二分探测
+    返回 None 时退回连续404判断
+    """
+    if source.feed_url:
+        try:
+            with host_limiter.slot(source.feed_url):
+                resp = scraper.get(source.feed_url, timeout=30)
+            if resp.status_code == 200:
+                resp.encoding = 'utf-8'
+                latest = source.latest_from_feed(resp.text)
+                if latest:
+                    print(f"📰 [{source.name}] RSS 最新页面: {latest}")
+                    return max(latest, last_id)
+            print(f"⚠️ [{source.name}] RSS 不可用 ({resp.status_code})，改为探测")
+        except Exception as e:
+            print(f"⚠️ [{source.name}] 读取 RSS 失败: {e}，改为探测")
+
+    prober = PageProber(lambda page_id: page_exists(source.page_url(page_id)), MAX_404_COUNT)
+    try:
+        latest = prober.latest(last_id)
+    except Exception as e:
+        print(f"⚠️ [{source.name}] 探测最新页面失败: {e}")
+        return None
+    print(f"🔭 [{source.name}] 探测到最新页面: {latest}（{prober.requests} 次请求）")
+    return latest
+
+
 # ============ 图片处理 ============
 
-def scrape_images(url: str) -> tuple:
+def scrape_images(url: str, http: HttpEngine, on_image=None, iter_links=iter_fancybox_links) -> tuple:
     """
-    爬取页面中的图片链接
+    爬取页面中的图片链接，边接收边解析（见 link_extract），正文结束后不再读取
+    http: 图片下载用的连接池，页面验证得到的 Cookie 同步给它
+    on_image(img): 每发现一张图片立即回调，下载不必等整个页面解析完
+    iter_links(chunks): 来源的链接提取方法（Source.iter_links）
     返回: (images_list, status)
     status: "ok" | "video" | "404" | "error"
     """
     print(f"🌐 爬取: {url}")
     
+    images = []
+    
+    def counted(chunks):
+        for chunk in chunks:
+            metrics.count("page_bytes", len(chunk))
+            yield chunk
+    
     try:
-        resp = scraper.get(url, timeout=30)
-        
-        # 检查404
-        if resp.status_code == 404:
-            return [], "404"
-        
-        resp.raise_for_status()
-        resp.encoding = 'utf-8'
+        with host_limiter.slot(url):
+            with metrics.timer("page_fetch"):
+                resp = scraper.get(url, timeout=30, stream=True)
+            try:
+                # 检查404
+                if resp.status_code == 404:
+                    return [], "404"
+                
+                resp.raise_for_status()
+                http.update_cookies(scraper.cookies)
+                
+                # 包含正文传输时间
+                with metrics.timer("page_parse"):
+                    for img in iter_links(counted(resp.iter_content(16384))):
+                        images.append(img)
+                        if on_image:
+                            on_image(img)
+                        if len(images) >= BATCH_SIZE:
+                            break
+            finally:
+                resp.close()
     except requests.exceptions.HTTPError as e:
         if "404" in str(e):
             return [], "404"
         print(f"❌ 请求失败: {e}")
-        return [], "error"
+        return images, "error"
     except Exception as e:
         print(f"❌ 请求失败: {e}")
-        return [], "error"
-    
-    soup = BeautifulSoup(resp.text, "lxml")
-    images = []
-    
-    for idx, link in enumerate(soup.find_all("a", {"data-fancybox": True}), 1):
-        href = link.get("href", "")
-        if href.startswith("http"):
-            images.append({"url": href, "index": idx})
+        return images, "error"
     
     if not images:
         # 没有图片，可能是视频页面
+        metrics.count("pages_video")
         print(f"🎬 无图片（视频页面），跳过")
         return [], "video"
     
@@ -246,133 +828,585 @@ def scrape_images(url: str) -> tuple:
     return images, "ok"
 
 
-def download_image(url: str, save_path: str) -> bool:
-    try:
-        resp = scraper.get(url, timeout=60, stream=True)
-        resp.raise_for_status()
-        with open(save_path, "wb") as f:
-            for chunk in resp.iter_content(8192):
-                f.write(chunk)
-        return True
-    except Exception as e:
-        print(f"❌ 下载失败: {e}")
-        return False
-
-
-def convert_to_webp(input_path: str, output_path: str) -> bool:
-    try:
-        img = cv2.imread(input_path)
-        if img is None:
-            return False
-        cv2.imwrite(output_path, img, [cv2.IMWRITE_WEBP_QUALITY, 85])
-        return True
-    except:
-        return False
+def download_image(url: str, http: HttpEngine) -> tuple | None:
+    """
+    下载到内存，边下载边计算 SHA-256，同时按 download_policy 检查，不合格立即中止
+    优先走共享连接池，遇到 Cloudflare 拦截（403/503）时退回 cloudscraper
+    返回: (data, sha256_hex)，失败或被拒绝返回 None
+    """
+    with metrics.timer("download"):
+        return _download_image(url, http)
 
 
-def analyze_image(path: str) -> dict | None:
-    """分析图片，返回分类文件夹"""
+def _download_image(url: str, http: HttpEngine) -> tuple | None:
     try:
-        img = cv2.imread(path)
-        if img is None:
-            return None
-        
-        h, w = img.shape[:2]
-        if w < 10 or h < 10:
-            return None
+        guard = download_policy.guard()
+        sha256 = hashlib.sha256()
+        buf = bytearray()
+        hash_time = 0.0
         
-        orientation = "h" if w >= h else "v"
-        
-        resized = cv2.resize(img, (100, 100))
-        lab = cv2.cvtColor(resized, cv2.COLOR_BGR2LAB)
-        avg_l = lab[:, :, 0].mean()
-        brightness = "d" if avg_l < BRIGHTNESS_THRESHOLD else "l"
+        def on_chunk(chunk: bytes) -> bool:
+            nonlocal hash_time
+            start = time.perf_counter()
+            sha256.update(chunk)
+            hash_time += time.perf_counter() - start
+            buf.extend(chunk)
+            return guard.feed(chunk)
         
-        folder = orientation + brightness
-        print(f"  📐 {w}x{h} L={avg_l:.1f} → {folder}")
+        resp = http.stream(url, on_chunk, on_response=lambda r: guard.check_headers(r.headers),
+                           timeout=60)
+        if resp.status_code in (403, 503):
+            guard = download_policy.guard()
+            sha256, buf = hashlib.sha256(), bytearray()
+            with host_limiter.slot(url):
+                resp = scraper.get(url, timeout=60, stream=True)
+                try:
+                    resp.raise_for_status()
+                    chunk_size = guard.check_headers(resp.headers)
+                    if chunk_size:
+                        for chunk in resp.iter_content(chunk_size):
+                            if not on_chunk(chunk):
+                                break
+                finally:
+                    resp.close()
+        else:
+            resp.raise_for_status()
         
-        return {"folder": folder}
+        if guard.reason is None:
+            guard.finish()
+        if guard.reason:
+            print(f"  🚫 放弃下载（{guard.reason}）: {url}")
+            metrics.count("download_rejected")
+            return None
+        metrics.observe("hash", hash_time)
+        metrics.count("download_bytes", len(buf))
+        return bytes(buf), sha256.hexdigest()
     except Exception as e:
-        print(f"❌ 分析失败: {e}")
+        print(f"❌ 下载失败: {e}")
         return None
 
 
-# ============ 本地处理 ============
+# ============ 并发流水线 ============
 
-def process_page_local(page_id: int, hash_registry: dict, folder_counts: dict, 
-                       upload_queue: list) -> str:
+class PageTracker:
     """
-    本地处理单个页面
-    返回: "success" | "video" | "404" | "error"
+    页面状态跟踪（页面可乱序完成）
+    - 抓取结果按 ID 顺序结算；已知最新页面时404只是空缺，否则应用连续404停止规则
+    - 页面的全部图片处理完成后，才按 ID 顺序推进 last_success_id
     """
-    url = build_url(page_id)
-    
-    print(f"\n{'='*50}")
-    print(f"📂 页面 ID: {page_id}")
-    print(f"{'='*50}")
-    
-    ensure_dir(TEMP_DIR)
-    
-    # 爬取图片
-    images, status = scrape_images(url)
-    
-    if status != "ok":
-        return status
-    
-    new_count = 0
+
+    def __init__(self, start_id: int, on_done=None, latest_id: int = None, label: str = ""):
+        self.cond = threading.Condition()
+        self.label = f"[{label}] " if label else ""  # 多来源时日志前缀
+        self.on_done = on_done        # on_done(page_id, status)：页面全部处理完成
+        self.fetch_cursor = start_id  # 下一个待结算抓取结果的ID
+        self.done_cursor = start_id   # 下一个待结算完成状态的ID
+        self.latest_id = latest_id    # 预先查到的最新页面ID
+        # 停止位置（不含），之后的页面一律忽略
+        self.end_id = None if latest_id is None else max(latest_id + 1, start_id)
+        self.last_success_id = start_id - 1
+        self.consecutive_404 = 0
+        self.statuses = {}
+        self.pending = {}
+        self.failed = set()
+
+    def accepts(self, page_id: int) -> bool:
+        with self.cond:
+            return self._open(page_id)
+
+    def _open(self, page_id: int) -> bool:
+        return self.end_id is None or page_id < self.end_id
+
+    def wait_for_slot(self, page_id: int, window: int) -> bool:
+        """等待抓取窗口空出位置，已停止（或超出范围）则返回 False"""
+        with self.cond:
+            while self._open(page_id) and page_id >= self.fetch_cursor + window:
+                self.cond.wait()
+            return self._open(page_id)
+
+    def add_image(self, page_id: int):
+        """页面解析过程中每发现一张图片调用一次（在 fetched 之前）"""
+        with self.cond:
+            self.pending[page_id] = self.pending.get(page_id, 0) + 1
+
+    def fetched(self, page_id: int, status: str, image_count: int = 0):
+        with self.cond:
+            self.statuses[page_id] = "error" if page_id in self.failed else status
+            self.pending[page_id] = self.pending.get(page_id, 0) + image_count
+            if self.pending[page_id] == 0 and self.on_done:
+                self.on_done(page_id, status)
+            self._advance_fetch()
+            self._advance_done()
+            self.cond.notify_all()
+
+    def image_done(self, page_id: int):
+        with self.cond:
+            self.pending[page_id] -= 1
+            # 页面还在解析时不结算
+            if self.pending[page_id] == 0 and page_id in self.statuses and self.on_done:
+                self.on_done(page_id, self.statuses[page_id])
+            self._advance_done()
+            self.cond.notify_all()
+
+    def image_failed(self, page_id: int):
+        """图片没能处理（如编码失败）：页面按出错处理，进度停在它之前，下次运行重新抓取"""
+        with self.cond:
+            self.failed.add(page_id)
+            if page_id in self.statuses:
+                self.statuses[page_id] = "error"
+            if self.end_id is None or page_id < self.end_id:
+                print(f"\n❌ {self.label}页面 {page_id} 有图片处理失败，停止")
+                self.end_id = page_id
+        self.image_done(page_id)
+
+    def _advance_fetch(self):
+        while self._open(self.fetch_cursor) and self.fetch_cursor in self.statuses:
+            page_id = self.fetch_cursor
+            status = self.statuses[page_id]
+            if status == "404" and self.latest_id is not None:
+                print(f"⚠️ {self.label}{page_id} 404（空缺，继续）")
+            elif status == "404":
+                self.consecutive_404 += 1
+                print(f"⚠️ {self.label}{page_id} 404 (连续: {self.consecutive_404}/{MAX_404_COUNT})")
+                if self.consecutive_404 >= MAX_404_COUNT:
+                    print(f"\n⏹️ {self.label}连续 {MAX_404_COUNT} 个404，到达末尾")
+                    self.end_id = page_id + 1
+            elif status == "error":
+                print(f"\n❌ {self.label}页面 {page_id} 处理出错，停止")
+                self.end_id = page_id
+            else:
+                self.consecutive_404 = 0
+            self.fetch_cursor += 1
+
+    def _advance_done(self):
+        while self.done_cursor < self.fetch_cursor:
+            page_id = self.done_cursor
+            if self.end_id is not None and page_id >= self.end_id:
+                break
+            if self.pending[page_id] > 0:
+                break
+            if self.statuses[page_id] in ("ok", "video"):
+                # 视频页面也算处理过了
+                self.last_success_id = page_id
+            self.done_cursor += 1
+
+
+class CrawlState:
+    """各线程共享的去重表、计数和上传队列"""
+
+    def __init__(self, hash_registry: HashRegistry, url_index: UrlIndex,
+                 folder_counts: dict, upload_queue: list, journal: RunJournal = None):
+        self.lock = threading.Lock()
+        self.journal = journal
+        self.hash_registry = hash_registry
+        self.url_index = url_index
+        self.urls_skipped = 0
+        self.bytes_saved = 0
+        self.folder_counts = folder_counts
+        self.upload_queue = upload_queue
+        self.claimed = set()
+        self.suppressed = []
+
+        self.phash_tree = BKTree()
+        for file_hash, phash in hash_registry.phashes():
+            self.phash_tree.add(phash, file_hash)
+
+    def claim(self, file_hash: str) -> bool:
+        """占用哈希，已存在或正在处理则返回 False"""
+        with self.lock:
+            if file_hash in self.hash_registry or file_hash in self.claimed:
+                return False
+            self.claimed.add(file_hash)
+            return True
+
+    def known_url(self, url: str) -> bool:
+        """链接已入库则计入节省的流量并返回 True"""
+        with self.lock:
+            known = self.url_index.lookup(url)
+            if known is None:
+                return False
+            self.urls_skipped += 1
+            self.bytes_saved += known[1]
+            return True
+
+    def remember_url(self, url: str, file_hash: str, size: int):
+        with self.lock:
+            self.url_index.add(url, file_hash, size)
+            if self.journal:
+                self.journal.append({"type": "url", "url": url, "sha": file_hash, "size": size})
+
+    def release(self, file_hash: str):
+        with self.lock:
+            self.claimed.discard(file_hash)
+
+    def find_near_duplicate(self, file_hash: str, phash: int) -> tuple | None:
+        """
+        查找阈值内的近似重复，返回 (sha, 距离)
+        没有则把当前图片登记到索引，返回 None
+        """
+        with self.lock:
+            for dist, _, other in self.phash_tree.search(phash, PHASH_THRESHOLD):
+                # 处理失败而释放的图片不算
+                if other in self.hash_registry or other in self.claimed:
+                    return other, dist
+            self.phash_tree.add(phash, file_hash)
+            return None
+
+    def suppress(self, source: str, page_id: int, url: str, file_hash: str, other: str, dist: int):
+        with self.lock:
+            self.suppressed.append({
+                "source": source,
+                "page_id": page_id,
+                "url": url,
+                "sha256": file_hash,
+                "duplicate_of": self.hash_registry.get(other, other),
+                "distance": dist
+            })
+
+    def commit(self, folder: str, variants: dict, file_hash: str, phash: int) -> str:
+        """
+        分配编号并写入本地目录，返回主图的本地路径
+        variants: {"webp", "thumb", "avif"}，缩略图 / AVIF 为 None 时不写
+        """
+        with self.lock:
+            self.folder_counts[folder] += 1
+            new_num = self.folder_counts[folder]
+            remote_path = f"{IMAGES_DIR}/{folder}/{new_num}.webp"
+            paths = {"webp": remote_path, **rendition_paths(remote_path)}
+            for kind, data in variants.items():
+                if data is None:
+                    continue
+                path = os.path.join(LOCAL_DIR, paths[kind])
+                ensure_dir(os.path.dirname(path))
+                with open(path, "wb") as f:
+                    f.write(data)
+            local_path = os.path.join(LOCAL_DIR, remote_path)
+
+            self.upload_queue.append({
+                "local_path": local_path,
+                "remote_path": remote_path,
+                "hash": file_hash
+            })
+            self.hash_registry.add(file_hash, f"{folder}/{new_num}.webp", phash)
+            if self.journal:
+                self.journal.append({
+                    "type": "image", "sha": file_hash, "path": f"{folder}/{new_num}.webp",
+                    "phash": phash, "local_path": local_path
+                })
+            self.claimed.discard(file_hash)
+            return local_path
+
+
+class CrawlPipeline:
+    """
+    页面抓取 → 图片下载 → 分析/编码，三个阶段通过队列连接
+    多个来源共用同一套队列和线程；每个来源有自己的 PageTracker（ID 顺序、停止条件和进度）
+    """
+
+    def __init__(self, sources: list, start_ids: dict, state: CrawlState, http: HttpEngine,
+                 done_pages: dict = None, encode_pool: ProcessPoolExecutor = None, latest_ids: dict = None):
+        self.sources = sources
+        self.trackers = {}
+        for source in sources:
+            self.trackers[source.name] = PageTracker(
+                start_ids[source.name],
+                on_done=lambda page_id, status, name=source.name: self._page_done(name, page_id, status),
+                latest_id=(latest_ids or {}).get(source.name),
+                label=source.name if len(sources) > 1 else ""
+            )
+        self.state = state
+        self.http = http
+        self.done_pages = done_pages or {}
+        self.encode_pool = encode_pool
+        self.pool_lock = threading.Lock()
+        self.start_ids = start_ids
+        self.page_q = queue.Queue()
+        self.download_q = queue.Queue(maxsize=DOWNLOAD_WORKERS * 4)
+        self.encode_q = queue.Queue(maxsize=ENCODE_WORKERS * 2)
+
+    def run(self) -> dict:
+        """运行到所有来源的末尾，返回 {来源: 最后一个按序完成的页面ID}"""
+        stages = [
+            (self.page_q, self._page_worker, PAGE_WORKERS),
+            (self.download_q, self._download_worker, DOWNLOAD_WORKERS),
+            (self.encode_q, self._encode_worker, ENCODE_WORKERS),
+        ]
+        pools = []
+        for q, target, count in stages:
+            threads = [threading.Thread(target=target, daemon=True) for _ in range(max(1, count))]
+            for t in threads:
+                t.start()
+            pools.append((q, threads))
+
+        # 每个来源一个投放线程，各自按抓取窗口推进
+        feeders = [threading.Thread(target=self._feed, args=(source,), daemon=True)
+                   for source in self.sources]
+        for t in feeders:
+            t.start()
+        for t in feeders:
+            t.join()
+
+        # 逐级关闭，队列中剩余的任务会先被处理完
+        for q, threads in pools:
+            for _ in threads:
+                q.put(None)
+            for t in threads:
+                t.join()
+
+        return {name: tracker.last_success_id for name, tracker in self.trackers.items()}
+
+    def _feed(self, source):
+        tracker = self.trackers[source.name]
+        next_id = self.start_ids[source.name]
+        while tracker.wait_for_slot(next_id, max(1, PAGE_WORKERS) * 2):
+            self.page_q.put((source, next_id))
+            next_id += 1
+
+    def _tag(self, source, page_id: int) -> str:
+        return f"{source.name}:{page_id}" if len(self.sources) > 1 else str(page_id)
+
+    def _page_done(self, name: str, page_id: int, status: str):
+        # 出错和 404 的页面不记录，恢复后重新抓取
+        if status not in ("ok", "video"):
+            return
+        if self.state.journal and page_id not in self.done_pages.get(name, {}):
+            self.state.journal.append({"type": "page", "source": name,
+                                       "page_id": page_id, "status": status})
+
+    def _page_worker(self):
+        while True:
+            item = self.page_q.get()
+            if item is None:
+                break
+            source, page_id = item
+            tracker = self.trackers[source.name]
+            if not tracker.accepts(page_id):
+                continue
+
+            # 上次运行已完成的页面直接复用结果
+            done = self.done_pages.get(source.name, {})
+            if page_id in done:
+                tracker.fetched(page_id, done[page_id], 0)
+                continue
+
+            print(f"📂 页面 ID: {self._tag(source, page_id)}")
+            # 解析过程中不能阻塞（还占着主机名额），下载队列满时先暂存
+            backlog = []
+
+            def dispatch(img: dict):
+                tracker.add_image(page_id)
+                try:
+                    self.download_q.put_nowait((source, page_id, img))
+                except queue.Full:
+                    backlog.append((source, page_id, img))
+
+            try:
+                _, status = scrape_images(source.page_url(page_id), self.http, dispatch, source.iter_links)
+            except Exception as e:
+                print(f"❌ 页面 {self._tag(source, page_id)} 异常: {e}")
+                status = "error"
+
+            tracker.fetched(page_id, status)
+            for item in backlog:
+                self.download_q.put(item)
+
+    def _download_worker(self):
+        while True:
+            item = self.download_q.get()
+            if item is None:
+                break
+            source, page_id, img = item
+            tracker = self.trackers[source.name]
+            tag = self._tag(source, page_id)
+            handed_off = False
+            try:
+                if not tracker.accepts(page_id):
+                    continue
+
+                idx = img["index"]
+                url = img["url"]
+
+                # 已入库的链接无需下载
+                if self.state.known_url(url):
+                    metrics.count("urls_skipped")
+                    print(f"  ⏭️ [{tag}] [{idx}] 已知链接，跳过下载")
+                    continue
+
+                print(f"📥 [{tag}] [{idx}] 下载中...")
+
+                downloaded = download_image(url, self.http)
+                if not downloaded:
+                    continue
+                data, file_hash = downloaded
+
+                # 检查重复
+                if not self.state.claim(file_hash):
+                    self.state.remember_url(url, file_hash, len(data))
+                    metrics.count("duplicates_exact")
+                    print(f"  ⏭️ [{tag}] [{idx}] 跳过重复")
+                    continue
+
+                self.encode_q.put((source, page_id, img["url"], data, file_hash))
+                handed_off = True
+            except Exception as e:
+                print(f"❌ [{tag}] 下载处理失败: {e}")
+            finally:
+                if not handed_off:
+                    tracker.image_done(page_id)
+
+    def _next_encode_batch(self) -> tuple:
+        """阻塞取一项，再顺带取走队列中已就绪的若干项；返回 (items, 是否收到结束信号)"""
+        item = self.encode_q.get()
+        if item is None:
+            return [], True
+        items = [item]
+        while len(items) < max(1, CLASSIFY_BATCH):
+            try:
+                item = self.encode_q.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return items, True
+            items.append(item)
+        return items, False
+
+    def _encode_batch(self, blobs: list) -> list:
+        """
+        优先在进程池中编码；进程池损坏（子进程被 OOM 杀掉、崩溃）后不再重建，
+        之后的批次都在当前线程中编码（重建需要在已有多个线程时 fork）
+        """
+        pool = self.encode_pool
+        if pool:
+            try:
+                return pool.submit(process_batch, blobs).result()
+            except BrokenProcessPool as e:
+                with self.pool_lock:
+                    if self.encode_pool is pool:
+                        print(f"⚠️ 编码进程池已损坏，改为线程编码: {e}")
+                        self.encode_pool = None
+                        pool.shutdown(wait=False)
+        return process_batch(blobs)
+
+    def _encode_worker(self):
+        stop = False
+        while not stop:
+            items, stop = self._next_encode_batch()
+            if not items:
+                break
+
+            # 解码、分类、编码在一次调用中完成，只解码一次
+            accepted = [k for k, item in enumerate(items)
+                        if self.trackers[item[0].name].accepts(item[1])]
+            results = [None] * len(items)
+            failed = False
+            try:
+                blobs = [items[k][3] for k in accepted]
+                with metrics.timer("encode_batch"):
+                    batch = self._encode_batch(blobs)
+                for k, info in zip(accepted, batch):
+                    results[k] = info
+                    # 子进程中测得的各步骤耗时
+                    for step, seconds in (info or {}).get("timings", {}).items():
+                        metrics.observe(step, seconds)
+            except Exception as e:
+                print(f"❌ 批量编码失败: {e}")
+                failed = True
+
+            for k, (source, page_id, url, data, file_hash) in enumerate(items):
+                if failed and k in accepted:
+                    # 没有编码结果，不能当作已处理
+                    self.state.release(file_hash)
+                    self.trackers[source.name].image_failed(page_id)
+                else:
+                    self._commit_one(source, page_id, url, data, file_hash, results[k])
+
+    def _commit_one(self, source, page_id: int, url: str, data: bytes, file_hash: str,
+                    info: dict | None):
+        tracker = self.trackers[source.name]
+        tag = self._tag(source, page_id)
+        committed = False
+        try:
+            if not info or not info["webp"] or not tracker.accepts(page_id):
+                return
+
+            print(f"  📐 [{tag}] {info['width']}x{info['height']} "
+                  f"L={info['luminance']:.1f} → {info['folder']}")
+
+            near = self.state.find_near_duplicate(file_hash, info["phash"])
+            if near:
+                other, dist = near
+                self.state.suppress(source.name, page_id, url, file_hash, other, dist)
+                self.state.remember_url(url, file_hash, len(data))
+                metrics.count("duplicates_near")
+                print(f"  ⏭️ [{tag}] 跳过近似重复 (距离 {dist})")
+                return
+
+            variants = {kind: info.get(kind) for kind in ("webp", "thumb", "avif")}
+            local_path = self.state.commit(info["folder"], variants, file_hash, info["phash"])
+            self.state.remember_url(url, file_hash, len(data))
+            committed = True
+            metrics.count("images_committed")
+            print(f"  💾 {local_path}")
+        except Exception as e:
+            print(f"❌ [{tag}] 保存失败: {e}")
+        finally:
+            if not committed:
+                self.state.release(file_hash)
+            tracker.image_done(page_id)
+
+
+def resume_from_journal(events: list, start_ids: dict, registry: HashRegistry,
+                        url_index: UrlIndex, folder_counts: dict, upload_queue: list) -> dict | None:
+    """
+    从上次中断的运行恢复本地状态
+    只有当日志基于同一个远程进度（各来源的起始 ID 相同）时才能恢复，
+    返回已完成的页面 {来源: {id: status}}
+    """
+    if not events or events[0].get("type") != "run" or events[0].get("start_ids") != start_ids:
+        return None
     
-    for img in images[:BATCH_SIZE]:
-        idx = img["index"]
-        temp_path = os.path.join(TEMP_DIR, f"temp_{page_id}_{idx}")
-        
-        print(f"📥 [{idx}/{len(images)}] 下载中...")
-        
-        if not download_image(img["url"], temp_path):
-            continue
-        
-        # 检查重复
-        file_hash = get_file_hash(temp_path)
-        if file_hash in hash_registry:
-            print(f"  ⏭️ 跳过重复")
-            os.remove(temp_path)
-            continue
-        
-        # 分析图片
-        info = analyze_image(temp_path)
-        if not info:
-            os.remove(temp_path)
-            continue
-        
-        # 确定目标路径
-        target_folder = info["folder"]
-        folder_counts[target_folder] += 1
-        new_num = folder_counts[target_folder]
-        
-        # 本地保存
-        local_folder = os.path.join(LOCAL_DIR, IMAGES_DIR, target_folder)
-        ensure_dir(local_folder)
-        local_path = os.path.join(local_folder, f"{new_num}.webp")
-        
-        if not convert_to_webp(temp_path, local_path):
-            os.remove(temp_path)
-            folder_counts[target_folder] -= 1
-            continue
-        os.remove(temp_path)
-        
-        # 添加到上传队列
-        remote_path = f"{IMAGES_DIR}/{target_folder}/{new_num}.webp"
-        upload_queue.append({
-            "local_path": local_path,
-            "remote_path": remote_path,
-            "hash": file_hash
-        })
-        
-        hash_registry[file_hash] = f"{target_folder}/{new_num}.webp"
-        new_count += 1
-        print(f"  💾 {local_path}")
+    done_pages = {name: {} for name in start_ids}
+    resumed = 0
+    for event in events[1:]:
+        kind = event.get("type")
+        if kind == "page":
+            # 旧日志里可能有出错 / 404 的页面，这些页面要重新抓取
+            if event["status"] in ("ok", "video"):
+                done_pages[event["source"]][event["page_id"]] = event["status"]
+        elif kind == "url":
+            url_index.add(event["url"], event["sha"], event["size"])
+        elif kind == "image":
+            folder, name = event["path"].split("/")
+            num = int(name.split(".")[0])
+            # 编号已被占用，即使文件丢失也不能复用
+            folder_counts[folder] = max(folder_counts.get(folder, 0), num)
+            if not os.path.exists(event["local_path"]):
+                continue
+            registry.add(event["sha"], event["path"], event["phash"])
+            upload_queue.append({
+                "local_path": event["local_path"],
+                "remote_path": f"{IMAGES_DIR}/{event['path']}",
+                "hash": event["sha"]
+            })
+            resumed += 1
     
-    print(f"✅ 页面 {page_id} 完成，新增 {new_count} 张")
-    return "success"
+    pages = sum(len(done) for done in done_pages.values())
+    print(f"♻️ 从日志恢复: {pages} 个页面, {resumed} 张图片")
+    return done_pages
+
+
+def write_near_duplicate_report(suppressed: list):
+    """输出被跳过的近似重复图片报告"""
+    if not suppressed:
+        return
+    print(f"\n🔁 近似重复跳过 {len(suppressed)} 张:")
+    for item in suppressed[:20]:
+        print(f"   [{item['source']}:{item['page_id']}] {item['url']} ≈ {item['duplicate_of']} "
+              f"(距离 {item['distance']})")
+    if len(suppressed) > 20:
+        print(f"   ... 其余见 {NEAR_DUP_REPORT}")
+    with open(NEAR_DUP_REPORT, "w", encoding="utf-8") as f:
+        json.dump(suppressed, f, ensure_ascii=False, indent=2)
 
 
 # ============ 主函数 ============
@@ -387,88 +1421,129 @@ def main():
         print("❌ 缺少 TARGET_REPO")
         return
     
+    try:
+        sources = load_sources(SOURCES, TypechoSource(DEFAULT_SOURCE, SITE_URL, START_ID))
+    except (ValueError, TypeError) as e:
+        print(f"❌ SOURCES 配置错误: {e}")
+        return
+    
     print(f"📦 目标仓库: {TARGET_REPO}")
-    print(f"📁 存储目录: /{IMAGES_DIR}/\n")
+    print(f"📁 存储目录: /{IMAGES_DIR}/")
+    print(f"🌐 来源: {', '.join(f'{s.name} ({s.url})' for s in sources)}\n")
     
+    # 编码进程池必须在 HttpEngine 启动事件循环线程之前创建（fork 时只有主线程）
+    encode_pool = create_encode_pool()
+    # GitHub API 和图片主机共用的连接池；页面仍走 cloudscraper 处理 Cloudflare 验证，
+    # 验证得到的 Cookie 和 UA 会同步过来
+    http_client = HttpEngine(
+        per_host=HOST_CONCURRENCY,
+        http2=HTTP2,
+        headers={"User-Agent": scraper.headers.get("User-Agent", "")}
+    )
+    # 限速 / 重试 / ETag 缓存由 GitHubClient 处理，请求走上面的连接池
+    github = GitHubClient(GITHUB_TOKEN, TARGET_REPO, api=GITHUB_API, session=http_client,
+                          rate=GITHUB_RATE, write_rate=GITHUB_WRITE_RATE)
+    remote = RemoteStore(github, MetadataCache(os.path.join(STATE_DIR, "metadata")))
+    try:
+        run(sources, remote, http_client, encode_pool)
+    finally:
+        if encode_pool:
+            encode_pool.shutdown()
+        http_client.close()
+    print("\n🏁 完成")
+
+
+def run(sources: list, remote: RemoteStore, http_client: HttpEngine,
+        encode_pool: ProcessPoolExecutor | None):
+    """抓取并上传；连接池和进程池由 main() 创建和关闭"""
     # 获取远程数据
     print("📥 获取远程数据...")
-    progress = get_remote_json("progress.json", {"last_id": START_ID - 1})
-    hash_registry = get_remote_json(f"{IMAGES_DIR}/hash_registry.json", {})
-    raw_folder_counts = get_remote_json(f"{IMAGES_DIR}/count.json", {})
-    
-    # 兼容旧格式 {"hd": {"max": 123, "exclude": [...]}}
-    folder_counts = {}
-    for f in FOLDERS:
-        val = raw_folder_counts.get(f, 0)
-        if isinstance(val, dict):
-            folder_counts[f] = val.get("max", 0)
-        elif isinstance(val, int):
-            folder_counts[f] = val
-        else:
-            folder_counts[f] = 0
+    progress = remote.load_json("progress.json", {})
+    try:
+        hash_registry = load_registry(remote)
+    except Exception as e:
+        print(f"❌ 加载哈希注册表失败: {e}")
+        return
+    print(f"🗂️ 哈希注册表: {len(hash_registry)} 条")
+    
+    try:
+        url_index = load_url_index(remote)
+    except Exception as e:
+        print(f"❌ 加载链接索引失败: {e}")
+        return
+    print(f"🔗 链接索引: {len(url_index)} 条")
+    # 兼容旧格式 {"hd": 123} / {"hd": {"max": 123, "exclude": [...]}}
+    count_data = normalize_counts(remote.load_json(f"{IMAGES_DIR}/count.json", {}), FOLDERS)
+    folder_counts = {f: count_data[f]["max"] for f in FOLDERS}
+    remote.cache.save()
     
     print(f"📊 当前计数: {folder_counts}")
     
-    current_id = progress.get("last_id", START_ID - 1) + 1
-    print(f"📍 从 ID {current_id} 开始\n")
+    start_ids = {name: last_id + 1 for name, last_id in read_progress(progress, sources).items()}
     
-    # 准备本地目录
-    if os.path.exists(LOCAL_DIR):
-        shutil.rmtree(LOCAL_DIR)
-    ensure_dir(LOCAL_DIR)
+    latest_ids = {}
+    if DISCOVER_LATEST:
+        with ThreadPoolExecutor(max_workers=len(sources)) as pool:
+            found = pool.map(lambda s: discover_latest_id(s, start_ids[s.name] - 1), sources)
+            latest_ids = {s.name: latest for s, latest in zip(sources, found) if latest is not None}
+    for source in sources:
+        current_id = start_ids[source.name]
+        latest_id = latest_ids.get(source.name)
+        if latest_id is None:
+            print(f"📍 [{source.name}] 从 ID {current_id} 开始，范围未知，"
+                  f"遇到连续 {MAX_404_COUNT} 个404时停止")
+        else:
+            print(f"📍 [{source.name}] 抓取范围: {current_id} ~ {latest_id}"
+                  f"（{max(0, latest_id - current_id + 1)} 页）")
+    print()
     
     upload_queue = []
-    last_success_id = current_id - 1
-    consecutive_404 = 0
+    
+    # 恢复中断的运行，否则清空本地目录重新开始
+    journal = RunJournal(JOURNAL_FILE)
+    events = journal.read()
+    done_pages = resume_from_journal(
+        events, start_ids, hash_registry, url_index, folder_counts, upload_queue
+    )
+    if done_pages is None:
+        if events:
+            print("🗑️ 本地日志与远程进度不一致，丢弃")
+        if os.path.exists(LOCAL_DIR):
+            shutil.rmtree(LOCAL_DIR)
+        events = [{"type": "run", "start_ids": start_ids}]
+    ensure_dir(LOCAL_DIR)
+    journal.open(events)
     
     # ========== 阶段1: 本地处理 ==========
     print("=" * 60)
     print("📥 阶段1: 本地下载和处理")
+    print(f"   页面并发: {PAGE_WORKERS}, 下载线程: {DOWNLOAD_WORKERS}, "
+          f"编码线程: {ENCODE_WORKERS}, 编码进程: {ENCODE_PROCESSES}, "
+          f"单主机并发: {HOST_CONCURRENCY}")
     print("=" * 60)
     
-    while True:
-        result = process_page_local(
-            current_id, 
-            hash_registry, 
-            folder_counts, 
-            upload_queue
-        )
-        
-        if result == "success":
-            last_success_id = current_id
-            consecutive_404 = 0
-            current_id += 1
-            
-        elif result == "video":
-            # 视频页面，跳过继续
-            last_success_id = current_id  # 也算处理过了
-            consecutive_404 = 0
-            current_id += 1
-            
-        elif result == "404":
-            consecutive_404 += 1
-            print(f"⚠️ 404 (连续: {consecutive_404}/{MAX_404_COUNT})")
-            
-            if consecutive_404 >= MAX_404_COUNT:
-                print(f"\n⏹️ 连续 {MAX_404_COUNT} 个404，到达末尾")
-                break
-            
-            current_id += 1
-            
-        else:
-            # 出错
-            print(f"\n❌ 处理出错，停止")
-            break
-    
-    # 清理临时目录
-    if os.path.exists(TEMP_DIR):
-        shutil.rmtree(TEMP_DIR)
+    state = CrawlState(hash_registry, url_index, folder_counts, upload_queue, journal)
+    print(f"🔎 感知哈希索引: {len(state.phash_tree)} 条, 阈值 {PHASH_THRESHOLD}")
+    last_ids = CrawlPipeline(
+        sources, start_ids, state, http_client, done_pages, encode_pool, latest_ids
+    ).run()
+    print()
+    for name, last_id in last_ids.items():
+        pages = max(0, last_id - start_ids[name] + 1)
+        print(f"📍 [{name}] 按序完成到 ID {last_id}（{pages} 页）")
+        metrics.count("pages_done", pages)
+    write_near_duplicate_report(state.suppressed)
+    print(f"🌸 链接预过滤: 跳过 {state.urls_skipped} 个已知链接, "
+          f"节省 {state.bytes_saved / 1024 / 1024:.1f} MB "
+          f"(布隆误判 {url_index.bloom_false_positives} 次)")
+    print(f"🚫 下载检查: {download_policy.summary()}")
     
     # ========== 阶段2: 批量上传 ==========
     print("\n" + "=" * 60)
     print("📤 阶段2: 批量上传到 GitHub")
     print("=" * 60)
     
+    upload_start = time.perf_counter()
     if upload_queue:
         print(f"\n📊 待上传: {len(upload_queue)} 个文件")
         for f in FOLDERS:
@@ -476,24 +1551,59 @@ def main():
             if count > 0:
                 print(f"   {f}: {count} 张")
         
-        batch_upload_to_github(
-            upload_queue, 
-            hash_registry, 
-            folder_counts, 
-            last_success_id
-        )
+        uploaded = False
+        if UPLOAD_MODE == "bulk":
+            uploaded = bulk_upload_to_github(
+                remote,
+                upload_queue,
+                hash_registry,
+                url_index,
+                count_data,
+                sources,
+                last_ids
+            )
+            if not uploaded:
+                print("\n⚠️ 单次提交未完成，改为逐个上传")
+        
+        if not uploaded:
+            uploaded = batch_upload_to_github(
+                remote,
+                upload_queue, 
+                hash_registry, 
+                url_index,
+                count_data, 
+                sources,
+                last_ids
+            )
     else:
         print("\n📭 没有新图片")
-        # 仍然更新进度
-        progress["last_id"] = last_success_id
-        save_remote_json("progress.json", progress, f"Update progress to {last_success_id}")
+        # 仍然更新进度；重复图片的链接也要记住，任一写入失败都保留本地状态
+        uploaded = save_table_contents(remote, url_index)
+        uploaded = save_progress(remote, sources, last_ids) and uploaded
+    metrics.observe("upload", time.perf_counter() - upload_start)
+    # 增量计数没有完整写入时，由工作流全量重建 count.json
+    set_step_output("recount", "false" if uploaded else "true")
     
-    # 清理
-    if os.path.exists(LOCAL_DIR):
-        shutil.rmtree(LOCAL_DIR)
+    # 上传完成后清理；失败则保留日志和本地文件，下次运行直接续传
+    if uploaded:
+        journal.clear()
+        if os.path.exists(LOCAL_DIR):
+            shutil.rmtree(LOCAL_DIR)
+    else:
+        print(f"\n💾 保留本地状态 {STATE_DIR}/，下次运行继续")
     
-    print("\n🏁 完成")
+    remote.cache.save()
+    print(f"\n🐙 GitHub API: {remote.github.summary()}")
+    print(f"🗃️ 元数据缓存: {remote.cache.summary()}")
+    for key in ("requests", "not_modified", "retries"):
+        metrics.count(f"github_{key}", remote.github.stats[key])
+    for key in ("hits", "fetched", "writes_skipped"):
+        metrics.count(f"metadata_{key}", remote.cache.stats[key])
 
 
 if __name__ == "__main__":
-    main()
+    with profiling(PROFILE, PROFILE_OUTPUT):
+        try:
+            main()
+        finally:
+            metrics.write(METRICS_FILE)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+图片来源插件
+每个来源负责：页面 ID → URL、从页面中流式提取图片链接、（可选）从 RSS 取最新 ID
+多个来源在同一进程中共用下载 / 去重 / 分类 / 编码 / 上传流水线、哈希注册表和提交
+进度按来源分别记录在 progress.json 的 sources.<名称>.last_id；
+第一个来源同时写顶层 last_id，兼容旧格式
+
+配置（环境变量 SOURCES，JSON 列表，不设置时只有默认站点）:
+  [{"name": "hyun", "type": "typecho", "url": "https://img.hyun.cc", "start_id": 342},
+   {"name": "other", "type": "typecho", "url": "https://example.com", "start_id": 1,
+    "attr": "data-lightbox"}]
+"""
+
+import json
+
+from link_extract import iter_fancybox_links
+from page_discovery import latest_from_feed
+
+
+class Source:
+    """
+    来源基类：子类实现 page_url 和 iter_links
+    feed_url 不为 None 时会先读 RSS 确定最新页面，否则只靠探测 / 连续404判断
+    """
+
+    type = ""
+    feed_url = None
+
+    def __init__(self, name: str, url: str, start_id: int = 1):
+        self.name = name
+        self.url = url.rstrip("/")
+        self.start_id = start_id
+
+    def page_url(self, page_id: int) -> str:
+        raise NotImplementedError
+
+    def iter_links(self, chunks):
+        """chunks: 页面字节块；逐个产出 {"url", "index"}"""
+        raise NotImplementedError
+
+    def latest_from_feed(self, text: str) -> int | None:
+        return None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r}, {self.url!r})"
+
+
+class TypechoSource(Source):
+    """Typecho 归档页面，图片为 <a data-fancybox href=...>（attr 可配置）"""
+
+    type = "typecho"
+
+    def __init__(self, name: str, url: str, start_id: int = 1, attr: str = "data-fancybox"):
+        super().__init__(name, url, start_id)
+        self.attr = attr
+        self.feed_url = f"{self.url}/index.php/feed/"
+
+    def page_url(self, page_id: int) -> str:
+        return f"{self.url}/index.php/archives/{page_id}.html"
+
+    def iter_links(self, chunks):
+        return iter_fancybox_links(chunks, attr=self.attr)
+
+    def latest_from_feed(self, text: str) -> int | None:
+        return latest_from_feed(text)
+
+
+SOURCE_TYPES = {cls.type: cls for cls in (TypechoSource,)}
+
+
+def load_sources(spec: str, default: Source) -> list:
+    """解析 SOURCES 配置；为空时返回 [default]，配置错误抛出 ValueError"""
+    if not spec.strip():
+        return [default]
+    sources = []
+    for item in json.loads(spec):
+        options = dict(item)
+        kind = options.pop("type", TypechoSource.type)
+        cls = SOURCE_TYPES.get(kind)
+        if cls is None:
+            raise ValueError(f"未知的来源类型: {kind}")
+        source = cls(**options)
+        if any(s.name == source.name for s in sources):
+            raise ValueError(f"来源名称重复: {source.name}")
+        sources.append(source)
+    if not sources:
+        raise ValueError("SOURCES 为空")
+    return sources
+
+
+# ============ 进度 ============
+
+def read_progress(progress: dict, sources: list) -> dict:
+    """返回 {来源名称: last_id}"""
+    per_source = progress.get("sources", {})
+    last_ids = {}
+    for i, source in enumerate(sources):
+        if source.name in per_source:
+            last_ids[source.name] = per_source[source.name].get("last_id", source.start_id - 1)
+        elif i == 0 and "last_id" in progress:
+            # 旧格式只有顶层 last_id
+            last_ids[source.name] = progress["last_id"]
+        else:
+            last_ids[source.name] = source.start_id - 1
+    return last_ids
+
+
+def write_progress(progress: dict, last_ids: dict, sources: list) -> dict:
+    """把各来源的 last_id 写回 progress（返回新字典），其他字段原样保留"""
+    progress = dict(progress)
+    per_source = dict(progress.get("sources", {}))
+    for name, last_id in last_ids.items():
+        per_source[name] = {**per_source.get(name, {}), "last_id": last_id}
+    progress["sources"] = per_source
+    progress["last_id"] = last_ids[sources[0].name]
+    return progress
+
+
+def describe_progress(last_ids: dict) -> str:
+    """提交信息用: "500" 或 "hyun 500, other 20" """
+    if len(last_ids) == 1:
+        return str(next(iter(last_ids.values())))
+    return ", ".join(f"{name} {last_id}" for name, last_id in last_ids.items())
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+缩略图雪碧图（前端瀑布流图库用）
+缩略图宽度固定，按编号顺序纵向拼成条带，没有空白；前端按 index.json 中的 y / h
+用 background-position 截取，一个请求拿到一整屏缩略图
+每个文件夹一个 index.json:
+  {"next": 3, "sheets": [{"name": "0000.webp", "width": 320, "height": 9000,
+                          "items": [[编号, y, h], ...]}, ...]}
+最后一张未满的图在下次运行时重建：用其中各缩略图的原始 WebP 重新拼接，
+不从雪碧图裁切，避免反复有损压缩
+"""
+
+import cv2
+import numpy as np
+
+INDEX = "index.json"
+SHEET_MAX_ITEMS = 100
+SHEET_MAX_HEIGHT = 16000  # WebP 单边上限 16383
+SHEET_QUALITY = 80
+
+
+def _decode(data: bytes, width: int):
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    if w != width:
+        img = cv2.resize(img, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+    return img
+
+
+def _full(sheet: dict) -> bool:
+    return len(sheet["items"]) >= SHEET_MAX_ITEMS
+
+
+def plan_sprites(index: dict, width: int, thumbs: dict, load_thumbs) -> tuple:
+    """
+    index: 远程 index.json（不存在时为 {}）
+    thumbs: 本次新增的 {编号: 缩略图 WebP}
+    load_thumbs(nums) -> {编号: bytes}：读取已有缩略图，用于重建未满的最后一张
+    返回 (sheets, index, open_nums)
+      sheets: 需要写入的 {文件名: WebP}
+      open_nums: 新的最后一张（未满）包含的编号，下次运行还会用到
+    """
+    index = {"next": index.get("next", 0), "sheets": [dict(s) for s in index.get("sheets", [])]}
+    images = {}
+    for num, data in thumbs.items():
+        img = _decode(data, width)
+        # 极端细长的图片放不进一张雪碧图，只保留单独的缩略图
+        if img is not None and img.shape[0] <= SHEET_MAX_HEIGHT:
+            images[num] = img
+    if not images:
+        return {}, index, []
+
+    # 续写未满的最后一张；有缩略图读不到时保持原样，从新的一张开始
+    name = None
+    last = index["sheets"][-1] if index["sheets"] else None
+    if last and last.get("width") == width and not _full(last):
+        members = [item[0] for item in last["items"]]
+        loaded = load_thumbs(members)
+        existing = {num: _decode(loaded[num], width) for num in members if loaded.get(num)}
+        if all(existing.get(num) is not None for num in members):
+            index["sheets"].pop()
+            name = last["name"]
+            images.update(existing)
+
+    # 按编号顺序切分
+    groups = [[]]
+    height = 0
+    for num in sorted(images):
+        h = images[num].shape[0]
+        if groups[-1] and (len(groups[-1]) >= SHEET_MAX_ITEMS or height + h > SHEET_MAX_HEIGHT):
+            groups.append([])
+            height = 0
+        groups[-1].append(num)
+        height += h
+
+    sheets = {}
+    for group in groups:
+        if name is None:
+            name = f"{index['next']:04d}.webp"
+            index["next"] += 1
+        items, y = [], 0
+        for num in group:
+            h = images[num].shape[0]
+            items.append([num, y, h])
+            y += h
+        ok, encoded = cv2.imencode(".webp", np.vstack([images[num] for num in group]),
+                                   [cv2.IMWRITE_WEBP_QUALITY, SHEET_QUALITY])
+        if not ok:
+            raise ValueError(f"雪碧图编码失败: {name}")
+        sheets[name] = encoded.tobytes()
+        index["sheets"].append({"name": name, "width": width, "height": y, "items": items})
+        name = None
+
+    last = index["sheets"][-1]
+    open_nums = [] if _full(last) else [item[0] for item in last["items"]]
+    return sheets, index, open_nums
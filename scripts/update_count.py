@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+维护目标仓库的 ri/count.json
+
+格式: {"hd": {"max": 123, "exclude": [4, 5, 77], "count": 120, "gaps": [[4, 5], [77, 77]]}, ...}
+- max:     最大编号
+- exclude: 1..max 中缺失的编号（旧格式，前端仍在读取，继续写入）
+- count:   实际文件数
+- gaps:    同 exclude，按闭区间表示
+
+两种更新方式:
+- apply_uploaded(): 根据本次上传的路径增量更新，不需要遍历仓库（爬虫提交时使用）
+- 全量重建: 只下载一次递归 tree，一遍扫描算出所有文件夹；结果按 tree SHA 缓存
+  递归 tree 被截断时改为逐个读取 ri/<folder> 的 tree，仍不完整则放弃，不写入
+    python scripts/update_count.py
+"""
+
+import os
+import re
+import json
+import base64
+
+from github_api import GitHubClient
+
+GH_TOKEN = os.environ.get("GH_TOKEN", "")
+TARGET_REPO = os.environ.get("TARGET_REPO", "")
+FOLDERS = ["hd", "hl", "vd", "vl"]
+IMAGES_DIR = "ri"
+COUNT_PATH = f"{IMAGES_DIR}/count.json"
+CACHE_FILE = os.path.join(os.environ.get("SCRAPER_STATE_DIR", ".scraper_state"), "count_cache.json")
+
+PATH_RE = re.compile(rf"^{IMAGES_DIR}/([^/]+)/(\d+)\.webp$")
+
+
+# ============ 区间运算 ============
+
+def gaps_from_sorted(nums: list) -> list:
+    """nums: 升序且去重的编号，返回 1..max 中缺失编号的区间"""
+    gaps = []
+    expected = 1
+    for n in nums:
+        if n > expected:
+            gaps.append([expected, n - 1])
+        expected = n + 1
+    return gaps
+
+
+def remove_from_gaps(gaps: list, n: int) -> list:
+    """从区间列表中去掉编号 n"""
+    result = []
+    for start, end in gaps:
+        if start <= n <= end:
+            if start < n:
+                result.append([start, n - 1])
+            if n < end:
+                result.append([n + 1, end])
+        else:
+            result.append([start, end])
+    return result
+
+
+def gaps_to_exclude(gaps: list) -> list:
+    return [n for start, end in gaps for n in range(start, end + 1)]
+
+
+def exclude_to_gaps(exclude: list) -> list:
+    gaps = []
+    for n in sorted(set(exclude)):
+        if gaps and gaps[-1][1] == n - 1:
+            gaps[-1][1] = n
+        else:
+            gaps.append([n, n])
+    return gaps
+
+
+def normalize(data: dict, folders: list = FOLDERS) -> dict:
+    """兼容旧格式: 纯数字 / {"max", "exclude": [...]}"""
+    result = {}
+    for folder in folders:
+        val = data.get(folder, 0)
+        if isinstance(val, dict):
+            max_num = val.get("max", 0)
+            if "gaps" in val:
+                gaps = [list(g) for g in val["gaps"]]
+            else:
+                gaps = exclude_to_gaps(val.get("exclude", []))
+        else:
+            max_num = val if isinstance(val, int) else 0
+            gaps = []
+        missing = sum(end - start + 1 for start, end in gaps)
+        result[folder] = folder_entry(max_num, max_num - missing, gaps)
+    return result
+
+
+def folder_entry(max_num: int, count: int, gaps: list) -> dict:
+    """单个文件夹的记录，exclude 由 gaps 展开"""
+    return {"max": max_num, "exclude": gaps_to_exclude(gaps), "count": count, "gaps": gaps}
+
+
+# ============ 计算 ============
+
+def apply_uploaded(data: dict, paths: list, folders: list = FOLDERS) -> dict:
+    """
+    根据新上传的文件路径（ri/<folder>/<n>.webp）增量更新
+    超过原 max 的编号之间未上传的部分记为缺失
+    """
+    result = {f: {"max": v["max"], "count": v["count"], "gaps": [list(g) for g in v["gaps"]]}
+              for f, v in normalize(data, folders).items()}
+
+    added = {}
+    for path in paths:
+        m = PATH_RE.match(path)
+        if m and m.group(1) in result:
+            added.setdefault(m.group(1), set()).add(int(m.group(2)))
+
+    for folder, nums in added.items():
+        entry = result[folder]
+        old_max = entry["max"]
+        for n in sorted(x for x in nums if x <= old_max):
+            # 只有补上缺失编号才计数，覆盖已有文件不变
+            if any(start <= n <= end for start, end in entry["gaps"]):
+                entry["gaps"] = remove_from_gaps(entry["gaps"], n)
+                entry["count"] += 1
+        new = sorted(x for x in nums if x > old_max)
+        if new:
+            for gap in gaps_from_sorted([x - old_max for x in new]):
+                entry["gaps"].append([gap[0] + old_max, gap[1] + old_max])
+            entry["max"] = new[-1]
+            entry["count"] += len(new)
+    return {f: folder_entry(v["max"], v["count"], v["gaps"]) for f, v in result.items()}
+
+
+def count_from_tree(tree_items: list, folders: list = FOLDERS) -> dict:
+    """一遍扫描递归 tree，计算所有文件夹"""
+    nums = {f: [] for f in folders}
+    for item in tree_items:
+        if item.get("type") != "blob":
+            continue
+        m = PATH_RE.match(item["path"])
+        if m and m.group(1) in nums:
+            nums[m.group(1)].append(int(m.group(2)))
+
+    result = {}
+    for folder, values in nums.items():
+        values = sorted(set(values))
+        result[folder] = folder_entry(values[-1] if values else 0, len(values), gaps_from_sorted(values))
+    return result
+
+
+# ============ GitHub ============
+
+class CountUpdater:
+
+    def __init__(self, token: str, repo: str):
+        self.github = GitHubClient(token, repo)
+
+    def get_tree_sha(self) -> tuple | None:
+        """返回 (分支名, tree SHA)，仓库或分支不存在时返回 None"""
+        repo = self.github.get_json("")
+        if not repo:
+            return None
+        branch = repo["default_branch"]
+        ref = self.github.get_json(f"git/ref/heads/{branch}")
+        if not ref:
+            return None
+        commit = self.github.get_json(f"git/commits/{ref['object']['sha']}")
+        if not commit:
+            return None
+        return branch, commit["tree"]["sha"]
+
+    def list_tree(self, sha: str) -> list | None:
+        """非递归读取一层 tree；不存在或被截断时返回 None"""
+        tree = self.github.get_json(f"git/trees/{sha}", timeout=120)
+        if not tree or tree.get("truncated"):
+            return None
+        return tree.get("tree", [])
+
+    def folder_items(self, tree_sha: str) -> list | None:
+        """逐级读取 ri/<folder> 的 tree，路径补全为相对仓库根目录；任何一层不完整时返回 None"""
+        root = self.list_tree(tree_sha)
+        if root is None:
+            return None
+        images = next((i for i in root if i["path"] == IMAGES_DIR and i["type"] == "tree"), None)
+        if images is None:
+            return []
+        children = self.list_tree(images["sha"])
+        if children is None:
+            return None
+        items = []
+        for child in children:
+            if child["type"] != "tree" or child["path"] not in FOLDERS:
+                continue
+            files = self.list_tree(child["sha"])
+            if files is None:
+                print(f"❌ {IMAGES_DIR}/{child['path']} 的 tree 不完整")
+                return None
+            items.extend({"type": f["type"], "path": f"{IMAGES_DIR}/{child['path']}/{f['path']}"}
+                         for f in files)
+        return items
+
+    def compute(self) -> dict | None:
+        """全量计算；tree SHA 未变化时直接使用缓存。无法得到完整的 tree 时返回 None，不写缓存"""
+        head = self.get_tree_sha()
+        if not head:
+            print("❌ 无法读取目标仓库的默认分支")
+            return None
+        _, tree_sha = head
+        cache = load_cache()
+        if cache.get("tree_sha") == tree_sha:
+            print(f"♻️ tree {tree_sha[:7]} 未变化，使用缓存")
+            return cache["counts"]
+
+        tree = self.github.get_json(f"git/trees/{tree_sha}?recursive=1", timeout=120)
+        if not tree:
+            print(f"❌ 无法读取 tree {tree_sha[:7]}")
+            return None
+        items = tree.get("tree", [])
+        if tree.get("truncated"):
+            print("⚠️ 递归 tree 被截断，改为逐个读取文件夹")
+            items = self.folder_items(tree_sha)
+            if items is None:
+                return None
+
+        counts = count_from_tree(items)
+        save_cache({"tree_sha": tree_sha, "counts": counts})
+        return counts
+
+    def save(self, counts: dict) -> bool:
+        content = json.dumps(counts, separators=(",", ":"))
+        existing = self.github.get_json(f"contents/{COUNT_PATH}")
+        data = {
+            "message": "Auto update count.json",
+            "content": base64.b64encode(content.encode()).decode()
+        }
+        if existing:
+            if base64.b64decode(existing["content"]).decode() == content:
+                print("ℹ️ count.json 无变化")
+                return True
+            data["sha"] = existing["sha"]
+        return self.github.request("PUT", f"contents/{COUNT_PATH}", data, timeout=60).ok
+
+
+def load_cache() -> dict:
+    try:
+        with open(CACHE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(data: dict):
+    os.makedirs(os.path.dirname(CACHE_FILE) or ".", exist_ok=True)
+    with open(CACHE_FILE, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def main():
+    if not GH_TOKEN or not TARGET_REPO:
+        print("❌ 缺少 GH_TOKEN / TARGET_REPO")
+        return
+
+    updater = CountUpdater(GH_TOKEN, TARGET_REPO)
+    counts = updater.compute()
+    if counts is None:
+        print("❌ 计数不完整，count.json 未更新")
+        return
+    for folder in FOLDERS:
+        c = counts[folder]
+        print(f"{folder}: max={c['max']}, files={c['count']}, gaps={len(c['gaps'])} 段")
+
+    if updater.save(counts):
+        print("✅ count.json 更新成功!")
+    else:
+        print("❌ count.json 更新失败!")
+    print(f"🐙 GitHub API: {updater.github.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+已入库图片链接的索引
+- 持久化: 图片 URL → sha256 + 文件大小，沿用 hash_registry 的分段存储（urls.json）
+- 内存中用布隆过滤器做前置判断，绝大多数新链接无需查段文件
+"""
+
+import hashlib
+import math
+import struct
+
+from hash_registry import SegmentTable
+
+
+def url_key(url: str) -> bytes:
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest()
+
+
+class BloomFilter:
+    """基于 8 字节键的布隆过滤器（双重哈希）"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1024)
+        self.size = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: bytes):
+        h1, h2 = struct.unpack("<II", key)
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: bytes):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: bytes) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class UrlIndex(SegmentTable):
+    """URL → (sha256, 字节数)"""
+
+    RECORD = struct.Struct("<8s32sI")     # url key, sha256, size
+    KEY_SIZE = 8
+    MANIFEST = "urls.json"
+    PREFIX = "urls-"
+
+    def __init__(self, manifest: dict = None, segments: list = None):
+        super().__init__(manifest, segments)
+        # 预留本次运行新增的空间，避免误判率上升
+        self.bloom = BloomFilter(len(self) * 2)
+        for record in self._records():
+            self.bloom.add(record[:self.KEY_SIZE])
+        self.bloom_false_positives = 0
+
+    def lookup(self, url: str) -> tuple | None:
+        """返回 (sha256, 字节数)，未知链接返回 None"""
+        key = url_key(url)
+        if key not in self.bloom:
+            return None
+        record = self._find_record(key)
+        if record is None:
+            self.bloom_false_positives += 1
+            return None
+        _, digest, size = self.RECORD.unpack(record)
+        return digest.hex(), size
+
+    def add(self, url: str, sha: str, size: int):
+        key = url_key(url)
+        self.pending[key] = self.RECORD.pack(key, bytes.fromhex(sha), min(size, 0xFFFFFFFF))
+        self.bloom.add(key)
+
+    def discard_sha(self, sha: str):
+        """撤销本次运行中指向该 sha 的链接（例如图片上传失败）"""
+        digest = bytes.fromhex(sha)
+        for key in [k for k, r in self.pending.items() if r[self.KEY_SIZE:self.KEY_SIZE + 32] == digest]:
+            del self.pending[key]
+
+    @classmethod
+    def load(cls, manifest: dict, read_segment) -> "UrlIndex":
+        return cls(manifest, cls._read_segments(manifest, read_segment))
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""脚本按 python scripts/x.py 运行（平级导入），测试同样把 scripts/ 加入模块搜索路径"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from hash_registry import HashRegistry
+
+FOLDERS = ["hd", "hl"]
+
+
+def sha(n: int) -> str:
+    return f"{n:064x}"
+
+
+def reload(registry: HashRegistry, store: dict, compact_every: int = 16) -> HashRegistry:
+    """写入 store（文件名 -> bytes）后按 manifest 重新加载"""
+    files, manifest = registry.plan_write(compact_every)
+    for name, data in files.items():
+        if data is None:
+            store.pop(name, None)
+        else:
+            store[name] = data
+    return HashRegistry.load(FOLDERS, manifest, store.get)
+
+
+def test_add_get_and_phash():
+    registry = HashRegistry(FOLDERS)
+    registry.add(sha(1), "hd/7.webp", 0xABCDEF)
+    registry.add(sha(2), "other/1.webp")
+    assert sha(1) in registry
+    assert registry.get(sha(1)) == "hd/7.webp"
+    # 不在文件夹列表中的路径不保存
+    assert registry.get(sha(2)) is None
+    assert registry.get(sha(3), "missing") == "missing"
+    assert dict(registry.phashes()) == {sha(1): 0xABCDEF}
+
+
+def test_pop_only_pending():
+    store = {}
+    registry = HashRegistry(FOLDERS)
+    registry.add(sha(1), "hd/1.webp")
+    registry = reload(registry, store)
+    registry.add(sha(2), "hd/2.webp")
+    assert registry.pop(sha(2)) == "hd/2.webp"
+    assert registry.pop(sha(1)) is None
+    assert sha(1) in registry and sha(2) not in registry
+
+
+def test_round_trip_deltas_and_compaction():
+    store = {}
+    registry = HashRegistry(FOLDERS)
+    for n in range(1, 6):
+        registry.add(sha(n), f"hl/{n}.webp", n)
+        registry = reload(registry, store, compact_every=3)
+        assert len(registry) == n
+    # 每 3 段合并一次，旧增量段被删除
+    assert len(registry.manifest["deltas"]) < 3
+    assert set(store) == {registry.manifest["base"], *registry.manifest["deltas"]}
+    assert [registry.get(sha(n)) for n in range(1, 6)] == [f"hl/{n}.webp" for n in range(1, 6)]
+
+
+def test_plan_write_without_changes():
+    registry = HashRegistry(FOLDERS)
+    files, manifest = registry.plan_write(16)
+    assert files == {} and manifest is registry.manifest
+
+
+def test_import_json():
+    registry = HashRegistry(FOLDERS)
+    registry.import_json({sha(1): "hd/3.webp", sha(2): "hl/4.webp"}, {sha(1): "00000000000000ff"})
+    assert registry.get(sha(2)) == "hl/4.webp"
+    assert dict(registry.phashes()) == {sha(1): 0xFF}
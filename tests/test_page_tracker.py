@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+scraper = pytest.importorskip("scraper")
+PageTracker = scraper.PageTracker
+
+
+def test_out_of_order_completion_advances_in_order():
+    done = []
+    tracker = PageTracker(10, on_done=lambda page_id, status: done.append(page_id))
+    tracker.add_image(11)
+    tracker.fetched(11, "ok")
+    tracker.fetched(10, "ok", image_count=1)
+    # 10 还有图片没处理完，11 虽然完成了也不能推进
+    assert tracker.last_success_id == 9
+    assert done == []
+    tracker.image_done(11)
+    assert done == [11] and tracker.last_success_id == 9
+    tracker.image_done(10)
+    assert tracker.last_success_id == 11
+    assert sorted(done) == [10, 11]
+
+
+def test_consecutive_404_stops():
+    tracker = PageTracker(1)
+    tracker.fetched(1, "ok")
+    for page_id in range(2, 2 + scraper.MAX_404_COUNT):
+        tracker.fetched(page_id, "404")
+    assert tracker.end_id == 1 + scraper.MAX_404_COUNT + 1
+    assert not tracker.accepts(tracker.end_id)
+    assert tracker.last_success_id == 1
+
+
+def test_404_is_a_gap_when_latest_known():
+    tracker = PageTracker(1, latest_id=3)
+    tracker.fetched(1, "404")
+    tracker.fetched(2, "ok")
+    tracker.fetched(3, "video")
+    assert tracker.last_success_id == 3
+    assert not tracker.accepts(4)
+
+
+def test_image_failed_stops_before_page():
+    tracker = PageTracker(1)
+    tracker.fetched(1, "ok")
+    tracker.add_image(2)
+    tracker.fetched(2, "ok")
+    tracker.fetched(3, "ok")
+    tracker.image_failed(2)
+    assert tracker.end_id == 2
+    assert tracker.statuses[2] == "error"
+    assert tracker.last_success_id == 1
+
+
+def test_wait_for_slot_returns_false_after_stop():
+    tracker = PageTracker(1)
+    tracker.fetched(1, "error")
+    assert tracker.wait_for_slot(5, window=2) is False
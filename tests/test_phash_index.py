@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from phash_index import BKTree, dhash, from_hex, hamming, to_hex
+
+
+def test_hex_round_trip():
+    assert to_hex(0xAB) == "00000000000000ab"
+    assert from_hex(to_hex(0xDEADBEEF)) == 0xDEADBEEF
+
+
+def test_bktree_search_matches_brute_force():
+    rng = np.random.default_rng(0)
+    hashes = [int(x) for x in rng.integers(0, 1 << 63, size=300, dtype=np.int64)]
+    tree = BKTree()
+    for i, h in enumerate(hashes):
+        tree.add(h, i)
+    assert len(tree) == len(hashes)
+
+    query = hashes[42] ^ 0b1011
+    found = tree.search(query, 6)
+    expected = sorted((hamming(query, h), i) for i, h in enumerate(hashes) if hamming(query, h) <= 6)
+    assert sorted((d, v) for d, _, v in found) == expected
+    assert found[0][2] == 42
+    assert [d for d, _, _ in found] == sorted(d for d, _, _ in found)
+
+
+def test_bktree_empty_and_negative_distance():
+    tree = BKTree()
+    assert tree.search(1, 5) == []
+    tree.add(1, "a")
+    assert tree.search(1, -1) == []
+
+
+def test_dhash_stable_under_scaling():
+    rng = np.random.default_rng(1)
+    img = rng.integers(0, 256, size=(90, 90, 3), dtype=np.uint8)
+    big = np.kron(img, np.ones((2, 2, 1), dtype=np.uint8))
+    assert hamming(dhash(img), dhash(big)) <= 4
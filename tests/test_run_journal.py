@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import os
+
+from run_journal import RunJournal
+
+
+def test_append_read_and_clear(tmp_path):
+    journal = RunJournal(str(tmp_path / "state" / "journal.jsonl"))
+    assert journal.read() == []
+    journal.open()
+    journal.append({"page": 1})
+    journal.append({"page": 2, "name": "图片"})
+    assert journal.read() == [{"page": 1}, {"page": 2, "name": "图片"}]
+    journal.clear()
+    assert not os.path.exists(journal.path)
+    # 关闭后追加被忽略
+    journal.append({"page": 3})
+    assert journal.read() == []
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text('{"page": 1}\n{"page": 2}\n{"pa', encoding="utf-8")
+    assert RunJournal(str(path)).read() == [{"page": 1}, {"page": 2}]
+
+
+def test_open_rewrites_with_events(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text('{"page": 1}\n{"pa', encoding="utf-8")
+    journal = RunJournal(str(path))
+    journal.open(journal.read())
+    journal.append({"page": 2})
+    journal.clear()
+    journal.open([{"page": 5}])
+    journal.append({"page": 6})
+    assert journal.read() == [{"page": 5}, {"page": 6}]
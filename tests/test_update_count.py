@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from update_count import (apply_uploaded, count_from_tree, exclude_to_gaps, gaps_from_sorted,
+                          gaps_to_exclude, normalize, remove_from_gaps)
+
+FOLDERS = ["hd", "hl"]
+
+
+def test_gap_helpers():
+    assert gaps_from_sorted([1, 2, 5, 6, 9]) == [[3, 4], [7, 8]]
+    assert gaps_from_sorted([]) == []
+    assert remove_from_gaps([[3, 5], [8, 8]], 4) == [[3, 3], [5, 5], [8, 8]]
+    assert remove_from_gaps([[3, 5]], 3) == [[4, 5]]
+    assert remove_from_gaps([[8, 8]], 8) == []
+    assert gaps_to_exclude([[3, 4], [7, 7]]) == [3, 4, 7]
+    assert exclude_to_gaps([7, 3, 4, 4]) == [[3, 4], [7, 7]]
+
+
+def test_normalize_legacy_formats():
+    data = normalize({"hd": 10, "hl": {"max": 6, "exclude": [2, 3]}}, FOLDERS)
+    assert data["hd"] == {"max": 10, "exclude": [], "count": 10, "gaps": []}
+    assert data["hl"] == {"max": 6, "exclude": [2, 3], "count": 4, "gaps": [[2, 3]]}
+    assert normalize({}, FOLDERS)["hd"]["max"] == 0
+
+
+def test_apply_uploaded():
+    data = {"hd": {"max": 5, "gaps": [[2, 3]]}, "hl": 0}
+    result = apply_uploaded(data, ["ri/hd/3.webp", "ri/hd/5.webp", "ri/hd/8.webp",
+                                   "ri/hl/1.webp", "ri/thumbs/hd/8.webp"], FOLDERS)
+    # 补上缺失的 3 计数，覆盖已有的 5 不计数，超过 max 的 6、7 记为缺失
+    assert result["hd"] == {"max": 8, "exclude": [2, 6, 7], "count": 5, "gaps": [[2, 2], [6, 7]]}
+    assert result["hl"]["count"] == 1 and result["hl"]["max"] == 1
+
+
+def test_apply_uploaded_matches_full_rebuild():
+    before = [f"ri/hd/{n}.webp" for n in (1, 2, 4)]
+    uploaded = [f"ri/hd/{n}.webp" for n in (3, 6)]
+    incremental = apply_uploaded(count_from_tree([{"type": "blob", "path": p} for p in before], FOLDERS),
+                                 uploaded, FOLDERS)
+    full = count_from_tree([{"type": "blob", "path": p} for p in before + uploaded]
+                           + [{"type": "tree", "path": "ri/hd/99.webp"}], FOLDERS)
+    assert incremental == full
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from url_index import UrlIndex
+
+
+def sha(n: int) -> str:
+    return f"{n:064x}"
+
+
+def test_lookup_and_round_trip():
+    index = UrlIndex()
+    index.add("https://example.com/a.jpg", sha(1), 1234)
+    assert index.lookup("https://example.com/a.jpg") == (sha(1), 1234)
+    assert index.lookup("https://example.com/b.jpg") is None
+
+    files, manifest = index.plan_write(16)
+    assert manifest["base"] == "urls-base.bin"
+    loaded = UrlIndex.load(manifest, files.get)
+    assert len(loaded) == 1
+    assert loaded.lookup("https://example.com/a.jpg") == (sha(1), 1234)
+
+
+def test_discard_sha():
+    index = UrlIndex()
+    index.add("https://example.com/a.jpg", sha(1), 1)
+    index.add("https://example.com/a-copy.jpg", sha(1), 1)
+    index.add("https://example.com/b.jpg", sha(2), 2)
+    index.discard_sha(sha(1))
+    assert index.lookup("https://example.com/a.jpg") is None
+    assert index.lookup("https://example.com/a-copy.jpg") is None
+    assert index.lookup("https://example.com/b.jpg") == (sha(2), 2)
+
+
+def test_size_is_clamped():
+    index = UrlIndex()
+    index.add("https://example.com/huge", sha(1), 1 << 40)
+    assert index.lookup("https://example.com/huge") == (sha(1), 0xFFFFFFFF)